@@ -0,0 +1,185 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from app.cache import cache_key
+from app.client import VALID_ENDPOINTS, RawResponse, Response, default_base_url
+
+
+class HostLimiter:
+    """
+    Bounds in-flight requests and request start rate for one host
+    """
+
+    def __init__(self, max_concurrency=10, rate_limit=None):
+        """
+        :param max_concurrency: max in-flight requests to host
+        :param rate_limit: max request starts per second, None for unlimited
+        """
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._min_interval = 1 / rate_limit if rate_limit else 0
+        self._next_start = 0
+        self._lock = asyncio.Lock()
+
+    async def _wait_for_slot(self):
+        if not self._min_interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self._min_interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            await self._wait_for_slot()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._semaphore.release()
+
+
+class AsyncAPIClient:
+    """
+    asyncio counterpart of `APIClient`, for fanning out many queries from one process
+
+    Usage::
+
+        async with AsyncAPIClient() as client:
+            responses = await client.gather_many([{'body': 'Mars'}, {'body': 'Moon'}])
+    """
+
+    def __init__(self, endpoint="cad.api", base_url=None, max_concurrency=10, rate_limit=None,
+                 timeout=(3.05, 30), session=None, metrics=None, single_flight=None):
+        """
+        :param endpoint: rest endpoint
+        :param base_url: API base url, defaults to `SSD_API_BASE_URL` env var or JPL SSD API
+        :param max_concurrency: max in-flight requests per host
+        :param rate_limit: max request starts per second per host, None for unlimited
+        :param timeout: (connect, read) timeout in seconds
+        :param session: existing `aiohttp.ClientSession` to share, it is not closed by this client
+        :param metrics: `app.metrics.Metrics` recording wait/download/decode/parse timings, None disables timings
+        :param single_flight: `app.single_flight.AsyncSingleFlight` sharing one in-flight GET between concurrent
+                              identical calls, None disables deduplication
+        """
+        self.endpoint = endpoint
+        if self.endpoint not in VALID_ENDPOINTS:
+            raise ValueError(f'Check your endpoint, {self.endpoint} does not seems to be part of utils')
+        self.base_url = base_url or default_base_url()
+        self.endpoint_url = self.base_url + endpoint
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit
+        self.timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+        self._owns_session = session is None
+        self._session = session
+        self._host_limiters = {}
+        self.metrics = metrics
+        self.single_flight = single_flight
+
+    @property
+    def session(self):
+        # created lazily, a ClientSession has to be created inside a running event loop
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit_per_host=self.max_concurrency)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    def _limiter(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._host_limiters:
+            self._host_limiters[host] = HostLimiter(self.max_concurrency, self.rate_limit)
+        return self._host_limiters[host]
+
+    @staticmethod
+    def _encode_params(params):
+        # aiohttp only accepts str/int/float values, encode like requests does, which leaves out None values
+        if params is None:
+            return None
+        return {key: str(value) for key, value in params.items() if value is not None}
+
+    async def _request(self, method, params=None, data=None):
+        """
+        a http call on endpoint, concurrent identical GET calls share one call when single_flight is set
+        """
+        if method == 'GET' and self.single_flight is not None:
+            res, shared = await self.single_flight.do(cache_key(self.endpoint_url, params),
+                                                      lambda: self._fetch(method, params))
+            if shared and self.metrics is not None:
+                self.metrics.inc('cad_client_coalesced_total', (('endpoint', self.endpoint),))
+            return res
+        return await self._fetch(method, params, data)
+
+    async def _fetch(self, method, params=None, data=None):
+        """
+        a http call on endpoint, bounded by the per host limiter
+        """
+        timing = self.metrics.timing(self.endpoint, method) if self.metrics is not None else None
+        async with self._limiter(self.endpoint_url):
+            start = time.perf_counter()
+            async with self.session.request(method, self.endpoint_url, params=self._encode_params(params),
+                                            data=data) as res:
+                headers_read = time.perf_counter()
+                content = await res.read()
+        if timing is not None:
+            timing.phases.update(wait=headers_read - start, download=time.perf_counter() - headers_read)
+        return Response(RawResponse(res.status, content), timing=timing)
+
+    async def head(self, params=None):
+        """
+        a http call to check stats of endpoint
+        """
+        return await self._request('HEAD', params=params)
+
+    async def get(self, params=None):
+        """
+        a http call to retrieve data for  endpoint
+        """
+        return await self._request('GET', params=params)
+
+    async def post(self, data=None, params=None):
+        """
+        a http call to create resource on endpoint
+        """
+        return await self._request('POST', params=params, data=data)
+
+    async def delete(self, params=None):
+        """
+        a http call to delete resource on endpoint
+        """
+        return await self._request('DELETE', params=params)
+
+    async def gather_many(self, params_list, concurrency=None):
+        """
+        GET every params set with bounded concurrency
+        :param params_list: iterable of api query params as dict
+        :param concurrency: max in-flight calls of this batch, defaults to `max_concurrency`
+        :return: list of Response, in order of params_list
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.max_concurrency)
+
+        async def bounded_get(params):
+            async with semaphore:
+                return await self.get(params=params)
+
+        return await asyncio.gather(*(bounded_get(params) for params in params_list))
+
+    async def close(self):
+        """
+        Release pooled connections, shared sessions are left to their owner
+        """
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
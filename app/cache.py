@@ -0,0 +1,233 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from urllib.parse import urlencode
+
+from app.compression import get_codec
+
+# seconds a cached response is served without revalidation, per endpoint
+DEFAULT_TTLS = {
+    'cad.api': 60 * 60,
+    'sbdb.api': 7 * 24 * 60 * 60,
+}
+DEFAULT_TTL = 60 * 60
+
+# Cached http response
+# code: http status code
+# content: body bytes
+# etag & last_modified: validators sent back on revalidation, None when not served
+# expires_at: epoch seconds after which the entry has to be revalidated
+CacheEntry = namedtuple('CacheEntry', 'code content etag last_modified expires_at')
+
+
+def cache_key(url, params=None):
+    """
+    Canonical cache key, independent of params order & value types
+    :param url: endpoint url
+    :param params: query params as dict
+    :return: str
+    """
+    params = sorted((str(key), str(value)) for key, value in (params or {}).items())
+    return f'{url}?{urlencode(params)}'
+
+
+class CacheStats:
+    """
+    Hit/miss counters of a cache
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        return f'CacheStats({self.as_dict()})'
+
+
+class MemoryCache:
+    """
+    Thread safe in-memory LRU store, bounded by total content size
+    """
+
+    def __init__(self, max_bytes=64 * 2 ** 20):
+        """
+        :param max_bytes: max total size of cached bodies
+        """
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key).content)
+            if len(entry.content) > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._size += len(entry.content)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.content)
+                self.stats.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Persistent on-disk store in one SQLite file, least recently used entries are
+    evicted once total stored content size exceeds `max_bytes`
+    """
+
+    def __init__(self, path, max_bytes=1024 * 2 ** 20, codec=None):
+        """
+        :param path: database file path
+        :param max_bytes: max total size of cached bodies, as stored
+        :param codec: name of the codec compressing stored bodies, e.g. `zstd` or `zlib`, None stores them as is,
+                      each entry records its codec so files written with another codec stay readable
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.codec = get_codec(codec or 'none')
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS responses ('
+                         'key TEXT PRIMARY KEY, code INTEGER, content BLOB, etag TEXT, last_modified TEXT, '
+                         'expires_at REAL, accessed_at REAL, size INTEGER, codec TEXT)')
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(responses)')]
+        if 'codec' not in columns:
+            # database of a previous version, bodies stored as is
+            self._db.execute("ALTER TABLE responses ADD COLUMN codec TEXT DEFAULT 'none'")
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+        self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute('SELECT code, content, etag, last_modified, expires_at, codec FROM responses '
+                                   'WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+            self._db.commit()
+        code, content, etag, last_modified, expires_at, codec = row
+        return CacheEntry(code, get_codec(codec).decompress(content), etag, last_modified, expires_at)
+
+    def set(self, key, entry):
+        content = self.codec.compress(entry.content)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO responses (key, code, content, etag, last_modified, expires_at, '
+                             'accessed_at, size, codec) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             (key, entry.code, content, entry.etag, entry.last_modified, entry.expires_at,
+                              time.time(), len(content), self.codec.name))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        size = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        while size > self.max_bytes:
+            key, entry_size = self._db.execute('SELECT key, size FROM responses '
+                                               'ORDER BY accessed_at LIMIT 1').fetchone()
+            self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            size -= entry_size
+            self.stats.evictions += 1
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+
+class TieredCache:
+    """
+    Memory store in front of a disk store, disk hits are promoted to memory
+    """
+
+    def __init__(self, memory, disk):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key):
+        entry = self.memory.get(key)
+        if entry is None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.set(key, entry)
+        return entry
+
+    def set(self, key, entry):
+        self.memory.set(key, entry)
+        self.disk.set(key, entry)
+
+
+class ResponseCache:
+    """
+    Response cache used by `APIClient`, with per-endpoint TTLs on top of a pluggable store
+
+    Any object with `get(key)` & `set(key, entry)` methods can be used as store, e.g.
+    `MemoryCache`, `SQLiteCache` or `TieredCache`.
+    """
+
+    def __init__(self, store=None, ttls=None, default_ttl=DEFAULT_TTL):
+        """
+        :param store: entry store, defaults to MemoryCache
+        :param ttls: dict of endpoint to ttl in seconds, defaults to DEFAULT_TTLS
+        :param default_ttl: ttl of endpoints missing in ttls
+        """
+        self.store = store if store is not None else MemoryCache()
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.stats = CacheStats()
+
+    def ttl(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def lookup(self, key):
+        """
+        :return: (entry or None, True if entry is still fresh)
+        """
+        entry = self.store.get(key)
+        fresh = entry is not None and entry.expires_at > time.time()
+        if fresh:
+            self.stats.hits += 1
+        else:
+            self.stats.misses += 1
+        return entry, fresh
+
+    def store_response(self, key, endpoint, code, content, headers):
+        """
+        Cache a response, keeping its validators for later revalidation
+        :return: CacheEntry
+        """
+        entry = CacheEntry(code, content, headers.get('ETag'), headers.get('Last-Modified'),
+                           time.time() + self.ttl(endpoint))
+        self.store.set(key, entry)
+        return entry
+
+    def refresh(self, key, endpoint, entry):
+        """
+        Extend a revalidated (304) entry by endpoint ttl
+        :return: CacheEntry
+        """
+        self.stats.revalidated += 1
+        entry = entry._replace(expires_at=time.time() + self.ttl(endpoint))
+        self.store.set(key, entry)
+        return entry
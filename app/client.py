@@ -1,6 +1,77 @@
+import codecs
 import json
-from requests import get, head, post, delete
+import os
+import time
+from collections import namedtuple
 from enum import Enum, auto
+from http import HTTPStatus
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.cache import cache_key
+from app.compression import content_encodings
+from app.metrics import connection_timings, instrument_adapter, reset_connection_timings
+from app.records import CloseApproachView, record_decoder
+from app.throttle import host_throttle, parse_retry_after
+
+BASE_URL = "https://ssd-api.jpl.nasa.gov/"
+# environment variable overriding BASE_URL, e.g. to point every client at a local stub server
+BASE_URL_ENV = "SSD_API_BASE_URL"
+VALID_ENDPOINTS = ["cad.api", "sbdb.api"]
+
+# environment variable selecting the json backend of `Response`, e.g. `json` to force the stdlib
+JSON_BACKEND_ENV = "SSD_JSON_BACKEND"
+
+# Minimal http response shape consumed by `Response`, e.g. for cached bodies
+RawResponse = namedtuple('RawResponse', 'status_code content')
+# json decoder, `from_bytes` backends parse utf-8 bytes without an intermediate str
+JSONBackend = namedtuple('JSONBackend', 'name loads from_bytes')
+
+
+def default_base_url():
+    """
+    :return: `SSD_API_BASE_URL` env var when set, JPL SSD API otherwise
+    """
+    return os.environ.get(BASE_URL_ENV) or BASE_URL
+
+
+def _json_backends():
+    """
+    Installed json backends, fastest first, stdlib json always available
+    """
+    backends = {}
+    try:
+        import orjson
+    except ImportError:
+        pass
+    else:
+        backends['orjson'] = JSONBackend('orjson', orjson.loads, True)
+    backends['json'] = JSONBackend('json', json.loads, False)
+    return backends
+
+
+JSON_BACKENDS = _json_backends()
+_json_backend = JSON_BACKENDS.get(os.environ.get(JSON_BACKEND_ENV), next(iter(JSON_BACKENDS.values())))
+
+
+def get_json_backend():
+    """
+    :return: JSONBackend used by `Response`, `SSD_JSON_BACKEND` env var when installed, fastest installed otherwise
+    """
+    return _json_backend
+
+
+def set_json_backend(name):
+    """
+    Decode responses with another installed backend
+    :param name: key of JSON_BACKENDS, e.g. `orjson` or `json`
+    """
+    global _json_backend
+    if name not in JSON_BACKENDS:
+        raise ValueError(f'JSON backend {name} is not installed, available: {list(JSON_BACKENDS)}')
+    _json_backend = JSON_BACKENDS[name]
 
 
 class CloseApproachBodies(Enum):
@@ -47,18 +118,232 @@ class SDBDOrbitClass(Enum):
     JFc = auto()  # Jupiter-family Comet Jupiter-family comet, as defined by Levison and Duncan (2 < Tj < 3).
 
 
+class _JSONStream:
+    """
+    Incremental parser of a top level json object read from byte chunks
+
+    Keys preceding `data` are decoded into `header` as soon as they are read, rows of the
+    `data` array are decoded one at a time, so only the current row is held in memory.
+    """
+
+    _decoder = json.JSONDecoder()
+    _whitespace = ' \t\n\r'
+
+    def __init__(self, chunks):
+        """
+        :param chunks: iterable of body bytes
+        """
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._exhausted = False
+        self.header = {}
+        # start -> object -> data (rows pending) -> object -> done
+        self.state = 'start'
+        self.rows_started = False
+
+    def _fill(self):
+        """
+        Append next chunk to buffer, return False once body is exhausted
+        """
+        if self._exhausted:
+            return False
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._exhausted = True
+            self._buffer += self._text_decoder.decode(b'', final=True)
+            return False
+        self._buffer += self._text_decoder.decode(chunk)
+        return True
+
+    def _peek(self):
+        """
+        Next non whitespace character, '' at end of body
+        """
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in self._whitespace:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f'Malformed json, expected {char!r} at {self._buffer[self._pos:self._pos + 20]!r}')
+        self._pos += 1
+
+    def _value(self):
+        """
+        Decode next json value, reading more chunks until it is complete
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # a value ending the buffer may be a truncated number
+                if end < len(self._buffer) or self._exhausted:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._exhausted:
+                    raise
+            self._fill()
+
+    def read_header(self):
+        """
+        Decode keys up to the `data` array, or the end of the object
+        """
+        if self.state == 'start':
+            if self._peek() == '':
+                self.state = 'done'
+                return
+            self._expect('{')
+            self.state = 'object'
+        while self.state == 'object':
+            char = self._peek()
+            if char == ',':
+                self._pos += 1
+                continue
+            if char == '}':
+                self._pos += 1
+                self.state = 'done'
+                return
+            key = self._value()
+            self._expect(':')
+            if key == 'data' and self._peek() == '[':
+                self._pos += 1
+                self.state = 'data'
+                return
+            self.header[key] = self._value()
+
+    def rows(self):
+        """
+        Generator of `data` rows, decoded lazily
+        """
+        self.read_header()
+        self.rows_started = self.rows_started or self.state == 'data'
+        while self.state == 'data':
+            char = self._peek()
+            if char == ',':
+                self._pos += 1
+            elif char == ']':
+                self._pos += 1
+                self.state = 'object'
+                # keys following `data`
+                self.read_header()
+            else:
+                yield self._value()
+
+    def materialise(self):
+        """
+        Decode whole object, `data` included
+        """
+        if self.rows_started:
+            raise ValueError('Streamed response data is already consumed')
+        self.read_header()
+        content = dict(self.header)
+        if self.state == 'data':
+            content['data'] = list(self.rows())
+            content.update(self.header)
+        return content
+
+
 class Response:
     """
     Encapsulation http status code and http content as json
+
+    With `stream=True` the body is parsed incrementally off the socket: `fields`, `count`
+    & `signature` are available as soon as they are read and `iter_data` yields rows
+    one at a time. `raw_content` is only decoded when accessed.
     """
 
-    def __init__(self, api_response):
+    # bytes read per socket read in stream mode
+    chunk_size = 64 * 1024
+
+    def __init__(self, api_response, stream=False, timing=None):
+        """
+        :param api_response: http response, in stream mode requested with `stream=True`
+        :param stream: parse body incrementally
+        :param timing: `app.metrics.RequestTiming` completed with decode & parse times and recorded, None to skip
+        """
         self.code = api_response.status_code
-        self.raw_content = api_response.content.decode()
-        self.__content_decoded = '{}' if self.raw_content == '' else self.raw_content
-        self.json_content = json.loads(self.__content_decoded)
+        self.headers = getattr(api_response, 'headers', {})
+        self._api_response = api_response
+        self._stream = None
+        self._json_content = None
+        if stream:
+            self._content = None
+            self._stream = _JSONStream(api_response.iter_content(self.chunk_size))
+            if timing is not None:
+                timing.status = self.code
+                timing.record()
+        elif timing is None:
+            self._content = api_response.content
+            # bytes are handed to the backend as is: orjson parses them directly, json.loads decodes them to a str first
+            self._json_content = get_json_backend().loads(self._content or b'{}')
+        else:
+            self._content = api_response.content
+            self._json_content = self._timed_parse(timing)
+
+    def _timed_parse(self, timing):
+        """
+        Decode & parse body in two timed steps, then record timing
+        """
+        backend = get_json_backend()
+        start = time.perf_counter()
+        text = self._content or b'{}'
+        # bytes parsing backends have no separate decode step
+        if not backend.from_bytes:
+            text = text.decode('utf-8')
+        decoded = time.perf_counter()
+        content = backend.loads(text)
+        timing.phases['decode'] = decoded - start
+        timing.phases['parse'] = time.perf_counter() - decoded
+        timing.status = self.code
+        timing.bytes = len(self._content or b'')
+        data = content.get('data') if isinstance(content, dict) else None
+        timing.rows = len(data) if data else 0
+        timing.record()
+        return content
+
+    @classmethod
+    def from_json(cls, json_content, code=HTTPStatus.OK):
+        """
+        Response built from already decoded json content, e.g. results merged client side
+        :param json_content: decoded content as dict
+        :param code: http status code
+        :return: Response
+        """
+        res = cls.__new__(cls)
+        res.code = code
+        res.headers = {}
+        res._api_response = None
+        res._stream = None
+        res._content = None
+        res._json_content = json_content
+        return res
+
+    @property
+    def json_content(self):
+        if self._json_content is None and self._stream is not None:
+            self._json_content = self._stream.materialise()
+        return self._json_content
+
+    @property
+    def raw_content(self):
+        if self._content is not None:
+            return self._content.decode()
+        return json.dumps(self.json_content)
 
     def get_value_for_key(self, key):
+        if self._json_content is None and self._stream is not None and key != 'data':
+            # header keys are served without consuming rows
+            self._stream.read_header()
+            return self._stream.header.get(key)
         if type(self.json_content) is dict:
             if key in self.json_content.keys():
                 return self.json_content[key]
@@ -72,52 +357,276 @@ class Response:
     def get_data(self):
         return self.get_value_for_key('data')
 
+    def iter_data(self):
+        """
+        Iterate rows of `data`, lazily decoded in stream mode
+        """
+        if self._json_content is None and self._stream is not None:
+            return self._stream.rows()
+        return iter(self.get_data() or [])
+
+    def approaches(self):
+        """
+        Rows of `data` as typed `app.records.CloseApproach`, decoded one at a time when accessed
+        :return: lazy CloseApproachView, in stream mode an iterator decoding rows as they are read
+        """
+        fields = self.get_fields()
+        if self._json_content is None and self._stream is not None:
+            if fields is None and self._stream.state == 'data':
+                raise ValueError('Streamed response has no fields before its data')
+            return map(record_decoder(fields or []), self._stream.rows())
+        return CloseApproachView(self.get_data() or [], fields or [])
+
+    def close(self):
+        """
+        Release connection of a partially consumed streamed response
+        """
+        if self._api_response is not None and self._stream is not None:
+            self._api_response.close()
+
 
 class APIClient:
     """
     Encapsulating URL, API & Endpoints into client
+
+    Every client owns a pooled, keep-alive ``requests.Session`` so repeated calls reuse
+    TCP/TLS connections. The session is thread safe for concurrent requests and can be
+    shared between clients through the ``session`` argument.
     """
 
-    def __init__(self, endpoint="cad.api"):
+    def __init__(self, endpoint="cad.api", base_url=None, pool_connections=10, pool_maxsize=10,
+                 keep_alive=True, timeout=(3.05, 30), max_retries=3, backoff_factor=0.5,
+                 retry_statuses=(429, 503), session=None, cache=None, metrics=None, single_flight=None,
+                 adaptive=False, compress=True):
         """
         :param endpoint: rest endpoint
+        :param base_url: API base url, defaults to `SSD_API_BASE_URL` env var or JPL SSD API
+        :param pool_connections: number of host pools to cache
+        :param pool_maxsize: max connections kept alive per host
+        :param keep_alive: reuse connections between calls, False sends `Connection: close`
+        :param timeout: (connect, read) timeout in seconds
+        :param max_retries: retries on connection errors and `retry_statuses`
+        :param backoff_factor: exponential backoff factor between retries
+        :param retry_statuses: http status codes which are retried
+        :param session: existing session to share, it is not closed by this client
+        :param cache: `app.cache.ResponseCache` serving repeated GET calls, None disables caching
+        :param metrics: `app.metrics.Metrics` recording per phase timings of every request, None disables timings
+        :param single_flight: `app.single_flight.SingleFlight` sharing one in-flight GET between concurrent
+                              identical calls, can be shared between clients, None disables deduplication
+        :param adaptive: pace requests with the process wide `app.throttle.AdaptiveThrottle` of the host,
+                         `retry_statuses` are then retried by the client once the throttle lets them through
+        :param compress: accept brotli (when urllib3 decodes it), gzip & deflate response bodies, decoded transparently,
+                         False asks for uncompressed bodies
         """
         self.endpoint = endpoint
         self._validate_endpoint()
-        self.base_url = "https://ssd-api.jpl.nasa.gov/"
+        self.base_url = base_url or default_base_url()
         self.endpoint_url = self.base_url + endpoint
+        self.timeout = timeout
+        self.cache = cache
+        self.max_retries = max_retries
+        self.retry_statuses = retry_statuses
+        self.throttle = host_throttle(self.base_url) if adaptive else None
+        self._owns_session = session is None
+        # throttled clients retry statuses themselves, the throttle has to see every 429/503
+        self.session = session or self._build_session(pool_connections, pool_maxsize, keep_alive,
+                                                      max_retries, backoff_factor,
+                                                      () if adaptive else retry_statuses,
+                                                      respect_retry_after=not adaptive, compress=compress)
+        self.metrics = metrics
+        self.single_flight = single_flight
+        if metrics is not None and self._owns_session:
+            # connect & tls phases are only timed on sessions built by this client
+            for adapter in set(self.session.adapters.values()):
+                instrument_adapter(adapter)
+
+    @staticmethod
+    def _build_session(pool_connections, pool_maxsize, keep_alive, max_retries, backoff_factor,
+                       retry_statuses, respect_retry_after=True, compress=True):
+        """
+        Build a pooled session with retry-with-backoff
+        """
+        retry = Retry(total=max_retries, backoff_factor=backoff_factor, status_forcelist=retry_statuses,
+                      respect_retry_after_header=respect_retry_after, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                              max_retries=retry)
+        session = Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not keep_alive:
+            session.headers['Connection'] = 'close'
+        session.headers['Accept-Encoding'] = ', '.join(content_encodings()) if compress else 'identity'
+        return session
 
     def _validate_endpoint(self):
         # check endpoint is supported
-        valid_endpoints = ["cad.api"]
-        if self.endpoint not in valid_endpoints:
+        if self.endpoint not in VALID_ENDPOINTS:
             raise ValueError(f'Check your endpoint, {self.endpoint} does not seems to be part of utils')
 
+    def _request(self, method, params=None, data=None, stream=False, headers=None):
+        """
+        a http call on endpoint through the pooled session
+        """
+        if method == 'GET' and self.single_flight is not None and not stream and not headers:
+            # concurrent identical calls share one call and its parsed Response
+            return self._coalesced(cache_key(self.endpoint_url, params), lambda: self._fetch(method, params))
+        return self._fetch(method, params, data, stream, headers)
+
+    def _coalesced(self, key, call):
+        """
+        result of call, shared with concurrent calls of the same key
+        """
+        res, shared = self.single_flight.do(key, call)
+        if shared and self.metrics is not None:
+            self.metrics.inc('cad_client_coalesced_total', (('endpoint', self.endpoint),))
+        return res
+
+    def _fetch(self, method, params=None, data=None, stream=False, headers=None):
+        """
+        a http call on endpoint, served from cache when enabled
+        """
+        timing = self.metrics.timing(self.endpoint, method) if self.metrics is not None else None
+        if method == 'GET' and self.cache is not None and not stream and not headers:
+            return self._cached_get(params, timing)
+        res = self._send(method, params=params, data=data, stream=stream, headers=headers, timing=timing)
+        return Response(res, stream=stream, timing=timing)
+
+    def _send(self, method, params=None, data=None, stream=False, headers=None, timing=None):
+        """
+        session request, paced by the throttle when adaptive
+        """
+        if self.throttle is None:
+            return self._session_request(method, params, data, stream, headers, timing)
+        for attempt in range(self.max_retries + 1):
+            started_at = self.throttle.acquire()
+            try:
+                res = self._session_request(method, params, data, stream, headers, timing)
+            except Exception:
+                self.throttle.release(started_at)
+                raise
+            self.throttle.release(started_at, res.status_code, parse_retry_after(res.headers.get('Retry-After')))
+            if res.status_code not in self.retry_statuses or attempt == self.max_retries:
+                return res
+            res.close()
+
+    def _session_request(self, method, params=None, data=None, stream=False, headers=None, timing=None):
+        """
+        session request, with connect/tls/wait/download phases stored on timing when given
+        """
+        if timing is None:
+            return self.session.request(method, self.endpoint_url, params=params, data=data, timeout=self.timeout,
+                                        stream=stream, headers=headers)
+        reset_connection_timings()
+        start = time.perf_counter()
+        res = self.session.request(method, self.endpoint_url, params=params, data=data, timeout=self.timeout,
+                                   stream=stream, headers=headers)
+        total = time.perf_counter() - start
+        connect, tls = connection_timings()
+        # `elapsed` ends once headers are parsed, a non streamed body is read after it
+        elapsed = res.elapsed.total_seconds()
+        timing.phases.update(connect=connect, tls=tls, wait=max(0, elapsed - connect - tls))
+        if not stream:
+            timing.phases['download'] = max(0, total - elapsed)
+            # bytes pulled off the socket, before content decoding
+            timing.wire_bytes = res.raw.tell()
+        return res
+
+    def _cached_content(self, params, timing=None, revalidate=False):
+        """
+        GET body served from cache while fresh, stale entries are revalidated with their ETag/Last-Modified
+        :param revalidate: revalidate the entry even while fresh, without counting a cache lookup
+        :return: (RawResponse or http response of an error, http response or None when served from cache)
+        """
+        key = cache_key(self.endpoint_url, params)
+        if revalidate:
+            entry = self.cache.store.get(key)
+        else:
+            entry, fresh = self.cache.lookup(key)
+            if fresh:
+                return RawResponse(entry.code, entry.content), None
+        headers = {}
+        if entry is not None and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        res = self._send('GET', params=params, headers=headers, timing=timing)
+        if res.status_code == HTTPStatus.NOT_MODIFIED and entry is not None:
+            entry = self.cache.refresh(key, self.endpoint, entry)
+        elif res.status_code == HTTPStatus.OK:
+            entry = self.cache.store_response(key, self.endpoint, res.status_code, res.content, res.headers)
+        else:
+            # errors are not cached
+            return res, res
+        return RawResponse(entry.code, entry.content), res
+
+    def _cached_get(self, params, timing=None):
+        """
+        GET served from cache, see `_cached_content`
+        """
+        content, res = self._cached_content(params, timing)
+        # fresh hits make no request, see cache stats
+        return Response(content, timing=timing if res is not None else None)
+
     def head(self, params=None):
         """
         a http call to check stats of endpoint
         """
-        res = head(self.endpoint_url, params=params)
-        return Response(res)
+        return self._request('HEAD', params=params)
 
-    def get(self, params=None):
+    def get(self, params=None, stream=False, headers=None):
         """
         a http call to retrieve data for  endpoint
+        :param stream: parse response body incrementally, see `Response`
+        :param headers: extra request headers, e.g. `If-None-Match`; bypasses the response cache
         """
-        res = get(self.endpoint_url, params=params)
-        return Response(res)
+        return self._request('GET', params=params, stream=stream, headers=headers)
+
+    def get_content(self, params=None, revalidate=False):
+        """
+        a http call to retrieve the undecoded body of endpoint, e.g. to decode it in another process or serve it as is,
+        served from cache & shared with concurrent identical calls when enabled, like `get`
+        :param revalidate: revalidate a cached body even while fresh, e.g. to refresh it before it expires
+        :return: RawResponse of status code & body bytes
+        """
+        if self.single_flight is not None:
+            return self._coalesced(('content', cache_key(self.endpoint_url, params)),
+                                   lambda: self._fetch_content(params, revalidate))
+        return self._fetch_content(params, revalidate)
+
+    def _fetch_content(self, params, revalidate=False):
+        timing = self.metrics.timing(self.endpoint, 'GET') if self.metrics is not None else None
+        if self.cache is not None:
+            content, res = self._cached_content(params, timing, revalidate)
+        else:
+            content = res = self._send('GET', params=params, timing=timing)
+        if res is not None and timing is not None:
+            # bodies are not decoded, only transfer phases are timed
+            timing.status = res.status_code
+            timing.bytes = len(res.content)
+            timing.record()
+        return RawResponse(content.status_code, content.content)
 
     def post(self, data=None, params=None):
         """
         a http call to create resource on endpoint
         """
-        res = post(self.endpoint_url, data=data, params=params)
-        return Response(res)
+        return self._request('POST', params=params, data=data)
 
     def delete(self, params=None):
         """
         a http call to delete resource on endpoint
         """
-        res = delete(self.endpoint_url, params=params)
-        return Response(res)
+        return self._request('DELETE', params=params)
+
+    def close(self):
+        """
+        Release pooled connections, shared sessions are left to their owner
+        """
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
 
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,95 @@
+"""
+Content codings negotiated with the API & codecs of stored responses and snapshots
+"""
+import gzip
+import threading
+import zlib
+from collections import namedtuple
+
+import urllib3.response
+
+# codec of stored bytes
+Codec = namedtuple('Codec', 'name compress decompress')
+# zlib level of stored bytes, favours speed, CAD payloads compress well even at low levels
+ZLIB_LEVEL = 1
+ZSTD_LEVEL = 3
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+# zstd compressor & decompressor of each thread, their instances are not thread safe
+_zstd = threading.local()
+
+
+def _zstd_compress(data):
+    if not hasattr(_zstd, 'compressor'):
+        _zstd.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return _zstd.compressor.compress(data)
+
+
+def _zstd_decompress(data):
+    if not hasattr(_zstd, 'decompressor'):
+        _zstd.decompressor = zstandard.ZstdDecompressor()
+    return _zstd.decompressor.decompress(data)
+
+
+def _codecs():
+    """
+    Installed storage codecs, fastest first
+    """
+    codecs = {}
+    if zstandard is not None:
+        codecs['zstd'] = Codec('zstd', _zstd_compress, _zstd_decompress)
+    if lz4 is not None:
+        codecs['lz4'] = Codec('lz4', lz4.frame.compress, lz4.frame.decompress)
+    codecs['zlib'] = Codec('zlib', lambda data: zlib.compress(data, ZLIB_LEVEL), zlib.decompress)
+    codecs['none'] = Codec('none', bytes, bytes)
+    return codecs
+
+
+CODECS = _codecs()
+
+
+def get_codec(name=None):
+    """
+    :param name: key of CODECS, None for the fastest installed, zstd or lz4 falling back to zlib
+    :return: Codec
+    """
+    if name is None:
+        return next(iter(CODECS.values()))
+    if name not in CODECS:
+        raise ValueError(f'Codec {name} is not installed, available: {list(CODECS)}')
+    return CODECS[name]
+
+
+def content_encodings():
+    """
+    Content codings the client can decode, preferred first: brotli when urllib3 decodes it, gzip & deflate
+
+    urllib3 decodes `br` from 1.25 on and only when brotli is installed, it defines `BrotliDecoder` then;
+    advertising it otherwise would get bodies requests hands over undecoded.
+    """
+    return (['br'] if hasattr(urllib3.response, 'BrotliDecoder') else []) + ['gzip', 'deflate']
+
+
+def encode_content(body, encoding):
+    """
+    Encode a body with an http content coding, e.g. by the stub server
+    :param encoding: `gzip`, `deflate` or `br`
+    """
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    if encoding == 'deflate':
+        return zlib.compress(body)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=5)
+    raise ValueError(f'Unsupported content encoding {encoding}')
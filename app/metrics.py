@@ -0,0 +1,223 @@
+"""
+Opt-in per request timings of APIClient & Response, exposed as counters & histograms
+"""
+import bisect
+import threading
+import time
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# request phases, in order
+# connect: DNS resolution & TCP connect of a new connection, 0 on a reused one
+# tls: TLS handshake of a new https connection
+# wait: request sent until response headers, server time & retries included
+# download: body read
+# decode: UTF-8 decode of body
+# parse: json.loads of decoded body
+PHASES = ('connect', 'tls', 'wait', 'download', 'decode', 'parse')
+# histogram upper bounds in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# connection setup timings of the current thread, set by Timed*Connection
+_connection_timings = threading.local()
+
+
+def reset_connection_timings():
+    _connection_timings.connect = 0
+    _connection_timings.tls = 0
+
+
+def connection_timings():
+    """
+    :return: (connect, tls) seconds spent opening connections by current thread since last reset
+    """
+    return getattr(_connection_timings, 'connect', 0), getattr(_connection_timings, 'tls', 0)
+
+
+class TimedHTTPConnection(HTTPConnection):
+    """
+    HTTPConnection recording DNS + TCP connect time
+    """
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            _connection_timings.connect = getattr(_connection_timings, 'connect', 0) + time.perf_counter() - start
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    """
+    HTTPSConnection recording DNS + TCP connect time & TLS handshake time
+    """
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            self._tcp_time = time.perf_counter() - start
+            _connection_timings.connect = getattr(_connection_timings, 'connect', 0) + self._tcp_time
+
+    def connect(self):
+        self._tcp_time = 0
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            tls = time.perf_counter() - start - self._tcp_time
+            _connection_timings.tls = getattr(_connection_timings, 'tls', 0) + tls
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+def instrument_adapter(adapter):
+    """
+    Make connections of a requests HTTPAdapter record their setup time
+    """
+    adapter.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool,
+                                                  'https': TimedHTTPSConnectionPool}
+
+
+class RequestTiming:
+    """
+    Timings of one request, filled in by APIClient & Response and recorded once the body is parsed
+    """
+    __slots__ = ('metrics', 'endpoint', 'method', 'status', 'phases', 'bytes', 'wire_bytes', 'rows')
+
+    def __init__(self, metrics, endpoint, method):
+        self.metrics = metrics
+        self.endpoint = endpoint
+        self.method = method
+        self.status = None
+        self.phases = {}
+        self.bytes = 0
+        # body bytes read off the socket, smaller than `bytes` for a compressed body
+        self.wire_bytes = 0
+        self.rows = 0
+
+    def record(self):
+        self.metrics.record(self)
+
+    def __repr__(self):
+        return (f'RequestTiming({self.endpoint} {self.method} {self.status}, phases={self.phases}, '
+                f'bytes={self.bytes}, wire_bytes={self.wire_bytes}, rows={self.rows})')
+
+
+class Histogram:
+    """
+    Cumulative bucket counts, sum & count of observed values
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    Thread safe registry of client counters & per phase histograms
+
+    - `cad_client_requests_total{endpoint,method,status}`
+    - `cad_client_phase_seconds{endpoint,phase}` histogram
+    - `cad_client_response_bytes_total{endpoint}` decoded body bytes
+    - `cad_client_response_wire_bytes_total{endpoint}` body bytes on the wire, compressed when negotiated
+    - `cad_client_response_rows_total{endpoint}`
+    - `cad_client_coalesced_total{endpoint}` calls served by another in-flight identical call
+
+    Usage::
+
+        metrics = Metrics(callback=print)
+        client = APIClient(metrics=metrics)
+        client.get()
+        print(metrics.to_prometheus())
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, callback=None):
+        """
+        :param buckets: histogram upper bounds in seconds
+        :param callback: called with every recorded RequestTiming
+        """
+        self.buckets = tuple(buckets)
+        self.callback = callback
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def timing(self, endpoint, method):
+        """
+        :return: new RequestTiming recorded into this registry
+        """
+        return RequestTiming(self, endpoint, method)
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(self.buckets)
+            self.histograms[key].observe(value)
+
+    def record(self, timing):
+        """
+        Record a finished request
+        """
+        endpoint = (('endpoint', timing.endpoint),)
+        self.inc('cad_client_requests_total', endpoint + (('method', timing.method), ('status', str(timing.status))))
+        for phase in PHASES:
+            if phase in timing.phases:
+                self.observe('cad_client_phase_seconds', endpoint + (('phase', phase),), timing.phases[phase])
+        self.inc('cad_client_response_bytes_total', endpoint, timing.bytes)
+        self.inc('cad_client_response_wire_bytes_total', endpoint, timing.wire_bytes)
+        self.inc('cad_client_response_rows_total', endpoint, timing.rows)
+        if self.callback is not None:
+            self.callback(timing)
+
+    def to_prometheus(self):
+        """
+        Registry in Prometheus text exposition format
+        """
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            typed = set()
+            for (name, labels), value in counters:
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f'# TYPE {name} counter')
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+            for (name, labels), histogram in histograms:
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f'# TYPE {name} histogram')
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {histogram.sum}')
+                lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}' if labels else ''
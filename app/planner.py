@@ -0,0 +1,283 @@
+import datetime
+import heapq
+import math
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from app.client import APIClient, CloseApproachBodies, Response
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+# cad.api sort keys and the column each one orders by
+SORT_COLUMNS = {
+    'date': 'jd',
+    'dist': 'dist',
+    'dist-min': 'dist_min',
+    'v-inf': 'v_inf',
+    'v-rel': 'v_rel',
+    'h': 'h',
+    'object': 'des',
+}
+# initial row density guess used to size shards, refined by splitting oversized shards
+DEFAULT_ROWS_PER_DAY = 10
+# shards are not split below this width
+MIN_SHARD_WIDTH = datetime.timedelta(minutes=1)
+
+_Shard = namedtuple('_Shard', 'start end future')
+
+
+class ShardFailed(Exception):
+    """
+    Raised when a shard query is not answered with HTTPStatus.OK (200)
+    """
+
+    def __init__(self, response):
+        super().__init__(f'shard query failed with {response.code}')
+        self.response = response
+
+
+def parse_date(value, now=None):
+    """
+    Parse cad.api date-min/date-max value
+    :param value: `now`, `+D` days from now, `YYYY-MM-DD` or `YYYY-MM-DDThh:mm[:ss]`
+    :param now: reference time for `now` & `+D`, defaults to current UTC time
+    :return: datetime
+    """
+    now = now or datetime.datetime.utcnow().replace(microsecond=0)
+    value = str(value)
+    if value == 'now':
+        return now
+    if value.startswith('+'):
+        return now + datetime.timedelta(days=int(value[1:]))
+    for date_format in ('%Y-%m-%d', '%Y-%m-%dT%H:%M', DATE_FORMAT):
+        try:
+            return datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    raise ValueError(f'Unsupported date value {value}')
+
+
+class ShardedResult:
+    """
+    Signature, fields & ordered row iterator of a sharded query
+    """
+
+    def __init__(self, signature, fields, rows):
+        self.signature = signature
+        self.fields = fields
+        self.rows = rows
+
+    def __iter__(self):
+        return self.rows
+
+
+class QueryPlanner:
+    """
+    Splits large cad.api queries into date-range (and optionally body) shards,
+    runs them concurrently and merges them back into one ordered, de-duplicated stream
+
+    Shards are sized from a row density estimate; a shard returning more than
+    `max_rows_per_shard` rows is split in half and re-queried, so oversized shards only
+    cost a request capped at `max_rows_per_shard + 1` rows.
+    """
+
+    def __init__(self, client=None, max_rows_per_shard=5000, max_workers=8, rows_per_day=DEFAULT_ROWS_PER_DAY,
+                 split_bodies=False):
+        """
+        :param client: APIClient used for shard queries, defaults to a new pooled client
+        :param max_rows_per_shard: max rows fetched by one shard
+        :param max_workers: number of shards queried concurrently
+        :param rows_per_day: estimated rows per day, used to size initial shards
+        :param split_bodies: query every body separately when body is `ALL`
+        """
+        self._owns_client = client is None
+        self.client = client or APIClient(pool_maxsize=max_workers)
+        self.max_rows_per_shard = max_rows_per_shard
+        self.max_workers = max_workers
+        self.rows_per_day = rows_per_day
+        self.split_bodies = split_bodies
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def plan(self, start, end):
+        """
+        Split window into shards sized by estimated row count
+        :param start: window start datetime
+        :param end: window end datetime
+        :return: list of (start, end) shard windows, neighbours share their boundary
+        """
+        days = (end - start).total_seconds() / 86400
+        num_shards = max(1, math.ceil(days * self.rows_per_day / self.max_rows_per_shard))
+        num_shards = min(num_shards, max(1, int((end - start) / MIN_SHARD_WIDTH)))
+        step = (end - start) / num_shards
+        bounds = [start + step * i for i in range(num_shards)] + [end]
+        bounds = [bound.replace(microsecond=0) for bound in bounds]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def _fetch(self, params, start, end, limit):
+        shard_params = dict(params, **{'date-min': start.strftime(DATE_FORMAT), 'date-max': end.strftime(DATE_FORMAT)})
+        if limit:
+            shard_params['limit'] = limit
+        return self.client.get(params=shard_params)
+
+    def _submit(self, params, start, end, limit=None):
+        return self._pool.submit(self._fetch, params, start, end, limit)
+
+    def _iter_shards(self, params, windows, descending):
+        """
+        Submit every shard of windows, return generator of shard responses in window order
+        """
+        if descending:
+            windows = list(reversed(windows))
+        probe_limit = self.max_rows_per_shard + 1
+        pending = deque(_Shard(start, end, self._submit(params, start, end, probe_limit)) for start, end in windows)
+
+        def shard_responses():
+            while pending:
+                shard = pending.popleft()
+                res = shard.future.result()
+                if res.code != HTTPStatus.OK:
+                    raise ShardFailed(res)
+                if res.get_count() > self.max_rows_per_shard:
+                    if shard.end - shard.start > MIN_SHARD_WIDTH:
+                        # oversized shard, split in half and query both halves
+                        mid = (shard.start + (shard.end - shard.start) / 2).replace(microsecond=0)
+                        halves = [(shard.start, mid), (mid, shard.end)]
+                        if descending:
+                            halves.reverse()
+                        pending.extendleft(_Shard(start, end, self._submit(params, start, end, probe_limit))
+                                           for start, end in reversed(halves))
+                        continue
+                    # window can not be split any further, fetch it whole
+                    res = self._submit(params, shard.start, shard.end).result()
+                yield res
+
+        return shard_responses()
+
+    @staticmethod
+    def _sort_key(fields, column, descending):
+        index = fields.index(column)
+        is_numeric = column != 'des'
+
+        def key(row):
+            value = row[index]
+            if value is not None and is_numeric:
+                value = float(value)
+            # nulls sort last in both directions
+            return (value is not None, value) if descending else (value is None, value)
+
+        return key
+
+    @staticmethod
+    def _with_body(fields, rows, body):
+        # per-body queries do not return `body` column, insert it where body=ALL places it
+        index = fields.index('h') if 'h' in fields else len(fields)
+        fields = fields[:index] + ['body'] + fields[index:]
+        return fields, (row[:index] + [body] + row[index:] for row in rows)
+
+    def stream(self, params=None):
+        """
+        Run query as shards and merge them in order of the requested `sort`
+        :param params: cad.api query params as dict
+        :return: ShardedResult, raises ShardFailed if a shard is not answered with 200
+        """
+        params = dict(params or {})
+        limit = params.pop('limit', None)
+        sort = params.get('sort', 'date')
+        descending = sort.startswith('-')
+        if sort.lstrip('-') not in SORT_COLUMNS:
+            raise ValueError(f'Unsupported sort key {sort}')
+        column = SORT_COLUMNS[sort.lstrip('-')]
+        start = parse_date(params.pop('date-min', 'now'))
+        end = parse_date(params.pop('date-max', '+60'))
+        windows = self.plan(start, end)
+
+        bodies = [None]
+        if self.split_bodies and params.get('body') in ('ALL', '*'):
+            bodies = [body.name for body in CloseApproachBodies if body is not CloseApproachBodies.ALL]
+        # submit shards of every body before consuming any of them
+        shard_streams = [(body, self._iter_shards(dict(params, body=body) if body else params, windows,
+                                                  descending and column == 'jd'))
+                         for body in bodies]
+
+        signature, fields, body_rows = None, None, []
+        for body, shard_stream in shard_streams:
+            # date ordered windows are consumed lazily, other sort keys need every shard
+            shards = shard_stream if column == 'jd' else iter(list(shard_stream))
+            first = next((res for res in shards if res.get_count()), None)
+            if first is None:
+                continue
+            signature = signature or first.get_value_for_key('signature')
+            body_fields = first.get_fields()
+            if column == 'jd':
+                rows = _chain_data(first, shards)
+            else:
+                key = self._sort_key(body_fields, column, descending)
+                rows = iter(sorted(_chain_data(first, shards), key=key, reverse=descending))
+            if body:
+                body_fields, rows = self._with_body(body_fields, rows, body)
+            fields = body_fields
+            body_rows.append(rows)
+
+        if fields is None:
+            return ShardedResult(signature, None, iter(()))
+        key = self._sort_key(fields, column, descending)
+        merged = heapq.merge(*body_rows, key=key, reverse=descending)
+        return ShardedResult(signature, fields, self._dedupe(merged, fields, key, limit))
+
+    @staticmethod
+    def _dedupe(rows, fields, sort_key, limit):
+        """
+        Drop rows repeated at shard boundaries, duplicates share their sort key so only
+        keys of the current sort key run are remembered
+        """
+        key_indexes = [fields.index(name) for name in ('des', 'orbit_id', 'jd', 'body') if name in fields]
+        limit = int(limit) if limit is not None else None
+        run_key, seen, count = None, set(), 0
+        for row in rows:
+            if limit is not None and count >= limit:
+                return
+            row_sort_key = sort_key(row)
+            if row_sort_key != run_key:
+                run_key, seen = row_sort_key, set()
+            row_key = tuple(row[index] for index in key_indexes)
+            if row_key in seen:
+                continue
+            seen.add(row_key)
+            count += 1
+            yield row
+
+    def get(self, params=None):
+        """
+        Sharded counterpart of `APIClient.get`
+        :param params: cad.api query params as dict
+        :return: Response with merged data, or the first failed shard Response
+        """
+        try:
+            result = self.stream(params)
+            data = list(result)
+        except ShardFailed as error:
+            return error.response
+        content = {'signature': result.signature, 'count': str(len(data))}
+        if data:
+            content.update({'fields': result.fields, 'data': data})
+        return Response.from_json(content)
+
+    def close(self):
+        self._pool.shutdown()
+        if self._owns_client:
+            self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _chain_data(first, shards):
+    """
+    rows of first response followed by rows of remaining shard responses
+    """
+    yield from first.get_data()
+    for res in shards:
+        yield from res.get_data() or []
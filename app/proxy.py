@@ -0,0 +1,282 @@
+"""
+Local caching proxy fronting cad.api for many consumers
+
+usage: python -m app.proxy [--port 8080] [--upstream URL] [--cache-db PATH] [--prefetch-interval S] [--adaptive]
+"""
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from requests import RequestException
+
+from app.cache import MemoryCache, ResponseCache, SQLiteCache, TieredCache, cache_key
+from app.client import BASE_URL_ENV, APIClient, RawResponse, default_base_url
+from app.compression import get_codec
+from app.metrics import Metrics
+from app.single_flight import SingleFlight
+
+# query params of windows kept warm whatever their traffic, `{}` is the cad.api default 60 days Earth window
+DEFAULT_PREFETCH = ({},)
+# seconds between prefetch passes
+PREFETCH_INTERVAL = 10
+# fraction of the endpoint ttl before expiry at which a window is refreshed
+PREFETCH_AHEAD = 0.1
+# requests between two prefetch passes from which a window is popular and kept warm
+POPULAR_REQUESTS = 3
+# max popular windows refreshed per pass
+MAX_POPULAR = 16
+
+
+class ProxyStats:
+    """
+    Request counters of a CADProxy, cache & coalescing counters are those of its client
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.upstream_requests = 0
+        self.upstream_errors = 0
+        self.upstream_seconds = 0
+        self.upstream_max_seconds = 0
+        self.prefetches = 0
+        self.prefetch_errors = 0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        return f'ProxyStats({self.as_dict()})'
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps consumer connections alive between requests
+    protocol_version = 'HTTP/1.1'
+    # headers & body are written separately, avoid Nagle delays on kept-alive connections
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        # silence per request stderr logging
+        pass
+
+    def _send(self, code, body, content_type='application/json'):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_GET(self):
+        proxy = self.server.proxy
+        url = urlsplit(self.path)
+        if url.path == '/cad.api':
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            self._send(*proxy.serve(params))
+        elif url.path == '/stats':
+            self._send(HTTPStatus.OK, json.dumps(proxy.report()).encode())
+        elif url.path == '/metrics':
+            self._send(HTTPStatus.OK, proxy.metrics.to_prometheus().encode(), content_type='text/plain; version=0.0.4')
+        else:
+            self._send(HTTPStatus.NOT_FOUND, b'')
+
+    do_HEAD = do_GET
+
+
+class CADProxy:
+    """
+    Long-running local proxy exposing the cad.api query interface of its upstream
+
+    Every consumer request goes through one `APIClient` with a shared `ResponseCache`, so repeated
+    queries are served from cache and revalidated with their ETag once stale, and a `SingleFlight`
+    group, so concurrent identical misses make one upstream request. Bodies are served as cached,
+    without being decoded. A background thread refreshes the `prefetch` windows and the windows
+    requested at least `popular_requests` times since its previous pass before they expire.
+
+    `/stats` reports hit ratio, coalesced requests & upstream latency as json, `/metrics` the
+    client & proxy metrics in Prometheus text format.
+
+    Usage::
+
+        with CADProxy(upstream='https://ssd-api.jpl.nasa.gov/') as proxy:
+            APIClient(base_url=proxy.url).get(params={'dist-max': '10LD'})
+    """
+
+    def __init__(self, upstream=None, host='127.0.0.1', port=0, cache=None, prefetch=DEFAULT_PREFETCH,
+                 prefetch_interval=PREFETCH_INTERVAL, prefetch_ahead=PREFETCH_AHEAD,
+                 popular_requests=POPULAR_REQUESTS, adaptive=False, pool_maxsize=32):
+        """
+        :param upstream: base url of the proxied API, defaults to `SSD_API_BASE_URL` env var or JPL SSD API
+        :param host: bind host
+        :param port: bind port, 0 picks a free port
+        :param cache: `app.cache.ResponseCache` shared by every consumer, defaults to an in-memory cache
+        :param prefetch: query params of windows kept warm
+        :param prefetch_interval: seconds between prefetch passes, None disables prefetching
+        :param prefetch_ahead: fraction of the endpoint ttl before expiry at which windows are refreshed
+        :param popular_requests: requests between two passes from which a window is prefetched, None disables
+        :param adaptive: pace upstream requests with `app.throttle.AdaptiveThrottle`
+        :param pool_maxsize: upstream connections kept alive
+        """
+        self.stats = ProxyStats()
+        self.metrics = Metrics(callback=self._upstream_done)
+        self.cache = cache if cache is not None else ResponseCache()
+        self.client = APIClient(base_url=upstream or default_base_url(), pool_maxsize=pool_maxsize, cache=self.cache,
+                                metrics=self.metrics, single_flight=SingleFlight(), adaptive=adaptive)
+        self.prefetch = [dict(params) for params in prefetch]
+        self.prefetch_interval = prefetch_interval
+        self.prefetch_ahead = prefetch_ahead
+        self.popular_requests = popular_requests
+        self._lock = threading.Lock()
+        self._requested = Counter()
+        self._stopped = threading.Event()
+        self._httpd = ThreadingHTTPServer((host, port), _ProxyHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.proxy = self
+        self._threads = []
+
+    @property
+    def url(self):
+        """
+        base url of proxy, compatible with `APIClient.base_url`
+        """
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def _upstream_done(self, timing):
+        latency = sum(timing.phases.values())
+        with self._lock:
+            self.stats.upstream_requests += 1
+            self.stats.upstream_seconds += latency
+            self.stats.upstream_max_seconds = max(self.stats.upstream_max_seconds, latency)
+        self.metrics.observe('cad_proxy_upstream_seconds', (), latency)
+
+    def serve(self, params):
+        """
+        Answer a consumer query
+        :param params: cad.api query params
+        :return: RawResponse of status code & body bytes
+        """
+        with self._lock:
+            self.stats.requests += 1
+            self._requested[tuple(sorted(params.items()))] += 1
+        try:
+            res = self.client.get_content(params)
+        except RequestException as error:
+            with self._lock:
+                self.stats.upstream_errors += 1
+            res = RawResponse(HTTPStatus.BAD_GATEWAY.value,
+                              json.dumps({'message': f'Upstream request failed: {error}'}).encode())
+        self.metrics.inc('cad_proxy_requests_total', (('status', str(res.status_code)),))
+        return res
+
+    def _popular(self):
+        """
+        Windows requested at least `popular_requests` times since the previous call
+        """
+        with self._lock:
+            requested, self._requested = self._requested, Counter()
+        if self.popular_requests is None:
+            return []
+        return [dict(params) for params, count in requested.most_common(MAX_POPULAR)
+                if count >= self.popular_requests]
+
+    def _expiring(self, params):
+        key = cache_key(self.client.endpoint_url, params)
+        entry = self.cache.store.get(key)
+        ahead = self.prefetch_ahead * self.cache.ttl(self.client.endpoint)
+        return entry is None or entry.expires_at - time.time() < ahead
+
+    def prefetch_pass(self):
+        """
+        Refresh prefetch & popular windows missing from cache or about to expire
+        :return: number of refreshed windows
+        """
+        windows = self.prefetch + [params for params in self._popular() if params not in self.prefetch]
+        refreshed = 0
+        for params in windows:
+            if not self._expiring(params):
+                continue
+            try:
+                self.client.get_content(params, revalidate=True)
+            except RequestException:
+                with self._lock:
+                    self.stats.prefetch_errors += 1
+                continue
+            refreshed += 1
+        with self._lock:
+            self.stats.prefetches += refreshed
+        return refreshed
+
+    def _prefetch_loop(self):
+        while True:
+            self.prefetch_pass()
+            if self._stopped.wait(self.prefetch_interval):
+                return
+
+    def report(self):
+        """
+        :return: dict of proxy, cache & coalescing counters, hit ratio & mean upstream latency
+        """
+        stats = self.stats.as_dict()
+        cache = self.cache.stats.as_dict()
+        coalesced = self.client.single_flight.stats.coalesced
+        stats.update(cache, coalesced=coalesced)
+        stats['hit_ratio'] = cache['hits'] / stats['requests'] if stats['requests'] else 0
+        stats['upstream_mean_seconds'] = (stats['upstream_seconds'] / stats['upstream_requests']
+                                          if stats['upstream_requests'] else 0)
+        return stats
+
+    def start(self):
+        self._stopped.clear()
+        self._threads = [threading.Thread(target=self._httpd.serve_forever, daemon=True)]
+        if self.prefetch_interval is not None:
+            self._threads.append(threading.Thread(target=self._prefetch_loop, daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        for thread in self._threads:
+            thread.join()
+        self.client.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1', help='Bind host')
+    parser.add_argument('--port', type=int, default=8080, help='Bind port')
+    parser.add_argument('--upstream', default=None, help=f'Upstream base url, defaults to {BASE_URL_ENV} or JPL')
+    parser.add_argument('--cache-db', default=None, help='SQLite file persisting the cache, memory only otherwise')
+    parser.add_argument('--prefetch-interval', type=float, default=PREFETCH_INTERVAL,
+                        help='Seconds between prefetch passes')
+    parser.add_argument('--adaptive', action='store_true', help='Pace upstream requests adaptively')
+    args = parser.parse_args()
+
+    store = MemoryCache()
+    if args.cache_db:
+        store = TieredCache(store, SQLiteCache(args.cache_db, codec=get_codec().name))
+    proxy = CADProxy(upstream=args.upstream, host=args.host, port=args.port, cache=ResponseCache(store),
+                     prefetch_interval=args.prefetch_interval, adaptive=args.adaptive)
+    print(f'Proxying {proxy.client.base_url} on {proxy.url}, point clients at it with {BASE_URL_ENV}={proxy.url}')
+    with proxy:
+        try:
+            proxy._threads[0].join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
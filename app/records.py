@@ -0,0 +1,121 @@
+"""
+Compact typed record of a cad.api row and a lazy row view decoding rows on access
+"""
+import datetime
+from collections.abc import Sequence
+
+# `cd` format & month numbers, shared with utils.cad_table, kept here so the client does not import numpy
+CD_FORMAT = '%Y-%b-%d %H:%M'
+MONTHS = {name: number for number, name in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+def _datetime(value):
+    if value is None:
+        return None
+    # fixed width `YYYY-Mon-DD hh:mm` is sliced, several times faster than strptime
+    if len(value) == 17 and value[5:8] in MONTHS:
+        return datetime.datetime(int(value[:4]), MONTHS[value[5:8]], int(value[9:11]), int(value[12:14]),
+                                 int(value[15:17]))
+    return datetime.datetime.strptime(value, CD_FORMAT)
+
+
+# record attribute -> decoder of the served string, attributes are named after cad.api fields
+FIELD_DECODERS = {
+    'des': None,
+    'orbit_id': None,
+    'jd': _float,
+    'cd': _datetime,
+    'dist': _float,
+    'dist_min': _float,
+    'dist_max': _float,
+    'v_rel': _float,
+    'v_inf': _float,
+    't_sigma_f': None,
+    'body': None,
+    'h': _float,
+    'diameter': _float,
+    'diameter_sigma': _float,
+    'fullname': None,
+}
+
+
+class CloseApproach:
+    """
+    One close approach with typed attributes: floats for distances, velocities, `h` & `jd`,
+    datetime for `cd`, strings otherwise and None for nulls or fields absent from the query
+    """
+    __slots__ = tuple(FIELD_DECODERS)
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.pop(name, None))
+        if values:
+            raise TypeError(f'Unknown CloseApproach fields {sorted(values)}')
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return isinstance(other, CloseApproach) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        values = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__
+                           if getattr(self, name) is not None)
+        return f'CloseApproach({values})'
+
+
+def record_decoder(fields):
+    """
+    Decoder of rows served with fields into CloseApproach, unknown fields are skipped
+    :param fields: cad.api `fields`
+    :return: function of a row returning a CloseApproach
+    """
+    plan = [(index, name, FIELD_DECODERS[name]) for index, name in enumerate(fields) if name in FIELD_DECODERS]
+    missing = [name for name in CloseApproach.__slots__ if name not in fields]
+    new = CloseApproach.__new__
+
+    def decode(row):
+        record = new(CloseApproach)
+        for index, name, decoder in plan:
+            value = row[index]
+            setattr(record, name, value if decoder is None or value is None else decoder(value))
+        for name in missing:
+            setattr(record, name, None)
+        return record
+
+    return decode
+
+
+class CloseApproachView(Sequence):
+    """
+    Read only sequence of CloseApproach over cad.api rows, a row is decoded each time it is accessed
+    and no decoded record is kept
+    """
+
+    def __init__(self, rows, fields):
+        """
+        :param rows: cad.api `data` rows
+        :param fields: cad.api `fields`
+        """
+        self.rows = rows
+        self.fields = fields
+        self._decode = record_decoder(fields)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return CloseApproachView(self.rows[index], self.fields)
+        return self._decode(self.rows[index])
+
+    def __iter__(self):
+        return map(self._decode, self.rows)
+
+    def __repr__(self):
+        return f'CloseApproachView({len(self)} rows)'
@@ -0,0 +1,112 @@
+"""
+Single-flight deduplication: concurrent identical calls share one in-flight call and its result
+"""
+import asyncio
+import threading
+
+
+class SingleFlightStats:
+    """
+    Call counters of a single-flight group
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        return f'SingleFlightStats({self.as_dict()})'
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Thread safe single-flight group: while a call for a key is in flight, callers of the same key
+    wait for it and get its result (or its exception) instead of making their own call
+    """
+
+    def __init__(self):
+        self.stats = SingleFlightStats()
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, call):
+        """
+        :param key: call key, e.g. `app.cache.cache_key` of url & params
+        :param call: no argument callable
+        :return: (result, shared), shared is True when result came from another caller's call
+        """
+        with self._lock:
+            self.stats.calls += 1
+            in_flight = self._calls.get(key)
+            if in_flight is None:
+                in_flight = self._calls[key] = _Call()
+                leader = True
+            else:
+                self.stats.coalesced += 1
+                leader = False
+        if not leader:
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.result, True
+        try:
+            in_flight.result = call()
+        except BaseException as error:
+            in_flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            in_flight.done.set()
+        return in_flight.result, False
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of `SingleFlight`, for coroutines of one event loop
+    """
+
+    def __init__(self):
+        self.stats = SingleFlightStats()
+        self._calls = {}
+
+    async def do(self, key, call):
+        """
+        :param key: call key
+        :param call: no argument coroutine function
+        :return: (result, shared)
+        """
+        self.stats.calls += 1
+        in_flight = self._calls.get(key)
+        if in_flight is not None:
+            self.stats.coalesced += 1
+            # shielded, a cancelled waiter does not cancel the shared call
+            return await asyncio.shield(in_flight), True
+        in_flight = self._calls[key] = asyncio.get_event_loop().create_future()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            in_flight.cancel()
+            raise
+        except BaseException as error:
+            in_flight.set_exception(error)
+            # retrieved, no "exception was never retrieved" warning without waiters
+            in_flight.exception()
+            raise
+        else:
+            in_flight.set_result(result)
+        finally:
+            del self._calls[key]
+        return result, False
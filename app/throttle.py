@@ -0,0 +1,145 @@
+"""
+Adaptive per host request throttle: token bucket rate + AIMD concurrency window
+"""
+import email.utils
+import threading
+import time
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+# statuses meaning the host is overloaded, answered by halving rate & window
+THROTTLE_STATUSES = (HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.SERVICE_UNAVAILABLE)
+# latency EWMA above this multiple of the lowest seen latency, plus slack seconds, stops increases
+LATENCY_TOLERANCE = 2.0
+# slack keeps sub-millisecond jitter of local or cached responses from reading as congestion
+LATENCY_SLACK = 0.01
+LATENCY_EWMA_WEIGHT = 0.2
+
+_host_throttles = {}
+_host_throttles_lock = threading.Lock()
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header, seconds or http date
+    :return: seconds to wait, None when missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class AdaptiveThrottle:
+    """
+    Thread safe throttle of the requests to one host
+
+    A request waits for a slot of the concurrency window and a token of the rate bucket.
+    Healthy completions (2xx-4xx with latency close to the lowest seen) grow the window by one
+    slot per window of completions and the rate by about one request/sec per second (additive
+    increase). 429/503 and 5xx halve both (multiplicative decrease), once per congestion event,
+    and a Retry-After pauses every request to the host until it has elapsed.
+    """
+
+    def __init__(self, initial_rate=10, min_rate=1, max_rate=200, initial_window=4, min_window=1, max_window=64):
+        """
+        :param initial_rate: starting requests/sec
+        :param min_rate: requests/sec floor
+        :param max_rate: requests/sec ceiling
+        :param initial_window: starting max in-flight requests
+        :param min_window: in-flight floor
+        :param max_window: in-flight ceiling
+        """
+        self.rate = float(initial_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.window = float(initial_window)
+        self.min_window = min_window
+        self.max_window = max_window
+        self.in_flight = 0
+        self.throttled = 0
+        self.latency = None
+        self.min_latency = None
+        self._tokens = 1.0
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0
+        self._last_decrease = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Wait for a window slot & a rate token
+        :return: request start time, passed back to `release`
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self._blocked_until > now:
+                    self._condition.wait(self._blocked_until - now)
+                    continue
+                if self.in_flight >= int(self.window):
+                    self._condition.wait()
+                    continue
+                self._tokens = min(max(1.0, self.rate), self._tokens + (now - self._refilled_at) * self.rate)
+                self._refilled_at = now
+                if self._tokens < 1:
+                    self._condition.wait((1 - self._tokens) / self.rate)
+                    continue
+                self._tokens -= 1
+                self.in_flight += 1
+                return now
+
+    def release(self, started_at, status=None, retry_after=None):
+        """
+        Free the slot of a finished request and adapt rate & window
+        :param started_at: value returned by `acquire`
+        :param status: http status, None for a connection error
+        :param retry_after: seconds from Retry-After header
+        """
+        with self._condition:
+            now = time.monotonic()
+            self.in_flight -= 1
+            if status is None or status in THROTTLE_STATUSES or status >= HTTPStatus.INTERNAL_SERVER_ERROR:
+                if status in THROTTLE_STATUSES:
+                    self.throttled += 1
+                if retry_after:
+                    self._blocked_until = max(self._blocked_until, now + retry_after)
+                # requests started before the last decrease saw the same congestion, decrease once
+                if started_at >= self._last_decrease:
+                    self._last_decrease = now
+                    self.window = max(self.min_window, self.window / 2)
+                    self.rate = max(self.min_rate, self.rate / 2)
+            else:
+                latency = now - started_at
+                self.min_latency = latency if self.min_latency is None else min(self.min_latency, latency)
+                self.latency = latency if self.latency is None else \
+                    self.latency + LATENCY_EWMA_WEIGHT * (latency - self.latency)
+                if self.latency <= LATENCY_TOLERANCE * self.min_latency + LATENCY_SLACK:
+                    self.window = min(self.max_window, self.window + 1 / self.window)
+                    self.rate = min(self.max_rate, self.rate + 1 / self.rate)
+            self._condition.notify_all()
+
+    def as_dict(self):
+        return {'rate': self.rate, 'window': self.window, 'in_flight': self.in_flight, 'throttled': self.throttled,
+                'latency': self.latency}
+
+    def __repr__(self):
+        return f'AdaptiveThrottle({self.as_dict()})'
+
+
+def host_throttle(url, **kwargs):
+    """
+    Process wide AdaptiveThrottle of the host of url, created with kwargs on first use
+    """
+    host = urlsplit(url).netloc
+    with _host_throttles_lock:
+        if host not in _host_throttles:
+            _host_throttles[host] = AdaptiveThrottle(**kwargs)
+        return _host_throttles[host]
@@ -0,0 +1,72 @@
+"""
+Vectorised utils.analytics kernels vs a naive per row loop over cad.api rows
+
+usage: python -m benchmarks.bench_analytics [--rows N]
+"""
+import argparse
+import heapq
+import math
+import time
+
+from utils.analytics import (DEFAULT_ALBEDO, DISTANCE_UNITS, SIZE_CLASSES, convert_distance, days_until,
+                             diameter_from_h, group_by, julian_date, size_classes, top_k_closest, window_histogram)
+from utils.cad_table import CADTable
+from utils.stub_server import DATASET_FIELDS, make_cad_dataset
+
+WINDOW_DAYS = 30
+BINS = 10
+
+
+def naive_loop(rows, fields):
+    """
+    Same results as `vectorised`, one python row at a time
+    """
+    index = {name: position for position, name in enumerate(fields)}
+    now_jd = julian_date()
+    dist_ld, dist_km, days, sizes, per_body = [], [], [], [], {}
+    for row in rows:
+        dist = float(row[index['dist']])
+        dist_ld.append(dist / DISTANCE_UNITS['LD'])
+        dist_km.append(dist / DISTANCE_UNITS['km'])
+        days.append(float(row[index['jd']]) - now_jd)
+        diameter = 1329 / math.sqrt(DEFAULT_ALBEDO) * 10 ** (-float(row[index['h']]) / 5)
+        sizes.append(next(label for label, bound in SIZE_CLASSES if diameter <= bound))
+        per_body[row[index['body']]] = per_body.get(row[index['body']], 0) + 1
+    closest = heapq.nsmallest(10, rows, key=lambda row: float(row[index['dist']]))
+    jds = [float(row[index['jd']]) for row in rows]
+    dists = [float(row[index['dist']]) for row in rows]
+    first_jd = min(jds)
+    low, high = min(dists), max(dists)
+    histogram = {}
+    for jd, dist in zip(jds, dists):
+        key = (int((jd - first_jd) // WINDOW_DAYS), min(int((dist - low) / (high - low) * BINS), BINS - 1))
+        histogram[key] = histogram.get(key, 0) + 1
+    return dist_ld, dist_km, days, sizes, per_body, closest, histogram
+
+
+def vectorised(table):
+    return (convert_distance(table['dist'], 'au', 'LD'), convert_distance(table['dist'], 'au', 'km'),
+            days_until(table['jd']), diameter_from_h(table['h']), size_classes(table['h']),
+            group_by(table, 'body', 'dist'), top_k_closest(table, 10),
+            window_histogram(table, WINDOW_DAYS, 'dist', BINS))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of rows')
+    args = parser.parse_args()
+
+    rows = make_cad_dataset(args.rows)
+    start = time.perf_counter()
+    naive_loop(rows, DATASET_FIELDS)
+    print(f'{"per row loop":<22} {time.perf_counter() - start:8.3f}s for {args.rows} rows')
+    start = time.perf_counter()
+    table = CADTable.from_rows(rows, DATASET_FIELDS)
+    parsed = time.perf_counter()
+    vectorised(table)
+    print(f'{"CADTable parse":<22} {parsed - start:8.3f}s')
+    print(f'{"vectorised kernels":<22} {time.perf_counter() - parsed:8.3f}s')
+
+
+if __name__ == '__main__':
+    main()
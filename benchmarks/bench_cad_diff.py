@@ -0,0 +1,90 @@
+"""
+Vectorised utils.cad_diff of two result sets vs a per row dict join of cad.api rows
+
+usage: python -m benchmarks.bench_cad_diff [--rows N] [--changes FRACTION]
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+from utils.cad_diff import diff_snapshots, diff_tables
+from utils.cad_snapshot import save_snapshot
+from utils.cad_table import CADTable
+from utils.stub_server import DATASET_FIELDS, make_cad_dataset
+
+KEY = (DATASET_FIELDS.index('des'), DATASET_FIELDS.index('jd'))
+
+
+def revise(rows, changes=0.01, seed=0):
+    """
+    Rows of a later run: a `changes` fraction of approaches removed, as many added and twice as many
+    refined with a new orbit_id, dist & t_sigma_f
+    :return: (new rows, number of modified rows)
+    """
+    rnd = random.Random(seed)
+    orbit_id, dist, t_sigma_f = (DATASET_FIELDS.index(name) for name in ('orbit_id', 'dist', 't_sigma_f'))
+    count = int(len(rows) * changes)
+    picked = rnd.sample(range(len(rows)), 3 * count)
+    removed, modified = set(picked[:count]), picked[count:]
+    new_rows = [list(row) for row in rows]
+    for index in modified:
+        row = new_rows[index]
+        row[orbit_id] = str(int(row[orbit_id]) + 1)
+        row[dist] = f'{float(row[dist]) * rnd.uniform(0.99, 1.01):.16f}'
+        row[t_sigma_f] = '00:02'
+    new_rows = [row for index, row in enumerate(new_rows) if index not in removed]
+    new_rows += make_cad_dataset(count, seed=seed + 1, start=datetime.datetime(2300, 1, 1))
+    return new_rows, len(modified)
+
+
+def naive_diff(old_rows, new_rows):
+    """
+    Same added, removed & modified rows as `diff_tables`, one python row at a time
+    """
+    old = {(row[KEY[0]], row[KEY[1]]): row for row in old_rows}
+    added, modified, matched = [], [], set()
+    for row in new_rows:
+        key = (row[KEY[0]], row[KEY[1]])
+        before = old.get(key)
+        if before is None:
+            added.append(row)
+            continue
+        matched.add(key)
+        changed = [name for name, old_value, new_value in zip(DATASET_FIELDS, before, row) if old_value != new_value]
+        if changed:
+            modified.append((before, row, changed))
+    removed = [row for key, row in old.items() if key not in matched]
+    return added, removed, modified
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of rows')
+    parser.add_argument('--changes', type=float, default=0.01, help='Fraction of rows removed & added')
+    args = parser.parse_args()
+
+    old_rows = make_cad_dataset(args.rows)
+    new_rows, _ = revise(old_rows, args.changes)
+    start = time.perf_counter()
+    naive_diff(old_rows, new_rows)
+    print(f'{"per row dict join":<22} {time.perf_counter() - start:8.3f}s for {args.rows} rows')
+
+    start = time.perf_counter()
+    old, new = CADTable.from_rows(old_rows, DATASET_FIELDS), CADTable.from_rows(new_rows, DATASET_FIELDS)
+    parsed = time.perf_counter()
+    diff = diff_tables(old, new)
+    print(f'{"CADTable parse":<22} {parsed - start:8.3f}s')
+    print(f'{"diff_tables":<22} {time.perf_counter() - parsed:8.3f}s  {diff.summary()}')
+    with tempfile.TemporaryDirectory() as path:
+        save_snapshot(old, os.path.join(path, 'old'))
+        save_snapshot(new, os.path.join(path, 'new'))
+        start = time.perf_counter()
+        diff_snapshots(os.path.join(path, 'old'), os.path.join(path, 'new'))
+        print(f'{"diff_snapshots":<22} {time.perf_counter() - start:8.3f}s')
+
+
+if __name__ == '__main__':
+    main()
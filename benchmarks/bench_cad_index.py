@@ -0,0 +1,46 @@
+"""
+ApproachIndex range queries vs DataFrame scans
+
+usage: python -m benchmarks.bench_cad_index [--rows N] [--queries N]
+"""
+import argparse
+import random
+import time
+
+from utils.cad_index import ApproachIndex
+from utils.cad_table import CADTable
+from utils.stub_server import DATASET_FIELDS, make_cad_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of rows')
+    parser.add_argument('--queries', type=int, default=1000, help='Number of queries')
+    args = parser.parse_args()
+
+    table = CADTable.from_rows(make_cad_dataset(args.rows), DATASET_FIELDS)
+    df = table.to_pandas()
+    start = time.perf_counter()
+    index = ApproachIndex.from_table(table)
+    print(f'{"index build":<16} {time.perf_counter() - start:8.3f}s for {args.rows} rows')
+
+    rnd = random.Random(0)
+    jd_first, jd_last = table['jd'].min(), table['jd'].max()
+    queries = []
+    for _ in range(args.queries):
+        jd_min = rnd.uniform(jd_first, jd_last)
+        queries.append((jd_min, jd_min + rnd.choice((1, 30, 365)), rnd.choice((0.001, 0.01, 0.05)), 'Earth'))
+
+    def scan(jd_min, jd_max, dist_max, body):
+        return df[(df['jd'] >= jd_min) & (df['jd'] <= jd_max) & (df['dist'] <= dist_max) & (df['body'] == body)]
+
+    for name, query in (('DataFrame scan', scan), ('ApproachIndex', index.query)):
+        start = time.perf_counter()
+        for jd_min, jd_max, dist_max, body in queries:
+            query(jd_min, jd_max, dist_max, body)
+        elapsed = time.perf_counter() - start
+        print(f'{name:<16} {elapsed:8.3f}s for {args.queries} queries, {elapsed / args.queries * 1e6:8.1f}us/query')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Typed CADTable parsing vs get_df + per column pd.to_numeric/pd.to_datetime
+
+usage: python -m benchmarks.bench_cad_table [--rows N]
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from utils.cad_table import CADTable, FLOAT_COLUMNS
+from utils.data_utils import get_df
+from utils.stub_server import CAD_FIELDS, make_cad_rows
+
+
+def get_df_path(rows):
+    df = get_df(rows, columns=CAD_FIELDS)
+    for name in CAD_FIELDS:
+        if name in FLOAT_COLUMNS:
+            df[name] = pd.to_numeric(df[name])
+    df['cd'] = pd.to_datetime(df['cd'])
+    return df
+
+
+def cad_table_path(rows):
+    return CADTable.from_rows(rows, CAD_FIELDS).to_pandas()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of rows')
+    args = parser.parse_args()
+
+    rows = make_cad_rows(args.rows)
+    for name, convert in (('get_df + pd.to_*', get_df_path), ('CADTable', cad_table_path)):
+        start = time.perf_counter()
+        convert(rows)
+        print(f'{name:<18} {time.perf_counter() - start:8.3f}s for {args.rows} rows')
+
+
+if __name__ == '__main__':
+    main()
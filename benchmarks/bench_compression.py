@@ -0,0 +1,80 @@
+"""
+Bandwidth & disk savings of compression vs its decode cost: transport per content coding against the
+stub server, storage codecs on raw payloads, compressed snapshots vs memory mapped ones
+
+usage: python -m benchmarks.bench_compression [--rows N] [--requests N]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from app.client import APIClient, Response
+from app.compression import CODECS, content_encodings
+from app.metrics import Metrics
+from utils.cad_snapshot import open_snapshot, save_response
+from utils.stub_server import StubServer, make_cad_payload
+
+
+def transport(rows, requests):
+    with StubServer(num_rows=rows, compression=True) as stub:
+        for encoding in content_encodings() + ['identity']:
+            timings = []
+            with APIClient(base_url=stub.url, metrics=Metrics(callback=timings.append)) as client:
+                client.session.headers['Accept-Encoding'] = encoding
+                client.get()
+                del timings[:]
+                start = time.perf_counter()
+                for _ in range(requests):
+                    client.get()
+                elapsed = (time.perf_counter() - start) / requests
+            wire, decoded = timings[-1].wire_bytes, timings[-1].bytes
+            print(f'transport {encoding:<9} {wire / 2 ** 20:8.2f} MiB on the wire / {decoded / 2 ** 20:8.2f} MiB '
+                  f'({wire / decoded:6.1%})  {elapsed * 1000:8.2f} ms/request')
+
+
+def codecs(payload):
+    for name, codec in CODECS.items():
+        start = time.perf_counter()
+        packed = codec.compress(payload)
+        compressed = time.perf_counter() - start
+        start = time.perf_counter()
+        codec.decompress(packed)
+        decompressed = time.perf_counter() - start
+        size = len(payload) / 2 ** 20
+        print(f'codec {name:<5} ratio {len(payload) / len(packed):6.1f}x  compress {size / compressed:9.1f} MiB/s  '
+              f'decompress {size / decompressed:9.1f} MiB/s')
+
+
+def disk_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def snapshots(payload):
+    res = Response.from_json(json.loads(payload))
+    with tempfile.TemporaryDirectory() as root:
+        for name in [None] + [name for name in CODECS if name != 'none']:
+            path = os.path.join(root, name or 'mmap')
+            save_response(res, path, codec=name)
+            start = time.perf_counter()
+            open_snapshot(path).to_pandas()
+            elapsed = time.perf_counter() - start
+            print(f'snapshot {name or "mmap":<5} {disk_size(path) / 2 ** 20:8.2f} MiB on disk  '
+                  f'{elapsed:8.3f}s open + pandas')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000, help='Rows per payload')
+    parser.add_argument('--requests', type=int, default=5, help='Timed requests per content coding')
+    args = parser.parse_args()
+
+    transport(args.rows, args.requests)
+    payload = make_cad_payload(args.rows)
+    codecs(payload)
+    snapshots(payload)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+IngestPipeline scaling across worker processes on a local stub server
+
+usage: python -m benchmarks.bench_ingest [--rows N] [--responses N] [--processes 0 1 2 4]
+"""
+import argparse
+import os
+import time
+
+from app.client import APIClient
+from utils.ingest import IngestPipeline
+from utils.stub_server import StubServer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=50000, help='Rows per response')
+    parser.add_argument('--responses', type=int, default=40, help='Responses ingested')
+    parser.add_argument('--processes', type=int, nargs='+', default=None,
+                        help='Worker process counts, 0 parses on the I/O threads, defaults to 0 1 2 4 .. CPUs')
+    parser.add_argument('--io-threads', type=int, default=8, help='Concurrent downloads')
+    args = parser.parse_args()
+
+    cpus = os.cpu_count()
+    processes = args.processes or [0] + [2 ** i for i in range(cpus.bit_length()) if 2 ** i < cpus] + [cpus]
+    params_list = [{'page': page} for page in range(args.responses)]
+    print(f'generating {args.rows} rows payload')
+    with StubServer(num_rows=args.rows) as stub:
+        baseline = None
+        for count in processes:
+            with IngestPipeline(APIClient(base_url=stub.url, pool_maxsize=args.io_threads), processes=count,
+                                io_threads=args.io_threads) as pipeline:
+                pipeline.warm_up()
+                start = time.perf_counter()
+                tables = pipeline.ingest(params_list)
+                elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            rows = sum(map(len, tables))
+            print(f'processes: {count:>3}  {elapsed:8.3f}s  {rows / elapsed:12.0f} rows/s  '
+                  f'speedup: {baseline / elapsed:5.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""
+Response parse throughput of every installed json backend across payload sizes
+
+usage: python -m benchmarks.bench_json [--sizes 100 10000 100000 1000000] [--repeat N]
+"""
+import argparse
+import time
+
+from app.client import JSON_BACKENDS, RawResponse, Response, set_json_backend
+from utils.stub_server import make_cad_payload
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10000, 100000, 1000000], help='Rows per payload')
+    parser.add_argument('--repeat', type=int, default=3, help='Parses per size, best time is reported')
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        payload = RawResponse(200, make_cad_payload(size))
+        for name in JSON_BACKENDS:
+            set_json_backend(name)
+            best = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                Response(payload)
+                best = min(best, time.perf_counter() - start)
+            print(f'rows: {size:>8}  {name:<7} {best:8.4f}s  {len(payload.content) / best / 2 ** 20:8.1f} MiB/s  '
+                  f'{size / best:12.0f} rows/s')
+
+
+if __name__ == '__main__':
+    main()
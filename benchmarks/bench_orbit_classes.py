@@ -0,0 +1,42 @@
+"""
+Batched, memoised resolve_orbit_classes vs per row get_des_class_name on a local stub sbdb server
+
+usage: python -m benchmarks.bench_orbit_classes [--designations N] [--unique N] [--workers N]
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from app.client import APIClient
+from utils.data_utils import get_des_class_name, resolve_orbit_classes
+from utils.stub_server import StubServer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--designations', type=int, default=10000, help='Length of designation column')
+    parser.add_argument('--unique', type=int, default=3000, help='Distinct designations in column')
+    parser.add_argument('--workers', type=int, default=16, help='Concurrent sbdb.api calls')
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    designations = pd.Series([f'{rnd.randrange(args.unique)} bench' for _ in range(args.designations)])
+    with StubServer() as stub, APIClient(endpoint='sbdb.api', base_url=stub.url,
+                                         pool_maxsize=args.workers) as client:
+        scenarios = (
+            ('per row apply', lambda: designations.apply(get_des_class_name, client=client)),
+            ('resolve_orbit_classes', lambda: resolve_orbit_classes(designations, client=client,
+                                                                    max_workers=args.workers)),
+            ('resolve (memoised)', lambda: resolve_orbit_classes(designations, client=client)),
+        )
+        for name, resolve in scenarios:
+            requests_before = stub.requests
+            start = time.perf_counter()
+            resolve()
+            print(f'{name:<22} {time.perf_counter() - start:8.3f}s  sbdb.api calls: {stub.requests - requests_before}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Requests/sec of APIClient with and without connection pooling against a local stub server
+
+usage: python -m benchmarks.bench_pooling [--requests N] [--threads N] [--rows N]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from app.client import APIClient, Response
+from utils.stub_server import StubServer
+
+
+def run(call, num_requests, num_threads):
+    """
+    Run `call` num_requests times over num_threads
+    :return: requests per second
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_threads) as pool:
+        for res in pool.map(lambda _: call(), range(num_requests)):
+            assert res.code == 200
+    return num_requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per scenario')
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent threads')
+    parser.add_argument('--rows', type=int, default=10, help='Rows in stub payload')
+    args = parser.parse_args()
+
+    with StubServer(num_rows=args.rows) as stub:
+        url = stub.url + 'cad.api'
+        pooled = APIClient(base_url=stub.url, pool_maxsize=args.threads)
+        scenarios = [('unpooled requests.get', lambda: Response(requests.get(url)), None),
+                     ('pooled APIClient', pooled.get, pooled)]
+        for name, call, client in scenarios:
+            connections_before = stub.connections
+            rate = run(call, args.requests, args.threads)
+            print(f'{name:<24} {rate:10.1f} req/s  connections opened: {stub.connections - connections_before}')
+            if client:
+                client.close()
+
+
+if __name__ == '__main__':
+    main()
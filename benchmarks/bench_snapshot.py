@@ -0,0 +1,38 @@
+"""
+Open time of a memory mapped columnar snapshot vs re-parsing the JSON payload
+
+usage: python -m benchmarks.bench_snapshot [--rows N]
+"""
+import argparse
+import json
+import tempfile
+import time
+
+from app.client import Response
+from utils.cad_snapshot import open_snapshot, save_response
+from utils.cad_table import CADTable
+from utils.stub_server import make_cad_payload
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of rows')
+    args = parser.parse_args()
+
+    payload = make_cad_payload(args.rows)
+    with tempfile.TemporaryDirectory() as path:
+        save_response(Response.from_json(json.loads(payload)), path)
+        scenarios = (
+            ('json + CADTable', lambda: CADTable.from_response(Response.from_json(json.loads(payload)))),
+            ('open_snapshot', lambda: open_snapshot(path)),
+            ('open_snapshot + dist', lambda: open_snapshot(path)['dist'].max()),
+            ('open_snapshot + pandas', lambda: open_snapshot(path).to_pandas()),
+        )
+        for name, load in scenarios:
+            start = time.perf_counter()
+            load()
+            print(f'{name:<24} {time.perf_counter() - start:8.3f}s for {args.rows} rows')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Peak memory of buffered vs streamed Response decoding, rows or CloseApproach records, on a synthetic CAD payload
+
+usage: python -m benchmarks.bench_stream_memory [--rows N]
+"""
+import argparse
+import time
+import tracemalloc
+
+from app.client import APIClient
+from utils.stub_server import StubServer
+
+
+def buffered(client):
+    res = client.get()
+    return len(res.get_data())
+
+
+def streamed(client):
+    res = client.get(stream=True)
+    return sum(1 for _ in res.iter_data())
+
+
+def streamed_approaches(client):
+    res = client.get(stream=True)
+    return sum(1 for _ in res.approaches())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000, help='Rows in stub payload')
+    args = parser.parse_args()
+
+    print(f'generating {args.rows} rows payload')
+    with StubServer(num_rows=args.rows) as stub, APIClient(base_url=stub.url) as client:
+        for name, decode in (('buffered', buffered), ('streamed', streamed),
+                             ('streamed approaches', streamed_approaches)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            num_rows = decode(client)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f'{name:<19} rows: {num_rows}  peak memory: {peak / 2 ** 20:9.1f} MiB  time: {elapsed:6.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Benchmark suite run by `run_benchmarks.py`: APIClient throughput & latency per payload size and
+concurrency, Response parse, get_df conversion & peak RSS per payload size and concurrency,
+against local stub servers
+
+Every metric is a float named `<group>.<case>.<measure>`; measures ending with `per_s` are
+better when higher, every other measure is better when lower.
+"""
+import multiprocessing
+import platform
+import queue
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.client import APIClient, Response
+from utils.data_utils import get_df
+from utils.stub_server import StubServer
+
+DEFAULT_SIZES = (100, 10000, 100000, 1000000)
+DEFAULT_CONCURRENCY = (1, 4, 16)
+DEFAULT_REQUESTS = 500
+# rows of the stub payloads used by throughput & latency runs
+DEFAULT_THROUGHPUT_ROWS = (100, 10000)
+# concurrent downloads of payload runs
+DEFAULT_PAYLOAD_CONCURRENCY = (1, 4)
+# payload runs with more rows in flight, payload size times concurrency, are skipped to bound memory
+MAX_ROWS_IN_FLIGHT = 1000000
+# seconds a payload run may take before its process is stopped
+PAYLOAD_TIMEOUT = 600
+# durations below this many seconds are dominated by noise and not checked for regressions
+MIN_CHECKED_SECONDS = 0.005
+
+
+def higher_is_better(name):
+    return name.endswith('per_s')
+
+
+def measure_client(url, concurrency, num_requests):
+    """
+    Request rate & latency percentiles of one pooled APIClient shared by `concurrency` threads
+    :param url: stub base url
+    :return: dict of metrics
+    """
+    latencies = []
+    with APIClient(base_url=url, pool_maxsize=concurrency) as client:
+        client.get()
+
+        def timed_get(_):
+            start = time.perf_counter()
+            res = client.get()
+            latencies.append(time.perf_counter() - start)
+            return res.code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            codes = list(pool.map(timed_get, range(num_requests)))
+        elapsed = time.perf_counter() - start
+    if any(code != 200 for code in codes):
+        raise RuntimeError(f'stub answered {set(codes)}')
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {'req_per_s': num_requests / elapsed, 'latency_p50_ms': p50, 'latency_p95_ms': p95,
+            'latency_p99_ms': p99}
+
+
+def _measure_payload(url, concurrency, results):
+    # runs in a fresh process, its peak RSS is the cost of `concurrency` downloads, parses & conversions
+    timings = []
+
+    def timed_payload(_):
+        start = time.perf_counter()
+        raw = client.session.get(client.endpoint_url)
+        downloaded = time.perf_counter()
+        res = Response(raw)
+        data = res.get_data()
+        parsed = time.perf_counter()
+        get_df(data, columns=res.get_fields())
+        converted = time.perf_counter()
+        timings.append((downloaded - start, parsed - downloaded, converted - parsed))
+
+    with APIClient(base_url=url, pool_maxsize=concurrency) as client:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(timed_payload, range(concurrency)))
+    download, parse, convert = np.mean(timings, axis=0)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    results.put({'download_s': download, 'parse_s': parse, 'get_df_s': convert,
+                 'peak_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20})
+
+
+def _wait_result(process, results, timeout):
+    """
+    Result a process puts on results, the process is stopped once past timeout
+    :return: result, raises RuntimeError with the exit code when the process ends without one
+    """
+    deadline = time.monotonic() + timeout
+    while process.is_alive() and time.monotonic() < deadline:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            pass
+    if process.is_alive():
+        process.terminate()
+    process.join()
+    try:
+        # put just before the process exited
+        return results.get(timeout=1)
+    except queue.Empty:
+        raise RuntimeError(f'payload benchmark process ended without a result, exit code {process.exitcode}') \
+            from None
+
+
+def measure_payload(url, concurrency=1):
+    """
+    Mean download, Response parse & get_df times of `concurrency` concurrent cad.api payloads and their peak RSS,
+    measured in a spawned process
+    :param url: stub base url
+    :param concurrency: concurrent payloads
+    :return: dict of metrics, raises RuntimeError when the process fails or runs past PAYLOAD_TIMEOUT
+    """
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_measure_payload, args=(url, concurrency, results))
+    process.start()
+    metrics = _wait_result(process, results, PAYLOAD_TIMEOUT)
+    process.join()
+    if process.exitcode:
+        raise RuntimeError(f'payload benchmark process failed, exit code {process.exitcode}')
+    return metrics
+
+
+def run_suite(sizes=DEFAULT_SIZES, concurrency=DEFAULT_CONCURRENCY, num_requests=DEFAULT_REQUESTS,
+              throughput_rows=DEFAULT_THROUGHPUT_ROWS, payload_concurrency=DEFAULT_PAYLOAD_CONCURRENCY, log=print):
+    """
+    Run every benchmark
+    :param sizes: payload sizes in rows
+    :param concurrency: client thread counts
+    :param num_requests: requests per concurrency level
+    :param throughput_rows: payload sizes in rows of throughput & latency runs
+    :param payload_concurrency: concurrent payloads per payload size, skipped above MAX_ROWS_IN_FLIGHT rows
+    :param log: progress callback
+    :return: results dict with `meta` & flat `metrics`
+    """
+    metrics = {}
+    for num_rows in throughput_rows:
+        with StubServer(num_rows=num_rows) as stub:
+            for threads in concurrency:
+                log(f'client: {num_rows} rows, {threads} threads, {num_requests} requests')
+                for measure, value in measure_client(stub.url, threads, num_requests).items():
+                    metrics[f'client.rows_{num_rows}.c{threads}.{measure}'] = value
+    for num_rows in sizes:
+        with StubServer(num_rows=num_rows) as stub:
+            for threads in payload_concurrency:
+                if num_rows * threads > MAX_ROWS_IN_FLIGHT and threads > min(payload_concurrency):
+                    continue
+                log(f'payload: {num_rows} rows, {threads} concurrent')
+                for measure, value in measure_payload(stub.url, threads).items():
+                    metrics[f'payload.rows_{num_rows}.c{threads}.{measure}'] = value
+    meta = {'python': platform.python_version(), 'platform': platform.platform(), 'time': time.time(),
+            'sizes': list(sizes), 'concurrency': list(concurrency), 'requests': num_requests,
+            'throughput_rows': list(throughput_rows), 'payload_concurrency': list(payload_concurrency)}
+    return {'meta': meta, 'metrics': metrics}
+
+
+def compare(metrics, baseline, tolerance):
+    """
+    Compare metrics with baseline metrics
+    :param tolerance: allowed relative slowdown, e.g. 0.25 for 25%
+    :return: list of (name, baseline value, value, relative change) of regressed metrics
+    """
+    regressions = []
+    for name, expected in baseline.items():
+        if name not in metrics or not expected:
+            continue
+        if name.endswith('_s') and not higher_is_better(name) and expected < MIN_CHECKED_SECONDS:
+            continue
+        change = (metrics[name] - expected) / expected
+        if (-change if higher_is_better(name) else change) > tolerance:
+            regressions.append((name, expected, metrics[name], change))
+    return regressions
@@ -0,0 +1,54 @@
+"""
+Benchmarks executable module
+"""
+import argparse
+import json
+import os
+import sys
+
+from benchmarks.suite import (DEFAULT_CONCURRENCY, DEFAULT_PAYLOAD_CONCURRENCY, DEFAULT_REQUESTS, DEFAULT_SIZES,
+                              DEFAULT_THROUGHPUT_ROWS, compare, run_suite)
+
+PARSER = argparse.ArgumentParser()
+PARSER.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Payload sizes in rows')
+PARSER.add_argument('--concurrency', type=int, nargs='+', default=DEFAULT_CONCURRENCY, help='Client thread counts')
+PARSER.add_argument('--requests', type=int, default=DEFAULT_REQUESTS, help='Requests per concurrency level')
+PARSER.add_argument('--throughput-rows', type=int, nargs='+', default=DEFAULT_THROUGHPUT_ROWS,
+                    help='Payload sizes in rows of throughput & latency runs')
+PARSER.add_argument('--payload-concurrency', type=int, nargs='+', default=DEFAULT_PAYLOAD_CONCURRENCY,
+                    help='Concurrent payloads per payload size')
+PARSER.add_argument('--output', default='benchmarks.json', help='Results file')
+PARSER.add_argument('--baseline', default='benchmarks/baseline.json', help='Baseline results file')
+PARSER.add_argument('--save-baseline', action='store_true', help='Store results as baseline')
+PARSER.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative regression, 0.25 for 25%%')
+
+
+def main():
+    # parsed here, spawned benchmark processes re-import this module
+    args = PARSER.parse_args()
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        # checked before running, a gate without baseline would pass whatever the results
+        print(f'No baseline at {args.baseline}, run with --save-baseline to create one')
+        return 2
+    results = run_suite(sizes=args.sizes, concurrency=args.concurrency, num_requests=args.requests,
+                        throughput_rows=args.throughput_rows, payload_concurrency=args.payload_concurrency)
+    for name, value in results['metrics'].items():
+        print(f'{name:<40} {value:12.4f}')
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+    print(f'Results written to {args.output}')
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as baseline:
+            json.dump(results, baseline, indent=2)
+        print(f'Baseline written to {args.baseline}')
+        return 0
+    with open(args.baseline) as baseline:
+        regressions = compare(results['metrics'], json.load(baseline)['metrics'], args.tolerance)
+    for name, expected, actual, change in regressions:
+        print(f'REGRESSION {name}: {expected:.4f} -> {actual:.4f} ({change:+.1%})')
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
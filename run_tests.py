@@ -1,17 +1,60 @@
 """
 Tests executable module
 """
+import os
+import sys
+
 import pytest
 import argparse
 
+from app.client import BASE_URL_ENV
+from utils.load_gen import DEFAULT_WORKERS, LoadGenerator, Stage, build_mix, parse_mix
+from utils.stub_server import StubServer
+
 PARSER = argparse.ArgumentParser()
 PARSER.add_argument('--smoke-test', action='store_true', help='Run Smoke Tests')
 PARSER.add_argument('--keywords', default='test', help='Run tests with keyword')
 PARSER.add_argument('--pdb', action='store_true', help='Enable pdb on first failure')
+PARSER.add_argument('--stub', action='store_true', help='Run against a local stub server instead of JPL API')
+PARSER.add_argument('--workers', type=int, default=8, help='Concurrent requests prefetching test responses')
+PARSER.add_argument('--load', action='store_true', help='Generate open-loop load instead of running tests')
+PARSER.add_argument('--rate', type=float, default=10, help='Load: requests/sec, start rate of a ramp')
+PARSER.add_argument('--ramp-to', type=float, default=None, help='Load: requests/sec reached at the end of the run')
+PARSER.add_argument('--duration', type=float, default=10, help='Load: seconds of load')
+PARSER.add_argument('--mix', default='default=4,filters=2,sorting=2,invalid=1',
+                    help='Load: weights of query groups default, filters, sorting & invalid')
+PARSER.add_argument('--poisson', action='store_true', help='Load: poisson arrivals instead of evenly spaced')
+PARSER.add_argument('--load-workers', type=int, default=DEFAULT_WORKERS, help='Load: max concurrent requests')
+PARSER.add_argument('--max-error-rate', type=float, default=None,
+                    help='Load: exit with 1 above this fraction of failed (exception, 429 & 5xx) requests')
 ARGS = PARSER.parse_args()
 
 
+def run_load():
+    """
+    Generate open-loop load, print its report
+    :return: True when the error rate is within --max-error-rate
+    """
+    stages = [Stage(ARGS.rate, ARGS.rate if ARGS.ramp_to is None else ARGS.ramp_to, ARGS.duration)]
+    with LoadGenerator(mix=build_mix(parse_mix(ARGS.mix)), workers=ARGS.load_workers) as generator:
+        print(f"Generating load {stages}")
+        report = generator.run(stages, poisson=ARGS.poisson)
+    print(report.format())
+    return ARGS.max_error_rate is None or report.error_rate <= ARGS.max_error_rate
+
+
 def main():
+    if ARGS.load:
+        if ARGS.stub:
+            with StubServer() as stub:
+                os.environ[BASE_URL_ENV] = stub.url
+                passed = run_load()
+        else:
+            passed = run_load()
+        if not passed:
+            sys.exit(1)
+        return
+
     test_folder = 'tests'
 
     # default pytest args, runs whole test in test_folder
@@ -26,8 +69,16 @@ def main():
     if ARGS.pdb:
         # to enable debugger while testing on local
         pytest_args.append('--pdb')
+    # responses of `prefetch` marked tests are requested concurrently by this many workers
+    pytest_args.append(f'--prefetch-workers={ARGS.workers}')
     print(f"Running tests with following arguments {pytest_args}")
-    pytest.main(pytest_args)
+    if ARGS.stub:
+        # every client created without base_url picks the stub up from the environment
+        with StubServer() as stub:
+            os.environ[BASE_URL_ENV] = stub.url
+            pytest.main(pytest_args)
+    else:
+        pytest.main(pytest_args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,109 @@
+"""
+Prefetch fixture layer: responses of every test marked `prefetch` are requested concurrently
+when the first of them runs, each test then reads its already fetched Response
+
+Usage::
+
+    @pytest.mark.parametrize('test_case', sorting_test_cases)
+    @pytest.mark.prefetch(lambda test_case: {'sort': test_case.key})
+    def test_sorting(self, test_case, api_response):
+        ...
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+import pytest
+
+from app.cache import cache_key
+from app.client import APIClient
+from utils.stub_server import StubServer
+
+DEFAULT_PREFETCH_WORKERS = 8
+
+
+def pytest_addoption(parser):
+    parser.addoption('--prefetch-workers', type=int, default=DEFAULT_PREFETCH_WORKERS,
+                     help='Concurrent requests prefetching responses of `prefetch` marked tests')
+
+
+def request_params(item):
+    """
+    Query params of a `prefetch` marked test item
+    :return: params dict, None when item is not marked
+    """
+    marker = item.get_closest_marker('prefetch')
+    if marker is None:
+        return None
+    params = marker.args[0]
+    if callable(params):
+        params = params(**item.callspec.params)
+    return params
+
+
+class PrefetchedResponses:
+    """
+    Responses fetched through a bounded pool, each distinct params set is requested once
+    """
+
+    def __init__(self, client, max_workers):
+        self.client = client
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = {}
+
+    def prefetch(self, params_list):
+        """
+        Start requesting every distinct params set
+        """
+        for params in params_list:
+            self._submit(params)
+
+    def _submit(self, params):
+        key = cache_key(self.client.endpoint_url, params)
+        if key not in self._futures:
+            self._futures[key] = self._pool.submit(self.client.get, params=params)
+        return self._futures[key]
+
+    def get(self, params):
+        """
+        :return: Response of params, requested now if it was not prefetched
+        """
+        return self._submit(params).result()
+
+    def close(self):
+        self._pool.shutdown()
+        self.client.close()
+
+
+@pytest.fixture(scope='session')
+def prefetched(request):
+    """
+    Session wide PrefetchedResponses, prefetching every `prefetch` marked test of the session
+    """
+    workers = request.config.getoption('prefetch_workers')
+    responses = PrefetchedResponses(APIClient(pool_maxsize=workers), workers)
+    responses.prefetch(params for params in map(request_params, request.session.items) if params is not None)
+    yield responses
+    responses.close()
+
+
+@pytest.fixture
+def api_response(request, prefetched):
+    """
+    Prefetched cad.api Response of the current test's `prefetch` params
+    """
+    return prefetched.get(request_params(request.node))
+
+
+@pytest.fixture(scope='module')
+def stub_server():
+    """
+    Factory of running StubServers, every server it started is shut down once the test module is done
+
+    Usage::
+
+        @pytest.fixture(scope='module')
+        def stub(stub_server):
+            return stub_server(num_rows=5)
+    """
+    with ExitStack() as servers:
+        yield lambda **kwargs: servers.enter_context(StubServer(**kwargs))
@@ -0,0 +1,93 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.bench_analytics import naive_loop
+from utils.analytics import (convert_distance, days_until, diameter_from_h, group_by, julian_date, rank_by_risk,
+                             risk_scores, size_classes, top_k, top_k_closest, window_histogram)
+from utils.cad_table import CADTable
+from utils.stub_server import DATASET_FIELDS, make_cad_dataset
+
+
+class TestAnalytics:
+    """
+    Test vectorised analytics kernels against per row python & pandas results
+    """
+    rows = make_cad_dataset(500)
+    rows[7][DATASET_FIELDS.index('h')] = None
+    table = CADTable.from_rows(rows, DATASET_FIELDS)
+    df = table.to_pandas()
+
+    def test_convert_distance(self):
+        assert convert_distance([1], 'au', 'km')[0] == pytest.approx(149597870.7)
+        assert convert_distance([1], 'LD', 'km')[0] == pytest.approx(384399, rel=1e-4)
+        assert convert_distance(convert_distance([0.5], 'au', 'LD'), 'LD', 'au')[0] == pytest.approx(0.5)
+        with pytest.raises(ValueError):
+            convert_distance([1], 'au', 'mi')
+
+    def test_julian_date(self):
+        assert julian_date(datetime.datetime(2000, 1, 1, 12)) == 2451545.0
+        now = datetime.datetime(2020, 1, 1)
+        assert days_until([julian_date(now) + 2], now)[0] == pytest.approx(2)
+
+    def test_diameter_and_size_classes(self):
+        """
+        Test H=22 is ~140m at default albedo, unknown H has no size class
+        """
+        assert diameter_from_h([22])[0] == pytest.approx(0.141, abs=0.001)
+        assert list(size_classes([30, 22.1, 17, np.nan])) == ['<10m', '50-140m', '>1km', None]
+
+    def test_matches_naive_loop(self):
+        """
+        Test kernels agree with the per row loop of the benchmark
+        """
+        rows = [row for row in self.rows if row[DATASET_FIELDS.index('h')] is not None]
+        table = CADTable.from_rows(rows, DATASET_FIELDS)
+        dist_ld, dist_km, _, sizes, per_body, closest, _ = naive_loop(rows, DATASET_FIELDS)
+        np.testing.assert_allclose(convert_distance(table['dist'], 'au', 'LD'), dist_ld)
+        np.testing.assert_allclose(convert_distance(table['dist'], 'au', 'km'), dist_km)
+        assert list(size_classes(table['h'])) == sizes
+        assert group_by(table, 'body')['count'].to_dict() == per_body
+        assert list(top_k_closest(table, 10)['des']) == [row[0] for row in closest]
+
+    def test_group_by_matches_pandas(self):
+        expected = self.df.groupby('body', observed=True)['h'].agg(['count', 'min', 'mean', 'max'])
+        result = group_by(self.table, 'body', 'h')
+        np.testing.assert_allclose(result[['min', 'mean', 'max']].to_numpy(),
+                                   expected.loc[result.index, ['min', 'mean', 'max']].to_numpy())
+
+    def test_group_by_object_column(self):
+        table = CADTable({'class': np.array(['APO', None, 'ATE', 'APO'], dtype=object),
+                          'dist': np.array([0.1, 0.2, 0.3, np.nan])})
+        result = group_by(table, 'class', 'dist')
+        assert result['count'].to_dict() == {'APO': 2, 'ATE': 1}
+        assert result.loc['APO', 'mean'] == 0.1
+
+    def test_top_k(self):
+        values = np.array([3, np.nan, 1, 2, 5])
+        assert list(top_k(values, 3)) == [2, 3, 0]
+        assert list(top_k(values, 2, largest=True)) == [4, 0]
+        assert list(top_k(values, 10)) == [2, 3, 0, 4, 1]
+        assert len(top_k(values[:0], 3)) == 0
+
+    def test_rank_by_risk(self):
+        ranked = rank_by_risk(self.table, k=20)
+        scores = risk_scores(ranked)
+        assert len(ranked) == 20
+        assert (np.diff(scores) <= 0).all()
+        assert scores[0] == np.nanmax(risk_scores(self.table))
+
+    def test_window_histogram_matches_numpy(self):
+        counts, starts, edges = window_histogram(self.table, window_days=10, column='dist', bins=5)
+        jd, dist = self.table['jd'], self.table['dist']
+        assert counts.sum() == len(self.table)
+        assert starts[0] == jd.min()
+        first = jd < jd.min() + 10
+        np.testing.assert_array_equal(counts[0], np.histogram(dist[first], bins=edges)[0])
+
+    def test_window_histogram_explicit_edges(self):
+        counts, _, _ = window_histogram(self.table, column='dist', bins=[0, 0.01])
+        assert counts.sum() == (self.table['dist'] <= 0.01).sum()
+        assert pd.Series(self.table['dist']).between(0, 0.01).sum() == counts.sum()
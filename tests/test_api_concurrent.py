@@ -1,40 +1,28 @@
-import time
 from http import HTTPStatus
-from multiprocessing import Process
 
 import pytest
 
 from app.client import APIClient
+from utils.load_gen import LoadGenerator, Stage, build_mix
 
 
 @pytest.mark.smoke
 class TestApiConcurrent:
+    """
+    Test the API under open-loop load, requests arrive on schedule whatever the response times
+    """
 
-    client = APIClient()
-
-    def concurrent_task(self):
-        """
-        function for testing concurrent calls
+    # requests of a stage: mean rate * duration
+    @pytest.mark.parametrize('stage, requests', [(Stage(5, 5, 1), 5), (Stage(2, 10, 1), 6)], ids=['constant', 'ramp'])
+    def test_open_loop_load(self, stage, requests):
         """
-        response = self.client.get()
-        assert response.code == HTTPStatus.OK, response.raw_content
-
-    @pytest.mark.parametrize("num_of_concurrency", (5, 10))
-    def test_concurrent_call(self, num_of_concurrency):
+        test concurrent calls of the filter & sorting mix all succeed
         """
-        test concurrent calls
-        """
-        process_list = []
-        for _ in range(num_of_concurrency):
-            p = Process(target=self.concurrent_task)
-            # sleep is required in unauthorized testing to avoid 503 tmp error
-            time.sleep(0.1)
-            process_list.append(p)
-            p.start()
-
-        # Exit code zero indicates success for concurrent_task, other wise exit code is non zero
-        sum_exitcode = 0
-        for p in process_list:
-            p.join()
-            sum_exitcode += p.exitcode
-        assert sum_exitcode == 0, "one or more concurrent task failed"
+        # retried like the functional tests, `python run_tests.py --load` measures without retries
+        mix = build_mix({'default': 1, 'filters': 1, 'sorting': 1})
+        with APIClient() as client, LoadGenerator(client, mix=mix) as generator:
+            report = generator.run([stage])
+        assert len(report.results) == requests
+        assert report.errors == {}
+        assert set(report.statuses) == {HTTPStatus.OK}, report.format()
+        assert report.latency.percentile(50) <= report.latency.percentile(99) <= report.latency.max
@@ -0,0 +1,86 @@
+import asyncio
+import itertools
+import time
+from http import HTTPStatus
+
+import pytest
+
+from app.async_client import AsyncAPIClient
+from app.client import APIClient, CloseApproachBodies, SDBDOrbitClass
+
+
+@pytest.fixture(scope='module')
+def stub(stub_server):
+    return stub_server(num_rows=5)
+
+
+class TestAsyncClient:
+    """
+    Test AsyncAPIClient against local stub server
+    """
+
+    def test_get(self, stub):
+        """
+        Test single async call returns parsed Response
+        """
+        async def call():
+            async with AsyncAPIClient(base_url=stub.url) as client:
+                return await client.get(params={'fullname': True})
+
+        res = asyncio.run(call())
+        assert res.code == HTTPStatus.OK
+        assert res.get_count() == 5
+
+    def test_none_params_are_left_out(self, stub_server):
+        """
+        Test None valued params are not sent, like the sync client, instead of the literal `None`
+        """
+        dataset = stub_server(dataset_rows=500)
+        params = {'body': None, 'limit': 7}
+
+        async def call():
+            async with AsyncAPIClient(base_url=dataset.url) as client:
+                return await client.get(params=params)
+
+        res = asyncio.run(call())
+        with APIClient(base_url=dataset.url) as client:
+            expected = client.get(params=params)
+        assert res.code == expected.code == HTTPStatus.OK
+        assert res.get_data() == expected.get_data()
+
+    def test_gather_many(self, stub):
+        """
+        Test fan-out of every orbit class x every body from one process
+        """
+        params_list = [{'class': orbit_class.name, 'body': body.name}
+                       for orbit_class, body in itertools.product(SDBDOrbitClass, CloseApproachBodies)]
+
+        async def call():
+            async with AsyncAPIClient(base_url=stub.url, max_concurrency=20) as client:
+                return await client.gather_many(params_list)
+
+        requests_before = stub.requests
+        responses = asyncio.run(call())
+        assert len(responses) == len(params_list)
+        assert {res.code for res in responses} == {HTTPStatus.OK}
+        assert stub.requests - requests_before == len(params_list)
+
+    def test_rate_limit(self, stub):
+        """
+        Test per host rate limiter spaces out request starts
+        """
+        async def call():
+            async with AsyncAPIClient(base_url=stub.url, rate_limit=20) as client:
+                return await client.gather_many([None] * 5)
+
+        start = time.monotonic()
+        asyncio.run(call())
+        # 5 starts at 20/s: the last one starts 4 intervals after the first
+        assert time.monotonic() - start >= 4 / 20
+
+    def test_invalid_endpoint(self):
+        """
+        Test unsupported endpoint is rejected
+        """
+        with pytest.raises(ValueError):
+            AsyncAPIClient(endpoint='foo.api')
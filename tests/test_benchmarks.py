@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks import suite
+from benchmarks.suite import compare, measure_payload, run_suite
+from utils.stub_server import StubServer
+
+
+class TestBenchmarkSuite:
+    """
+    Test benchmark suite run & regression check
+    """
+
+    def test_run_suite(self):
+        """
+        Test a small run reports every metric
+        """
+        metrics = run_suite(sizes=(100, 1000), concurrency=(1, 2), num_requests=20, throughput_rows=(10, 100),
+                            payload_concurrency=(1, 2), log=lambda _: None)['metrics']
+        for rows in (10, 100):
+            for threads in (1, 2):
+                assert metrics[f'client.rows_{rows}.c{threads}.req_per_s'] > 0
+                assert metrics[f'client.rows_{rows}.c{threads}.latency_p50_ms'] <= \
+                    metrics[f'client.rows_{rows}.c{threads}.latency_p99_ms']
+        for rows in (100, 1000):
+            for threads in (1, 2):
+                for measure in ('download_s', 'parse_s', 'get_df_s', 'peak_rss_mib'):
+                    assert metrics[f'payload.rows_{rows}.c{threads}.{measure}'] > 0
+
+    def test_payload_runs_are_bounded(self, monkeypatch):
+        """
+        Test concurrent payload runs above MAX_ROWS_IN_FLIGHT are skipped, the lowest concurrency always runs
+        """
+        monkeypatch.setattr(suite, 'MAX_ROWS_IN_FLIGHT', 150)
+        metrics = suite.run_suite(sizes=(50, 200), concurrency=(1,), num_requests=5, throughput_rows=(10,),
+                                  payload_concurrency=(1, 2), log=lambda _: None)['metrics']
+        payloads = {name.rsplit('.', 1)[0] for name in metrics if name.startswith('payload.')}
+        assert payloads == {'payload.rows_50.c1', 'payload.rows_50.c2', 'payload.rows_200.c1'}
+
+    def test_failed_payload_process(self, monkeypatch):
+        """
+        Test a payload process failing before its result raises with its exit code instead of waiting forever
+        """
+        upstream = StubServer(num_rows=1)
+        # never started & closed, its port refuses connections
+        upstream._httpd.server_close()
+        with pytest.raises(RuntimeError, match='exit code 1'):
+            measure_payload(upstream.url)
+        monkeypatch.setattr(suite, 'PAYLOAD_TIMEOUT', 0)
+        with StubServer(num_rows=1, latency=5) as stub:
+            with pytest.raises(RuntimeError, match='exit code -15'):
+                measure_payload(stub.url)
+
+    def test_compare(self):
+        """
+        Test regressions are reported in the direction each metric is better
+        """
+        baseline = {'client.rows_100.c1.req_per_s': 100, 'client.rows_100.c1.latency_p99_ms': 10,
+                    'payload.rows_100.c1.parse_s': 1, 'payload.rows_100.c1.get_df_s': 0.001}
+        current = {'client.rows_100.c1.req_per_s': 70, 'client.rows_100.c1.latency_p99_ms': 9,
+                   'payload.rows_100.c1.parse_s': 1.3, 'payload.rows_100.c1.get_df_s': 0.003}
+        regressed = [name for name, *_ in compare(current, baseline, tolerance=0.25)]
+        assert regressed == ['client.rows_100.c1.req_per_s', 'payload.rows_100.c1.parse_s']
+        assert compare(current, baseline, tolerance=0.5) == []
+
+    def test_missing_baseline_fails(self, tmp_path):
+        """
+        Test the runner exits non-zero before running when the baseline to check against is missing
+        """
+        run = subprocess.run([sys.executable, 'run_benchmarks.py', '--baseline', str(tmp_path / 'missing.json'),
+                              '--output', str(tmp_path / 'results.json')], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        assert run.returncode == 2
+        assert 'No baseline' in run.stdout
+        assert not (tmp_path / 'results.json').exists()
@@ -0,0 +1,111 @@
+import time
+from http import HTTPStatus
+
+import pytest
+
+from app.cache import CacheEntry, MemoryCache, ResponseCache, SQLiteCache, TieredCache, cache_key
+from app.client import APIClient
+from utils.data_utils import get_des_class_name
+from utils.stub_server import orbit_class_of
+
+
+@pytest.fixture(scope='module')
+def stub(stub_server):
+    return stub_server(num_rows=5)
+
+
+def entry(content, ttl=60):
+    return CacheEntry(HTTPStatus.OK, content, None, None, time.time() + ttl)
+
+
+class TestCacheStores:
+    """
+    Test cache keys & stores
+    """
+
+    def test_cache_key_is_canonical(self):
+        """
+        Test params order & value types do not change the key
+        """
+        assert cache_key('u', {'limit': 5, 'body': 'ALL'}) == cache_key('u', {'body': 'ALL', 'limit': '5'})
+        assert cache_key('u', None) == cache_key('u', {})
+        assert cache_key('u', {'limit': 5}) != cache_key('u', {'limit': 6})
+
+    def test_memory_lru_eviction(self):
+        """
+        Test least recently used entries are evicted by size
+        """
+        cache = MemoryCache(max_bytes=10)
+        cache.set('a', entry(b'12345'))
+        cache.set('b', entry(b'12345'))
+        cache.get('a')
+        cache.set('c', entry(b'12345'))
+        assert cache.get('b') is None
+        assert cache.get('a') and cache.get('c')
+        assert cache.stats.evictions == 1
+
+    def test_sqlite_persistence_and_eviction(self, tmp_path):
+        """
+        Test entries survive reopening and size bound is enforced
+        """
+        path = str(tmp_path / 'cache.db')
+        cache = SQLiteCache(path, max_bytes=10)
+        cache.set('a', entry(b'12345'))
+        cache.set('b', entry(b'12345'))
+        cache.close()
+        cache = SQLiteCache(path, max_bytes=10)
+        assert cache.get('a').content == b'12345'
+        cache.set('c', entry(b'12345'))
+        assert len(cache) == 2
+        assert cache.get('b') is None
+
+    def test_tiered_promotes_disk_hits(self, tmp_path):
+        """
+        Test disk hits are copied to memory
+        """
+        disk = SQLiteCache(str(tmp_path / 'cache.db'))
+        disk.set('a', entry(b'1'))
+        cache = TieredCache(MemoryCache(), disk)
+        assert cache.get('a').content == b'1'
+        assert cache.memory.get('a').content == b'1'
+
+
+class TestClientCache:
+    """
+    Test APIClient & sbdb lookup with a response cache
+    """
+
+    def test_repeated_get_is_served_from_cache(self, stub):
+        """
+        Test identical params hit the cache whatever their order
+        """
+        cache = ResponseCache()
+        with APIClient(base_url=stub.url, cache=cache) as client:
+            requests_before = stub.requests
+            first = client.get(params={'body': 'ALL', 'limit': 5})
+            second = client.get(params={'limit': '5', 'body': 'ALL'})
+        assert stub.requests - requests_before == 1
+        assert first.json_content == second.json_content
+        assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+    def test_stale_entry_is_revalidated(self, stub):
+        """
+        Test expired entry is revalidated with its ETag and refreshed on 304
+        """
+        cache = ResponseCache(ttls={'cad.api': 0})
+        with APIClient(base_url=stub.url, cache=cache) as client:
+            first = client.get()
+            second = client.get()
+        assert second.code == HTTPStatus.OK
+        assert second.json_content == first.json_content
+        assert cache.stats.revalidated == 1
+
+    def test_sbdb_lookup_uses_cache(self, stub):
+        """
+        Test sbdb lookup of a known designation is not re-queried
+        """
+        with APIClient(endpoint='sbdb.api', base_url=stub.url, cache=ResponseCache()) as client:
+            requests_before = stub.requests
+            assert get_des_class_name('433', client=client) == orbit_class_of('433')
+            assert get_des_class_name('433', client=client) == orbit_class_of('433')
+        assert stub.requests - requests_before == 1
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from benchmarks.bench_cad_diff import naive_diff, revise
+from utils.cad_diff import diff_snapshots, diff_tables
+from utils.cad_snapshot import save_snapshot
+from utils.cad_table import CADTable
+from utils.stub_server import DATASET_FIELDS, make_cad_dataset
+
+
+@pytest.fixture(scope='module')
+def revision():
+    old_rows = make_cad_dataset(3000)
+    new_rows, _ = revise(old_rows, changes=0.02)
+    return old_rows, new_rows
+
+
+def keys(table):
+    return set(zip(table['des'], table['jd']))
+
+
+def row_keys(rows):
+    jd = DATASET_FIELDS.index('jd')
+    return {(row[0], float(row[jd])) for row in rows}
+
+
+class TestCADDiff:
+    """
+    Test the vectorised diff gives the per row join results
+    """
+
+    def test_matches_naive_diff(self, revision):
+        old_rows, new_rows = revision
+        diff = diff_tables(CADTable.from_rows(old_rows, DATASET_FIELDS), CADTable.from_rows(new_rows, DATASET_FIELDS))
+        added, removed, modified = naive_diff(old_rows, new_rows)
+        assert keys(diff.added) == row_keys(added) and len(added) == 60
+        assert keys(diff.removed) == row_keys(removed) and len(removed) == 60
+        assert keys(diff.after) == row_keys(after for _, after, _ in modified) and len(modified) == 120
+        assert diff.summary() == {'added': 60, 'removed': 60, 'modified': 120, 'unchanged': 3000 - 180,
+                                  'changed': {'orbit_id': 120, 'dist': 120, 't_sigma_f': 120, 't_sigma_f_upper': 120}}
+
+    def test_before_after_aligned(self, revision):
+        old_rows, new_rows = revision
+        diff = diff_tables(CADTable.from_rows(old_rows, DATASET_FIELDS), CADTable.from_rows(new_rows, DATASET_FIELDS))
+        assert list(diff.before['des']) == list(diff.after['des'])
+        np.testing.assert_array_equal(diff.before['jd'], diff.after['jd'])
+        np.testing.assert_allclose(diff.deltas['dist'], diff.after['dist'] - diff.before['dist'])
+        assert set(diff.deltas) == {'dist', 't_sigma_f'}
+        assert (diff.after['orbit_id'].astype(int) - diff.before['orbit_id'].astype(int) == 1).all()
+        frame = diff.to_pandas()
+        assert list(frame.columns) == ['des', 'jd', 'orbit_id_old', 'orbit_id_new', 'dist_old', 'dist_new',
+                                       'dist_delta', 't_sigma_f_old', 't_sigma_f_new', 't_sigma_f_delta',
+                                       't_sigma_f_upper_old', 't_sigma_f_upper_new']
+        assert frame['t_sigma_f_upper_old'].all() and not frame['t_sigma_f_upper_new'].any()
+        assert len(frame) == 120
+
+    def test_nulls_and_categories(self):
+        """
+        Test nulls equal nulls, and categorical columns compare on values whatever their categories
+        """
+        fields = ['des', 'jd', 'dist', 'body', 'cd']
+        old = CADTable.from_rows([['a', '1', None, 'Earth', None], ['b', '2', '0.1', 'Moon', '2020-Jan-01 00:00'],
+                                  ['c', '3', '0.2', None, None]], fields)
+        new = CADTable.from_rows([['b', '2', '0.1', 'Moon', '2020-Jan-01 00:00'], ['a', '1', None, 'Earth', None],
+                                  ['c', '3', '0.2', 'Mars', '2021-Jan-01 00:00'], ['d', '3', '0.2', 'Venus', None]],
+                                 fields)
+        diff = diff_tables(old, new)
+        assert diff.summary() == {'added': 1, 'removed': 0, 'modified': 1, 'unchanged': 2,
+                                  'changed': {'body': 1, 'cd': 1}}
+        assert list(diff.after['body']) == ['Mars']
+
+    def test_qualifier_change(self):
+        """
+        Test a `t_sigma_f` upper bound becoming a value of the same minutes is a modification
+        """
+        fields = ['des', 'jd', 't_sigma_f']
+        old = CADTable.from_rows([['a', '1', '< 00:01'], ['b', '2', '00:01']], fields)
+        new = CADTable.from_rows([['a', '1', '00:01'], ['b', '2', '00:01']], fields)
+        assert diff_tables(old, new).summary()['changed'] == {'t_sigma_f_upper': 1}
+
+    def test_no_changes(self, revision):
+        table = CADTable.from_rows(revision[0], DATASET_FIELDS)
+        assert diff_tables(table, table).summary() == {'added': 0, 'removed': 0, 'modified': 0, 'unchanged': 3000,
+                                                       'changed': {}}
+        empty = CADTable.from_rows([], DATASET_FIELDS)
+        assert diff_tables(empty, table).summary()['added'] == 3000
+        assert diff_tables(table, empty).summary()['removed'] == 3000
+
+    def test_invalid_keys(self, revision):
+        table = CADTable.from_rows(revision[0], DATASET_FIELDS)
+        with pytest.raises(ValueError):
+            diff_tables(table, table, key=('body',))
+        with pytest.raises(ValueError):
+            diff_tables(table, table, key=('des', 'fullname_id'))
+
+    def test_snapshots(self, revision, tmp_path):
+        old, new = (CADTable.from_rows(rows, DATASET_FIELDS) for rows in revision)
+        save_snapshot(old, str(tmp_path / 'old'))
+        save_snapshot(new, str(tmp_path / 'new'), codec='zlib')
+        diff = diff_snapshots(str(tmp_path / 'old'), str(tmp_path / 'new'))
+        assert diff.summary() == diff_tables(old, new).summary()
+        assert keys(diff.added) == keys(diff_tables(old, new).added)
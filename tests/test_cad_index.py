@@ -0,0 +1,123 @@
+import datetime
+
+import numpy as np
+import pytest
+
+import utils.cad_index
+from utils.analytics import julian_date
+from utils.cad_index import ApproachIndex
+from utils.cad_table import CADTable
+from utils.stub_server import CAD_FIELDS, DATASET_FIELDS, make_cad_dataset, make_cad_rows
+
+START = datetime.datetime(2020, 1, 1)
+
+
+def brute_force(table, jd_min, jd_max, dist_max, body, column='dist'):
+    mask = (table['jd'] >= jd_min) & (table['jd'] <= jd_max) & (table[column] <= dist_max)
+    if body != 'ALL':
+        mask &= table['body'] == body
+    return set(np.flatnonzero(mask))
+
+
+class TestApproachIndex:
+    """
+    Test time window & distance range queries against a full scan
+    """
+    table = CADTable.from_rows(make_cad_dataset(5000, start=START), DATASET_FIELDS)
+    index = ApproachIndex.from_table(table)
+
+    @pytest.mark.parametrize('days, dist_max, body', [(10, 0.01, 'Earth'), (100, 0.05, 'Earth'), (30, 0.001, 'Mars'),
+                                                      (50, 0.02, 'ALL'), (1, 0.0001, 'Earth')])
+    def test_matches_full_scan(self, days, dist_max, body):
+        jd_min = self.table['jd'][0] + 5
+        jd_max = jd_min + days
+        ids = self.index.query(jd_min, jd_max, dist_max=dist_max, body=body)
+        assert set(ids) == brute_force(self.table, jd_min, jd_max, dist_max, body)
+        assert (np.diff(self.table['jd'][ids]) >= 0).all()
+
+    @pytest.mark.parametrize('column', ['dist_min', 'dist_max'])
+    def test_distance_interval_columns(self, column):
+        jd_min, jd_max = self.table['jd'][0], self.table['jd'][0] + 60
+        ids = self.index.query(jd_min, jd_max, dist_max=0.02, body='ALL', column=column)
+        assert set(ids) == brute_force(self.table, jd_min, jd_max, 0.02, 'ALL', column)
+
+    def test_date_values(self):
+        """
+        Test datetimes & cad.api date strings bound the window like julian dates
+        """
+        end = START + datetime.timedelta(days=20)
+        expected = self.index.query(julian_date(START), julian_date(end))
+        assert list(self.index.query(START, end)) == list(expected)
+        assert list(self.index.query('2020-01-01', '2020-01-21')) == list(expected)
+
+    def test_unbounded_and_unknown_body(self):
+        assert len(self.index.query(body='ALL')) == len(self.table)
+        assert len(self.index.query(body='Pluto')) == (self.table['body'] == 'Pluto').sum()
+        assert len(self.index.query(body='Sun')) == 0
+        with pytest.raises(ValueError):
+            self.index.query(column='v_rel')
+
+    def test_take(self):
+        ids = self.index.query(dist_max=0.001, body='ALL')[::-1]
+        taken = self.index.take(ids)
+        assert list(taken['des']) == list(self.table['des'][ids])
+
+
+class TestIncrementalInsert:
+    """
+    Test rows inserted in batches are queryable, before and after delta merges
+    """
+
+    def test_batches_match_single_insert(self, monkeypatch):
+        monkeypatch.setattr(utils.cad_index, 'DELTA_ROWS', 1000)
+        rows = make_cad_rows(3000, start=START)
+        whole = CADTable.from_rows(rows, CAD_FIELDS)
+        index = ApproachIndex()
+        # out of time order batches, the last two stay in the delta
+        for start, stop in ((2000, 2500), (0, 300), (1200, 2000), (300, 1200), (2500, 2800), (2800, 3000)):
+            index.insert(CADTable.from_rows(rows[start:stop], CAD_FIELDS))
+        assert len(index) == 3000
+        assert any(partition.delta for partition in index.partitions.values())
+        jd_min, jd_max = whole['jd'][100], whole['jd'][2800]
+        ids = index.query(jd_min, jd_max, dist_max=0.01)
+        taken = index.take(ids)
+        expected = (whole['jd'] >= jd_min) & (whole['jd'] <= jd_max) & (whole['dist'] <= 0.01)
+        assert list(taken['des']) == list(whole['des'][expected])
+        # tables without `body` are approaches to Earth
+        assert list(index.partitions) == ['Earth']
+
+    def test_merge_keeps_runs_sorted(self, monkeypatch):
+        """
+        Test merged runs equal a full stable sort of every inserted row, ties in insertion order
+        """
+        monkeypatch.setattr(utils.cad_index, 'DELTA_ROWS', 100)
+        rows = make_cad_rows(1000, start=START)
+        # repeated approach times & distances
+        for row in rows[500:]:
+            row[CAD_FIELDS.index('jd')], row[CAD_FIELDS.index('dist')] = rows[0][2], rows[0][4]
+        index = ApproachIndex()
+        for start in range(0, 1000, 50):
+            index.insert(CADTable.from_rows(rows[start:start + 50][::-1], CAD_FIELDS))
+        partition = index.partitions['Earth']
+        partition.merge()
+        jd = np.concatenate([index._tables[i]['jd'] for i in range(len(index._tables))])
+        order = np.argsort(jd, kind='stable')
+        np.testing.assert_array_equal(partition.ids, order)
+        dist = np.concatenate([index._tables[i]['dist'] for i in range(len(index._tables))])
+        values, distance_jd, distance_ids = partition.by_distance['dist']
+        np.testing.assert_array_equal(distance_ids, order[np.argsort(dist[order], kind='stable')])
+        np.testing.assert_array_equal(values, dist[distance_ids])
+        np.testing.assert_array_equal(distance_jd, jd[distance_ids])
+
+    def test_insert_checks_fields(self):
+        index = ApproachIndex.from_table(CADTable.from_rows(make_cad_rows(10), CAD_FIELDS))
+        with pytest.raises(ValueError):
+            index.insert(CADTable.from_rows(make_cad_dataset(10), DATASET_FIELDS))
+        assert len(index) == 10
+
+    def test_concat_categories(self):
+        first = CADTable.from_rows([['a', 'Earth'], ['b', None]], ['des', 'body'])
+        second = CADTable.from_rows([['c', 'Mars']], ['des', 'body'])
+        table = CADTable.concat([first, second])
+        assert list(table['des']) == ['a', 'b', 'c']
+        assert list(table['body']) == ['Earth', None, 'Mars']
@@ -0,0 +1,128 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.client import Response
+from utils.cad_snapshot import load_response, open_snapshot, save_response, save_snapshot
+from utils.cad_table import CADTable, Categorical
+from utils.stub_server import CAD_FIELDS, CAD_SIGNATURE, make_cad_rows
+
+FIELDS = CAD_FIELDS[:-1] + ['body', 'h', 'fullname']
+
+
+@pytest.fixture
+def res():
+    rows = [row[:-1] + ['Earth' if i % 3 else 'Mars', row[-1], f'     ({row[0]})']
+            for i, row in enumerate(make_cad_rows(200))]
+    rows[3][FIELDS.index('v_inf')] = None
+    rows[4][FIELDS.index('t_sigma_f')] = '2_07:29'
+    rows[5][FIELDS.index('fullname')] = None
+    rows[6][FIELDS.index('jd')] = '2458849.500000000'
+    rows[7][FIELDS.index('h')] = '25'
+    rows[8][FIELDS.index('dist_min')] = '1.5e-05'
+    return Response.from_json({'signature': CAD_SIGNATURE, 'count': str(len(rows)), 'fields': FIELDS,
+                               'data': rows})
+
+
+class TestCADSnapshot:
+    """
+    Test memory mapped columnar snapshots against the JSON path
+    """
+
+    def test_round_trip_columns(self, res, tmp_path):
+        """
+        Test every typed column is restored equal
+        """
+        table = CADTable.from_response(res)
+        save_snapshot(table, str(tmp_path))
+        snapshot = open_snapshot(str(tmp_path))
+        assert snapshot.fields == table.fields
+        assert len(snapshot) == len(table)
+        for name in FIELDS:
+            np.testing.assert_array_equal(snapshot[name], table[name])
+            assert snapshot[name].dtype == table[name].dtype
+
+    def test_columns_are_lazy_memory_maps(self, res, tmp_path):
+        """
+        Test columns are opened on first access and memory mapped read-only
+        """
+        save_response(res, str(tmp_path))
+        snapshot = open_snapshot(str(tmp_path))
+        assert snapshot.columns._loaded == {}
+        assert isinstance(snapshot.columns['dist'], np.memmap)
+        assert not snapshot.columns['dist'].flags.writeable
+        assert isinstance(snapshot.columns['des'], Categorical)
+        assert set(snapshot.columns._loaded) == {'dist', 'des'}
+        assert isinstance(open_snapshot(str(tmp_path), mmap=False).columns['dist'], np.ndarray)
+
+    @pytest.mark.parametrize('codec', [None, 'zlib'])
+    def test_response_round_trip_matches_json_path(self, res, tmp_path, codec):
+        """
+        Test loaded Response equals the served JSON content, every field as served
+        """
+        save_response(res, str(tmp_path), codec=codec)
+        loaded = load_response(str(tmp_path))
+        assert loaded.get_value_for_key('signature') == CAD_SIGNATURE
+        assert loaded.get_count() == res.get_count()
+        assert loaded.get_fields() == res.json_content['fields']
+        assert loaded.get_data() == res.json_content['data']
+
+    def test_rewrite_keeps_mapped_columns(self, res, tmp_path):
+        """
+        Test a rewrite swaps in new files without touching those mapped from the previous snapshot
+        """
+        path = str(tmp_path / 'snapshot')
+        save_response(res, path)
+        previous = open_snapshot(path)
+        dist = previous['dist']
+        expected = np.array(dist)
+        save_snapshot(CADTable.from_response(res).take(np.arange(10)), path, codec='zlib')
+        np.testing.assert_array_equal(dist, expected)
+        # columns of the previous snapshot are not mixed with the new ones
+        with pytest.raises(ValueError):
+            previous['h']
+        assert len(open_snapshot(path)['dist']) == 10
+        assert not [name for name in os.listdir(path) if name.endswith('.npy')]
+        assert os.listdir(str(tmp_path)) == ['snapshot']
+
+    def test_interrupted_rewrite_keeps_previous_snapshot(self, res, tmp_path, monkeypatch):
+        """
+        Test the previous snapshot is read while path is missing after a crash mid swap, and cleaned by the next save
+        """
+        path = str(tmp_path / 'snapshot')
+        save_response(res, path)
+        replace = os.replace
+
+        def crash_moving_in(source, target):
+            if target == path:
+                raise OSError('crashed')
+            replace(source, target)
+
+        monkeypatch.setattr(os, 'replace', crash_moving_in)
+        with pytest.raises(OSError):
+            save_snapshot(CADTable.from_response(res).take(np.arange(10)), path)
+        monkeypatch.undo()
+        assert not os.path.exists(path)
+        assert load_response(path).get_data() == res.json_content['data']
+        save_snapshot(CADTable.from_response(res).take(np.arange(10)), path)
+        assert len(open_snapshot(path)) == 10
+        assert os.listdir(str(tmp_path)) == ['snapshot']
+
+    def test_rewrite_refuses_other_directories(self, res, tmp_path):
+        """
+        Test a directory that is not a snapshot is not replaced
+        """
+        (tmp_path / 'notes.txt').write_text('keep')
+        with pytest.raises(ValueError):
+            save_response(res, str(tmp_path))
+        assert os.listdir(str(tmp_path)) == ['notes.txt']
+
+    def test_empty(self, tmp_path):
+        """
+        Test a response without results round trips
+        """
+        save_response(Response.from_json({'signature': CAD_SIGNATURE, 'count': '0'}), str(tmp_path))
+        loaded = load_response(str(tmp_path))
+        assert loaded.get_count() == 0
+        assert loaded.get_data() is None
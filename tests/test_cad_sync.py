@@ -0,0 +1,170 @@
+import hashlib
+import json
+import sqlite3
+from collections import namedtuple
+from http import HTTPStatus
+
+import pytest
+
+from app.client import Response
+from app.planner import ShardFailed
+from utils.cad_store import CADStore
+from utils.cad_sync import params_key, sync
+from utils.stub_server import CAD_FIELDS, CAD_SIGNATURE, make_cad_rows
+
+YEARS = (2016, 2017, 2018, 2019)
+
+FakeResponse = namedtuple('FakeResponse', 'status_code content headers')
+
+
+def spread_rows(num_rows):
+    """
+    Synthetic rows spread over YEARS
+    """
+    rows = make_cad_rows(num_rows)
+    for i, row in enumerate(rows):
+        row[3] = str(YEARS[i % len(YEARS)]) + row[3][4:]
+    return rows
+
+
+class FakeClient:
+    """
+    In memory cad.api honouring date window, with ETag validators
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+        self.params = []
+        self.failing_years = set()
+
+    def get(self, params=None, headers=None):
+        year = int(params['date-min'][:4])
+        self.calls.append(year)
+        self.params.append(params)
+        if year in self.failing_years:
+            return Response(FakeResponse(HTTPStatus.SERVICE_UNAVAILABLE, b'{}', {}))
+        rows = [row for row in self.rows if row[3].startswith(str(year))]
+        content = {'signature': CAD_SIGNATURE, 'count': str(len(rows))}
+        if rows:
+            content.update({'fields': CAD_FIELDS, 'data': rows})
+        body = json.dumps(content).encode()
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if headers and headers.get('If-None-Match') == etag:
+            return Response(FakeResponse(HTTPStatus.NOT_MODIFIED, b'{}', {'ETag': etag}))
+        return Response(FakeResponse(HTTPStatus.OK, body, {'ETag': etag}))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CADStore(str(tmp_path / 'cad.db'))
+    yield store
+    store.close()
+
+
+def run(client, store, **kwargs):
+    # hot_years=0 with a current year outside YEARS, only never synced or expired windows are due
+    return sync(client, store, YEARS[0], YEARS[-1], hot_years=0, **kwargs)
+
+
+class TestCADSync:
+    """
+    Test incremental sync of yearly windows into CADStore
+    """
+
+    def test_first_sync_fetches_every_window(self, store):
+        """
+        Test initial sync stores every row and records the watermark
+        """
+        client = FakeClient(spread_rows(400))
+        report = run(client, store)
+        assert (report.fetched, report.rows) == (len(YEARS), 400)
+        assert len(store) == 400
+        assert store.get_watermark('ALL') is not None
+        assert len(store.load_table(year_min=2017, year_max=2017, body='Earth')) == 100
+
+    def test_warm_sync_skips_synced_windows(self, store):
+        """
+        Test windows synced within cold_ttl are not queried again
+        """
+        client = FakeClient(spread_rows(400))
+        run(client, store)
+        client.calls.clear()
+        report = run(client, store)
+        assert client.calls == []
+        assert report.skipped == len(YEARS)
+
+    def test_expired_windows_are_revalidated(self, store):
+        """
+        Test expired unchanged windows answer 304 and changed ones are replaced
+        """
+        rows = spread_rows(400)
+        client = FakeClient(rows)
+        run(client, store)
+        removed = rows.pop(1)
+        superseded = rows[2][1]
+        rows[2][1] = '99'
+        report = run(client, store, cold_ttl=0)
+        assert (report.fetched, report.unchanged) == (2, len(YEARS) - 2)
+        assert len(store) == 399
+        fields, stored = store.load_rows()
+        keys = {(row[0], row[1]) for row in stored}
+        assert (removed[0], removed[1]) not in keys
+        assert (rows[2][0], '99') in keys
+        assert (rows[2][0], superseded) not in keys
+
+    def test_failed_window_keeps_watermark(self, store):
+        """
+        Test a failing window raises and does not advance the watermark
+        """
+        client = FakeClient(spread_rows(400))
+        run(client, store)
+        watermark = store.get_watermark('ALL')
+        client.failing_years.add(2018)
+        with pytest.raises(ShardFailed):
+            run(client, store, full=True)
+        assert store.get_watermark('ALL') == watermark
+        assert len(store) == 400
+
+    def test_state_is_keyed_on_params(self, store):
+        """
+        Test a run with other params re-fetches every window, and a previous params set is re-fetched after it
+        """
+        client = FakeClient(spread_rows(400))
+        run(client, store, params={'dist-max': '0.2'})
+        client.calls.clear()
+        report = run(client, store, params={'dist-max': '0.05'})
+        assert report.fetched == len(YEARS) and sorted(client.calls) == list(YEARS)
+        assert all(params['dist-max'] == '0.05' for params in client.params[-len(YEARS):])
+        assert store.get_watermark('ALL', 'dist-max=0.05') is not None
+        client.calls.clear()
+        # rows of the 0.2 windows were replaced, their state is gone
+        assert run(client, store, params={'dist-max': 0.2}).fetched == len(YEARS)
+        client.calls.clear()
+        assert run(client, store, params={'dist-max': '0.2'}).skipped == len(YEARS)
+        assert client.calls == []
+
+    def test_params_key(self):
+        assert params_key(None) == params_key({}) == ''
+        assert params_key({'h-max': 20, 'dist-max': '0.2'}) == params_key({'dist-max': 0.2, 'h-max': '20'}) \
+            == 'dist-max=0.2&h-max=20'
+        assert params_key({'date-min': '2020-01-01', 'body': 'Mars'}) == ''
+
+    def test_older_store_state_is_dropped(self, tmp_path):
+        """
+        Test sync state of a store created before params keys is dropped, every window is re-fetched once
+        """
+        path = str(tmp_path / 'old.db')
+        db = sqlite3.connect(path)
+        db.executescript("""
+            CREATE TABLE sync_windows (
+                year INTEGER, body TEXT, synced_at REAL, row_count INTEGER, etag TEXT, PRIMARY KEY (year, body));
+            CREATE TABLE sync_meta (key TEXT PRIMARY KEY, value TEXT);
+            INSERT INTO sync_windows VALUES (2016, 'ALL', 1e12, 100, NULL);
+            INSERT INTO sync_meta VALUES ('watermark', '1e12');
+        """)
+        db.close()
+        store = CADStore(path)
+        assert store.window_state(2016, 'ALL') is None
+        assert run(FakeClient(spread_rows(400)), store).fetched == len(YEARS)
+        store.close()
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+from utils.cad_table import CADTable, Categorical
+from utils.data_utils import get_df
+from utils.stub_server import CAD_FIELDS, make_cad_rows
+
+
+class TestCADTable:
+    """
+    Test typed columnar CADTable against the get_df + pd.to_numeric path
+    """
+    rows = make_cad_rows(100)
+    rows[3][CAD_FIELDS.index('v_inf')] = None
+    rows[4][CAD_FIELDS.index('t_sigma_f')] = '2_07:29'
+    rows[5][CAD_FIELDS.index('h')] = None
+    table = CADTable.from_rows(rows, CAD_FIELDS)
+    df = get_df(rows, columns=CAD_FIELDS)
+
+    def test_column_types(self):
+        """
+        Test every known column is parsed into its typed array
+        """
+        for name in ('jd', 'dist', 'dist_min', 'dist_max', 'v_rel', 'v_inf', 'h', 't_sigma_f'):
+            assert self.table[name].dtype == np.float64
+        assert np.issubdtype(self.table['cd'].dtype, np.datetime64)
+        assert isinstance(self.table.columns['des'], Categorical)
+
+    def test_values_match_pandas_parsing(self):
+        """
+        Test parsed values equal pd.to_numeric & pd.to_datetime of get_df columns
+        """
+        for name in ('dist', 'v_inf', 'h', 'jd'):
+            np.testing.assert_array_equal(self.table[name], pd.to_numeric(self.df[name]).to_numpy())
+        np.testing.assert_array_equal(self.table['cd'], pd.to_datetime(self.df['cd']).to_numpy())
+        assert self.table['des'].tolist() == self.df['des'].tolist()
+
+    def test_nulls(self):
+        """
+        Test nulls become NaN
+        """
+        assert np.isnan(self.table['v_inf'][3])
+        assert np.isnan(self.table['h'][5])
+        assert self.table['t_sigma_f'][4] == 2 * 1440 + 7 * 60 + 29
+        assert self.table['t_sigma_f'][0] == 1
+
+    def test_upper_bound_qualifier(self):
+        """
+        Test the `< ` qualifier of `t_sigma_f` is kept in its format column and formatted back
+        """
+        upper = self.table.columns['t_sigma_f_upper']
+        assert upper.dtype == bool
+        assert upper[0] and not upper[4]
+        assert 't_sigma_f_upper' not in self.table.fields
+        column = CAD_FIELDS.index('t_sigma_f')
+        assert [row[column] for row in self.table.to_rows()] == [row[column] for row in self.rows]
+        assert self.table.take(np.arange(3, 6)).to_rows(['t_sigma_f']) == [['< 00:01'], ['2_07:29'], ['< 00:01']]
+        concat = CADTable.concat([self.table, self.table])
+        assert concat.to_rows(['t_sigma_f'])[104] == ['2_07:29']
+
+    def test_to_pandas_zero_copy(self):
+        """
+        Test pandas export shares column memory
+        """
+        df = self.table.to_pandas()
+        assert list(df.columns) == CAD_FIELDS
+        assert np.shares_memory(df['dist'].to_numpy(), self.table['dist'])
+        assert df['des'].dtype == 'category'
+
+    def test_take(self):
+        """
+        Test row selection keeps types
+        """
+        subset = self.table.take(self.table['dist'] < 0.01)
+        assert len(subset) == int((self.table['dist'] < 0.01).sum())
+        assert isinstance(subset.columns['des'], Categorical)
+
+    def test_empty(self):
+        """
+        Test response without data
+        """
+        table = CADTable.from_rows(None, CAD_FIELDS)
+        assert len(table) == 0
+        assert table.to_pandas().shape == (0, len(CAD_FIELDS))
@@ -0,0 +1,109 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import pytest
+
+from app.client import APIClient
+
+
+@pytest.fixture(scope='module')
+def stub(stub_server):
+    return stub_server(num_rows=5)
+
+
+class TestClientPool:
+    """
+    Test pooled keep-alive sessions of APIClient against local stub server
+    """
+
+    def test_connections_are_reused(self, stub):
+        """
+        Test sequential calls share one kept-alive connection
+        """
+        connections_before = stub.connections
+        with APIClient(base_url=stub.url) as client:
+            for _ in range(10):
+                assert client.get().code == HTTPStatus.OK
+        assert stub.connections - connections_before == 1
+
+    def test_pool_shared_across_threads(self, stub):
+        """
+        Test concurrent calls never open more connections than the pool size
+        """
+        connections_before = stub.connections
+        with APIClient(base_url=stub.url, pool_maxsize=4) as client:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                codes = list(pool.map(lambda _: client.get().code, range(40)))
+        assert set(codes) == {HTTPStatus.OK}
+        assert stub.connections - connections_before <= 4
+
+    def test_keep_alive_disabled(self, stub):
+        """
+        Test every call opens a new connection without keep-alive
+        """
+        connections_before = stub.connections
+        with APIClient(base_url=stub.url, keep_alive=False) as client:
+            for _ in range(3):
+                client.get()
+        assert stub.connections - connections_before == 3
+
+    def test_shared_session_is_not_closed(self, stub):
+        """
+        Test a client does not close a session it does not own
+        """
+        with APIClient(base_url=stub.url) as owner:
+            with APIClient(base_url=stub.url, session=owner.session) as borrower:
+                borrower.get()
+            assert owner.get().code == HTTPStatus.OK
+
+
+class TestClientRetry:
+    """
+    Test retry with backoff of APIClient sessions against local stub server
+    """
+
+    def test_error_status_is_retried(self, stub):
+        """
+        Test a 503 is retried and the following 200 returned
+        """
+        requests_before, errors_before = stub.requests, stub.errors
+        stub.fail_next = 2
+        with APIClient(base_url=stub.url, backoff_factor=0.01) as client:
+            assert client.get().code == HTTPStatus.OK
+        assert stub.requests - requests_before == 3
+        assert stub.errors - errors_before == 2
+
+    def test_retries_are_bounded(self, stub):
+        """
+        Test the last error status is returned once max_retries are spent
+        """
+        requests_before = stub.requests
+        stub.fail_next = 5
+        with APIClient(base_url=stub.url, max_retries=2, backoff_factor=0.01) as client:
+            assert client.get().code == HTTPStatus.SERVICE_UNAVAILABLE
+        assert stub.requests - requests_before == 3
+        stub.fail_next = 0
+
+    def test_post_is_not_retried(self, stub):
+        """
+        Test a POST answered 503 is returned as is, it may not be idempotent
+        """
+        requests_before = stub.requests
+        stub.fail_next = 1
+        with APIClient(base_url=stub.url, backoff_factor=0.01) as client:
+            assert client.post(data=b'{}').code == HTTPStatus.SERVICE_UNAVAILABLE
+            assert client.get().code == HTTPStatus.OK
+        assert stub.requests - requests_before == 2
+
+    def test_retry_after_is_respected(self, stub_server):
+        """
+        Test a 429 is retried once its Retry-After has elapsed
+        """
+        limited = stub_server(num_rows=5, rate_limit=1)
+        with APIClient(base_url=limited.url, backoff_factor=0.01) as client:
+            assert client.get().code == HTTPStatus.OK
+            start = time.monotonic()
+            assert client.get().code == HTTPStatus.OK
+            assert time.monotonic() - start >= 0.9
+        assert limited.requests == 3 and limited.throttled == 1
@@ -0,0 +1,174 @@
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import pandas as pd
+import pytest
+import urllib3.response
+
+from app.cache import CacheEntry, SQLiteCache
+from app.client import APIClient
+from app.compression import CODECS, content_encodings, encode_content, get_codec
+from app.metrics import Metrics
+from utils.cad_snapshot import load_response, open_snapshot, save_response
+from utils.cad_table import CADTable
+from utils.stub_server import make_cad_payload
+
+
+@pytest.fixture(scope='module')
+def stub(stub_server):
+    return stub_server(num_rows=500, compression=True)
+
+
+def client_for(stub, encoding, **kwargs):
+    client = APIClient(base_url=stub.url, **kwargs)
+    client.session.headers['Accept-Encoding'] = encoding
+    return client
+
+
+class TestCodecs:
+    """
+    Test storage codecs & content codings
+    """
+
+    @pytest.mark.parametrize('name', list(CODECS))
+    def test_round_trip(self, name):
+        payload = make_cad_payload(100)
+        codec = get_codec(name)
+        assert codec.decompress(codec.compress(payload)) == payload
+        if name != 'none':
+            assert len(codec.compress(payload)) < len(payload) / 2
+
+    def test_default_codec(self):
+        assert get_codec().name in ('zstd', 'lz4', 'zlib')
+        with pytest.raises(ValueError):
+            get_codec('rar')
+
+    def test_content_encodings(self):
+        assert content_encodings()[-2:] == ['gzip', 'deflate']
+        with pytest.raises(ValueError):
+            encode_content(b'{}', 'compress')
+
+    def test_brotli_only_when_urllib3_decodes_it(self, monkeypatch):
+        """
+        Test `br` is advertised only when urllib3 has a brotli decoder, whether brotli is installed or not
+        """
+        monkeypatch.delattr(urllib3.response, 'BrotliDecoder', raising=False)
+        assert content_encodings() == ['gzip', 'deflate']
+        monkeypatch.setattr(urllib3.response, 'BrotliDecoder', object, raising=False)
+        assert content_encodings() == ['br', 'gzip', 'deflate']
+
+
+class TestCompressedTransport:
+    """
+    Test negotiated response compression is decoded transparently & measured on the wire
+    """
+
+    @pytest.mark.parametrize('encoding', ['gzip', 'deflate', 'identity'])
+    @pytest.mark.parametrize('stream', [False, True])
+    def test_decoded_content(self, stub, encoding, stream):
+        with client_for(stub, encoding) as client:
+            res = client.get(stream=stream)
+            assert res.code == HTTPStatus.OK
+            assert res.headers.get('Content-Encoding') == (encoding if encoding != 'identity' else None)
+            assert res.get_count() == 500
+            assert len(list(res.iter_data())) == 500
+
+    def test_client_negotiates(self, stub):
+        with APIClient(base_url=stub.url) as client:
+            assert client.get().headers['Content-Encoding'] == content_encodings()[0]
+        with APIClient(base_url=stub.url, compress=False) as client:
+            assert 'Content-Encoding' not in client.get().headers
+
+    def test_wire_bytes(self, stub):
+        """
+        Test compressed bodies count fewer wire bytes than decoded bytes, uncompressed ones the same
+        """
+        timings = []
+        for encoding in ('gzip', 'identity'):
+            with client_for(stub, encoding, metrics=Metrics(callback=timings.append)) as client:
+                client.get()
+        compressed, identity = timings
+        assert compressed.bytes == identity.bytes
+        assert identity.wire_bytes == identity.bytes
+        assert 0 < compressed.wire_bytes < compressed.bytes / 2
+
+    def test_revalidation_per_encoding(self, stub):
+        with client_for(stub, 'gzip') as client:
+            etag = client.get().headers['ETag']
+            assert etag.endswith('-gzip"')
+            assert client.get(headers={'If-None-Match': etag}).code == HTTPStatus.NOT_MODIFIED
+
+
+class TestCompressedStorage:
+    """
+    Test compressed cache entries & snapshots
+    """
+
+    @pytest.mark.parametrize('codec', list(CODECS))
+    def test_sqlite_cache(self, tmp_path, codec):
+        payload = make_cad_payload(200)
+        cache = SQLiteCache(str(tmp_path / 'cache.db'), codec=codec)
+        cache.set('a', CacheEntry(HTTPStatus.OK, payload, '"e"', None, time.time() + 60))
+        assert cache.get('a').content == payload
+        size, = cache._db.execute('SELECT size FROM responses').fetchone()
+        assert size == len(payload) if codec == 'none' else size < len(payload) / 2
+        cache.close()
+        # entries stay readable by a cache using another codec
+        cache = SQLiteCache(str(tmp_path / 'cache.db'))
+        assert cache.get('a').content == payload
+        cache.close()
+
+    @pytest.mark.parametrize('codec', list(CODECS))
+    def test_sqlite_cache_threads(self, tmp_path, codec):
+        """
+        Test entries set & read concurrently, e.g. by proxy handler threads, round trip whole
+        """
+        payloads = [make_cad_payload(rows) for rows in range(50, 82)]
+        cache = SQLiteCache(str(tmp_path / 'cache.db'), codec=codec, max_bytes=2 ** 30)
+
+        def set_get(index):
+            # every key always holds the same payload, whichever thread writes it last
+            key, payload = f'key {index % len(payloads)}', payloads[index % len(payloads)]
+            cache.set(key, CacheEntry(HTTPStatus.OK, payload, None, None, time.time() + 60))
+            return cache.get(key).content == payload
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            assert all(pool.map(set_get, range(512)))
+        cache.close()
+
+    def test_sqlite_cache_migration(self, tmp_path):
+        """
+        Test a database without codec column is upgraded & its bodies read as is
+        """
+        path = str(tmp_path / 'cache.db')
+        db = sqlite3.connect(path)
+        db.execute('CREATE TABLE responses (key TEXT PRIMARY KEY, code INTEGER, content BLOB, etag TEXT, '
+                   'last_modified TEXT, expires_at REAL, accessed_at REAL, size INTEGER)')
+        db.execute('INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                   ('a', 200, b'{}', None, None, time.time() + 60, time.time(), 2))
+        db.commit()
+        db.close()
+        cache = SQLiteCache(path, codec='zlib')
+        assert cache.get('a').content == b'{}'
+        cache.set('b', CacheEntry(HTTPStatus.OK, b'[]', None, None, time.time() + 60))
+        assert cache.get('b').content == b'[]'
+        cache.close()
+
+    @pytest.mark.parametrize('codec', [name for name in CODECS if name != 'none'])
+    def test_snapshot(self, stub, tmp_path, codec):
+        with APIClient(base_url=stub.url) as client:
+            res = client.get()
+        save_response(res, str(tmp_path / 'plain'))
+        save_response(res, str(tmp_path / 'packed'), codec=codec)
+        plain, packed = open_snapshot(str(tmp_path / 'plain')), open_snapshot(str(tmp_path / 'packed'))
+        pd.testing.assert_frame_equal(packed.to_pandas(), plain.to_pandas())
+        pd.testing.assert_frame_equal(packed.to_pandas(), CADTable.from_response(res).to_pandas())
+        assert load_response(str(tmp_path / 'packed')).json_content == \
+            load_response(str(tmp_path / 'plain')).json_content
+        assert disk_size(tmp_path / 'packed') < disk_size(tmp_path / 'plain')
+
+
+def disk_size(path):
+    return sum(file.stat().st_size for file in path.iterdir())
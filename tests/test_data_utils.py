@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+
+from app.client import APIClient
+from utils import data_utils
+from utils.data_utils import clear_orbit_class_memo, resolve_orbit_classes
+from utils.stub_server import StubServer, orbit_class_of
+
+
+@pytest.fixture(scope='module')
+def sbdb_client(stub_server):
+    stub = stub_server()
+    with APIClient(endpoint='sbdb.api', base_url=stub.url) as client:
+        client.stub = stub
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def orbit_class_memo():
+    clear_orbit_class_memo()
+    yield
+    clear_orbit_class_memo()
+
+
+class TestResolveOrbitClasses:
+    """
+    Test batched, memoised orbit class lookup
+    """
+
+    def test_aligned_with_input(self, sbdb_client):
+        """
+        Test result keeps input order & index, duplicates looked up once
+        """
+        designations = pd.Series(['resolve 1', 'resolve 2', 'resolve 1', 'resolve 3'], index=[10, 11, 12, 13])
+        requests_before = sbdb_client.stub.requests
+        classes = resolve_orbit_classes(designations, client=sbdb_client)
+        assert classes.to_list() == [orbit_class_of(des) for des in designations]
+        assert classes.index.to_list() == [10, 11, 12, 13]
+        assert sbdb_client.stub.requests - requests_before == 3
+
+    def test_memo_is_shared_across_calls(self, sbdb_client):
+        """
+        Test known designations are served from memo
+        """
+        resolve_orbit_classes(['memo 1', 'memo 2'], client=sbdb_client)
+        requests_before = sbdb_client.stub.requests
+        classes = resolve_orbit_classes(['memo 2', 'memo 1', 'memo 3'], client=sbdb_client)
+        assert classes.to_list() == [orbit_class_of(des) for des in ('memo 2', 'memo 1', 'memo 3')]
+        assert sbdb_client.stub.requests - requests_before == 1
+
+    def test_memo_is_keyed_on_server(self, sbdb_client):
+        """
+        Test a designation memoised from one server is looked up again on another
+        """
+        resolve_orbit_classes(['server 1'], client=sbdb_client)
+        with StubServer() as other, APIClient(endpoint='sbdb.api', base_url=other.url) as other_client:
+            assert resolve_orbit_classes(['server 1'], client=other_client).to_list() == [orbit_class_of('server 1')]
+            assert other.requests == 1
+
+    def test_memo_is_bounded(self, sbdb_client, monkeypatch):
+        """
+        Test least recently used designations are evicted past ORBIT_CLASS_MEMO_SIZE
+        """
+        monkeypatch.setattr(data_utils, 'ORBIT_CLASS_MEMO_SIZE', 2)
+        resolve_orbit_classes(['bound 1', 'bound 2'], client=sbdb_client)
+        resolve_orbit_classes(['bound 1'], client=sbdb_client)
+        resolve_orbit_classes(['bound 3'], client=sbdb_client)
+        assert [des for _, des in data_utils._orbit_class_memo] == ['bound 1', 'bound 3']
+        requests_before = sbdb_client.stub.requests
+        resolve_orbit_classes(['bound 2'], client=sbdb_client)
+        assert sbdb_client.stub.requests - requests_before == 1
@@ -0,0 +1,99 @@
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.client import APIClient
+from app.planner import ShardFailed
+from utils.cad_table import CADTable
+from utils.ingest import IngestPipeline, load_shared, parse_shared, _share_bytes
+from utils.stub_server import StubServer
+
+WINDOWS = [{'date-min': f'{year}-01-01', 'date-max': f'{year}-12-31', 'body': 'ALL', 'fullname': 'true',
+            'dist-max': '1'} for year in (2025, 2026, 2027)]
+# where posix shared memory blocks are listed
+SHM_DIR = '/dev/shm'
+
+
+@pytest.fixture(scope='module')
+def stub(stub_server):
+    return stub_server(dataset_rows=3000)
+
+
+def expected_tables(stub):
+    with APIClient(base_url=stub.url) as client:
+        return [CADTable.from_response(client.get(params=params)) for params in WINDOWS]
+
+
+def parse_body(body):
+    """
+    CADTable of a body parsed through shared memory, as worker processes do, the body block is released
+    """
+    name, length = _share_bytes(body)
+    try:
+        return load_shared(parse_shared(name, length))
+    finally:
+        block = shared_memory.SharedMemory(name=name)
+        block.close()
+        block.unlink()
+
+
+def shm_blocks():
+    return set(os.listdir(SHM_DIR))
+
+
+def assert_tables_equal(actual, expected):
+    assert actual.fields == expected.fields
+    pd.testing.assert_frame_equal(actual.to_pandas(), expected.to_pandas())
+
+
+class TestIngestPipeline:
+    """
+    Test process pool ingestion gives the same tables as parsing on the main thread
+    """
+
+    @pytest.mark.parametrize('processes', [0, 2])
+    def test_matches_single_thread(self, stub, processes):
+        """
+        Test tables of every window match parsing each response on the main thread
+        """
+        with IngestPipeline(APIClient(base_url=stub.url), processes=processes, io_threads=2) as pipeline:
+            tables = pipeline.ingest(WINDOWS)
+        for actual, expected in zip(tables, expected_tables(stub)):
+            assert_tables_equal(actual, expected)
+        assert sum(map(len, tables)) > 0
+
+    def test_shared_memory_round_trip(self):
+        """
+        Test every column kind, nulls and empty bodies survive the shared memory hand-off
+        """
+        body = (b'{"fields": ["des", "cd", "dist", "orbit_id"], "data": '
+                b'[["433", "2020-Jan-01 00:00", "0.1", null], ["99942", null, null, "12"]]}')
+        table = parse_body(body)
+        assert list(table['des']) == ['433', '99942']
+        assert list(table['orbit_id']) == [None, '12']
+        assert np.isnan(table['dist'][1]) and np.isnat(table['cd'][1])
+        assert len(parse_body(b'{"count": "0"}')) == 0
+
+    @pytest.mark.skipif(not os.path.isdir(SHM_DIR), reason='shared memory blocks are not listed on this platform')
+    def test_failed_worker(self):
+        """
+        Test a body failing to parse in a worker process raises and leaves no shared memory block behind
+        """
+        with StubServer(num_rows=0) as server:
+            server.cad_payload = b'{"fields": ["des"], "data": [["433"'
+            blocks_before = shm_blocks()
+            with IngestPipeline(APIClient(base_url=server.url), processes=2, io_threads=2) as pipeline:
+                with pytest.raises(ValueError):
+                    pipeline.ingest(WINDOWS)
+            assert shm_blocks() <= blocks_before
+
+    def test_failed_query(self, stub):
+        """
+        Test a query not answered with 200 raises ShardFailed
+        """
+        with IngestPipeline(APIClient(base_url=stub.url), processes=0, io_threads=2) as pipeline:
+            with pytest.raises(ShardFailed):
+                pipeline.ingest([{'date-min': 'yesterday'}])
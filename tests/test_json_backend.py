@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+import app.client
+from app.client import JSON_BACKENDS, RawResponse, Response, get_json_backend, set_json_backend
+from app.metrics import Metrics
+from utils.stub_server import make_cad_payload, make_sbdb_payload
+
+PAYLOADS = [
+    make_cad_payload(200),
+    make_sbdb_payload('2000 SG344'),
+    json.dumps({'count': '1', 'data': [['Ærø ☄ 𝛑', None, '1e-7', True]], 'moreInfo': {'nested': [1, 2.5, -0]}},
+               ensure_ascii=False).encode(),
+    b'',
+]
+
+
+@pytest.fixture(autouse=True)
+def restore_backend(monkeypatch):
+    monkeypatch.setattr(app.client, '_json_backend', get_json_backend())
+
+
+class TestJSONBackend:
+    """
+    Test every installed json backend gives the stdlib json_content
+    """
+
+    @pytest.mark.parametrize('name', list(JSON_BACKENDS))
+    @pytest.mark.parametrize('payload', PAYLOADS)
+    def test_identical_json_content(self, name, payload):
+        expected = json.loads(payload or b'{}')
+        set_json_backend(name)
+        assert get_json_backend().name == name
+        assert Response(RawResponse(200, payload)).json_content == expected
+        # timed path
+        assert Response(RawResponse(200, payload), timing=Metrics().timing('cad.api', 'GET')).json_content == expected
+
+    @pytest.mark.parametrize('name', list(JSON_BACKENDS))
+    def test_invalid_body(self, name):
+        set_json_backend(name)
+        with pytest.raises(ValueError):
+            Response(RawResponse(200, b'{"count": '))
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            set_json_backend('yaml')
+
+    def test_stdlib_always_available(self):
+        assert 'json' in JSON_BACKENDS
+        assert list(JSON_BACKENDS)[-1] == 'json'
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from app.client import APIClient
+from utils.load_gen import LatencyHistogram, LoadGenerator, Stage, build_mix, parse_mix, schedule
+from utils.stub_server import StubServer
+
+DEFAULT_ONLY = ([('default', {})], [1])
+
+
+@pytest.fixture()
+def stub(stub_server):
+    return stub_server(dataset_rows=500)
+
+
+class TestSchedule:
+    """
+    Test open-loop arrival schedules
+    """
+
+    def test_constant(self):
+        offsets, stages = schedule([Stage(10, 10, 2)])
+        np.testing.assert_allclose(offsets, np.arange(20) / 10)
+        assert (stages == 0).all()
+
+    def test_ramp(self):
+        offsets, _ = schedule([Stage(0, 10, 2)])
+        assert len(offsets) == 10
+        gaps = np.diff(offsets)
+        # arrivals get denser as the rate ramps up
+        assert (gaps[1:] < gaps[:-1]).all() and offsets[-1] < 2
+
+    def test_stages(self):
+        offsets, stages = schedule([Stage(10, 10, 1), Stage(20, 40, 1)])
+        assert list(np.bincount(stages)) == [10, 30]
+        assert (offsets[stages == 1] >= 1).all() and (np.diff(offsets) > 0).all()
+
+    def test_poisson(self):
+        offsets, _ = schedule([Stage(100, 300, 10)], poisson=True)
+        assert abs(len(offsets) - 2000) < 200
+        assert (np.diff(offsets) >= 0).all() and offsets[-1] < 10
+        # first half of a 100 -> 300 ramp carries 3/8 of the arrivals
+        assert abs((offsets < 5).mean() - 3 / 8) < 0.05
+
+
+class TestLatencyHistogram:
+    """
+    Test percentiles are within histogram precision
+    """
+
+    def test_percentiles(self):
+        values = np.random.default_rng(0).lognormal(-4, 1, 10000)
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+        for percent in (50, 90, 99, 99.9):
+            assert histogram.percentile(percent) == pytest.approx(np.percentile(values, percent), rel=0.02)
+        assert histogram.percentile(100) == histogram.max == values.max()
+
+    def test_empty(self):
+        assert LatencyHistogram().percentile(99) == 0
+
+
+class TestMix:
+    """
+    Test parameter mixes drawn from the test cases
+    """
+
+    def test_build_mix(self):
+        cases, weights = build_mix(parse_mix('default=2,sorting=1'))
+        assert cases[0] == ('default', {}) and weights[0] == 2
+        assert {'sort': 'dist', 'limit': 5} in [params for _, params in cases]
+        assert sum(weights) == pytest.approx(3)
+
+    def test_invalid_mix(self):
+        with pytest.raises(ValueError):
+            build_mix({'writes': 1})
+        with pytest.raises(ValueError):
+            build_mix({'default': 0})
+
+
+class TestLoadGenerator:
+    """
+    Test load runs against the stub server
+    """
+
+    def test_status_breakdown(self, stub):
+        with APIClient(base_url=stub.url, max_retries=0, retry_statuses=()) as client, \
+                LoadGenerator(client, mix=build_mix({'default': 1, 'invalid': 1})) as generator:
+            report = generator.run([Stage(40, 40, 0.5)])
+        assert sum(report.statuses.values()) == 20
+        assert set(report.statuses) == {200, 400}
+        assert report.error_rate == 0
+        stub.error_rate = 0.5
+        with APIClient(base_url=stub.url, max_retries=0, retry_statuses=()) as client, \
+                LoadGenerator(client, mix=DEFAULT_ONLY) as generator:
+            report = generator.run([Stage(40, 40, 0.5)])
+        assert set(report.statuses) == {200, 503}
+        assert report.error_rate == report.statuses[503] / 20
+        assert 'statuses: {200: ' in report.format()
+
+    def test_exceptions(self):
+        upstream = StubServer(num_rows=1)
+        # never started & closed, its port refuses connections
+        upstream._httpd.server_close()
+        with APIClient(base_url=upstream.url, max_retries=0) as client, \
+                LoadGenerator(client, mix=DEFAULT_ONLY) as generator:
+            report = generator.run([Stage(20, 20, 0.25)])
+        assert report.errors == {'ConnectionError': 5} and report.error_rate == 1
+
+    def test_coordinated_omission(self, stub):
+        """
+        Test waits behind a saturated server count in latency but not in service time
+        """
+        stub.latency = 0.05
+        with APIClient(base_url=stub.url) as client, LoadGenerator(client, mix=DEFAULT_ONLY, workers=1) as generator:
+            report = generator.run([Stage(40, 40, 0.5)])
+        assert report.service.percentile(99) < 0.2
+        # 20 requests of 50ms sent in 0.5s by one worker, the last one waits ~0.5s
+        assert report.latency.percentile(99) > 3 * report.service.percentile(99)
+        assert report.as_dict()['stages'][0]['requests'] == 20
@@ -0,0 +1,85 @@
+import asyncio
+from http import HTTPStatus
+
+import pytest
+
+from app.async_client import AsyncAPIClient
+from app.client import APIClient
+from app.metrics import Histogram, Metrics
+
+
+@pytest.fixture(scope='module')
+def stub(stub_server):
+    return stub_server(num_rows=50)
+
+
+class TestMetrics:
+    """
+    Test per phase request timings & their Prometheus export
+    """
+
+    def test_client_records_phases(self, stub):
+        """
+        Test every phase is timed, connect only on the request opening the connection
+        """
+        timings = []
+        metrics = Metrics(callback=timings.append)
+        with APIClient(base_url=stub.url, metrics=metrics) as client:
+            client.get()
+            client.get()
+        assert [timing.status for timing in timings] == [HTTPStatus.OK, HTTPStatus.OK]
+        first, second = timings
+        assert set(first.phases) == {'connect', 'tls', 'wait', 'download', 'decode', 'parse'}
+        assert first.phases['connect'] > 0 and second.phases['connect'] == 0
+        assert first.rows == 50 and first.bytes > 0
+        endpoint = (('endpoint', 'cad.api'),)
+        assert metrics.counters[('cad_client_requests_total', endpoint + (('method', 'GET'), ('status', '200')))] == 2
+        assert metrics.counters[('cad_client_response_rows_total', endpoint)] == 100
+        assert metrics.histograms[('cad_client_phase_seconds', endpoint + (('phase', 'parse'),))].count == 2
+
+    def test_disabled_by_default(self, stub):
+        """
+        Test clients without metrics record nothing
+        """
+        with APIClient(base_url=stub.url) as client:
+            assert client.metrics is None
+            assert client.get().code == HTTPStatus.OK
+
+    def test_async_client_records_phases(self, stub):
+        """
+        Test AsyncAPIClient times wait, download, decode & parse
+        """
+        timings = []
+
+        async def call():
+            async with AsyncAPIClient(base_url=stub.url, metrics=Metrics(callback=timings.append)) as client:
+                await client.get()
+
+        asyncio.run(call())
+        assert set(timings[0].phases) == {'wait', 'download', 'decode', 'parse'}
+        assert timings[0].rows == 50
+
+    def test_histogram_buckets(self):
+        """
+        Test values land in the first bucket whose bound they do not exceed
+        """
+        histogram = Histogram((0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+        assert histogram.counts == [2, 1, 1]
+        assert histogram.count == 4
+
+    def test_prometheus_format(self, stub):
+        """
+        Test exposition text has typed counters & cumulative histogram buckets
+        """
+        metrics = Metrics(buckets=(0.5, 60))
+        with APIClient(base_url=stub.url, metrics=metrics) as client:
+            client.get()
+        text = metrics.to_prometheus()
+        assert '# TYPE cad_client_requests_total counter' in text
+        assert 'cad_client_requests_total{endpoint="cad.api",method="GET",status="200"} 1' in text
+        assert '# TYPE cad_client_phase_seconds histogram' in text
+        assert 'cad_client_phase_seconds_bucket{endpoint="cad.api",phase="wait",le="60"} 1' in text
+        assert 'cad_client_phase_seconds_bucket{endpoint="cad.api",phase="wait",le="+Inf"} 1' in text
+        assert 'cad_client_phase_seconds_count{endpoint="cad.api",phase="wait"} 1' in text
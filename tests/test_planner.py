@@ -0,0 +1,112 @@
+import datetime
+from http import HTTPStatus
+
+import pytest
+
+from app.client import Response
+from app.planner import QueryPlanner, parse_date
+from utils.stub_server import CAD_FIELDS, CAD_SIGNATURE, make_cad_rows
+
+ROWS = make_cad_rows(2000)
+
+
+class FakeClient:
+    """
+    In memory cad.api honouring date window, sort & limit
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+
+    def get(self, params=None):
+        self.calls += 1
+        start = datetime.datetime.strptime(params['date-min'], '%Y-%m-%dT%H:%M:%S')
+        end = datetime.datetime.strptime(params['date-max'], '%Y-%m-%dT%H:%M:%S')
+        rows = [row for row in self.rows
+                if start <= datetime.datetime.strptime(row[3], '%Y-%b-%d %H:%M') <= end]
+        sort = params.get('sort', 'date')
+        column = CAD_FIELDS.index({'date': 'jd', 'dist': 'dist', 'h': 'h'}[sort.lstrip('-')])
+        rows = sorted(rows, key=lambda row: float(row[column]), reverse=sort.startswith('-'))
+        rows = rows[:int(params['limit'])] if 'limit' in params else rows
+        content = {'signature': CAD_SIGNATURE, 'count': str(len(rows))}
+        if rows:
+            content.update({'fields': CAD_FIELDS, 'data': rows})
+        return Response.from_json(content)
+
+
+@pytest.fixture
+def window():
+    return {'date-min': '2020-01-01', 'date-max': '2020-03-01'}
+
+
+class TestQueryPlanner:
+    """
+    Test sharding & merging of QueryPlanner
+    """
+
+    def test_parse_date(self):
+        """
+        Test cad.api date values
+        """
+        now = datetime.datetime(2020, 1, 1)
+        assert parse_date('now', now) == now
+        assert parse_date('+60', now) == datetime.datetime(2020, 3, 1)
+        assert parse_date('2020-01-02T03:04', now) == datetime.datetime(2020, 1, 2, 3, 4)
+        with pytest.raises(ValueError):
+            parse_date('2000-JAN-01', now)
+
+    @pytest.mark.parametrize('sort', ['date', '-date', 'dist', '-dist', 'h'])
+    def test_sharded_matches_single_query(self, window, sort):
+        """
+        Test merged shards equal one unsharded query, with oversized shards split
+        """
+        client = FakeClient(ROWS)
+        expected = client.get(params={'date-min': '2020-01-01T00:00:00', 'date-max': '2020-03-01T00:00:00',
+                                      'sort': sort}).get_data()
+        with QueryPlanner(client=client, max_rows_per_shard=100, rows_per_day=10) as planner:
+            res = planner.get(params=dict(window, sort=sort))
+        assert res.code == HTTPStatus.OK
+        assert res.get_fields() == CAD_FIELDS
+        assert len(res.get_data()) == len(expected) == res.get_count()
+        column = CAD_FIELDS.index({'date': 'jd', 'dist': 'dist', 'h': 'h'}[sort.lstrip('-')])
+        assert [row[column] for row in res.get_data()] == [row[column] for row in expected]
+        assert client.calls > 2
+
+    def test_boundary_rows_are_deduplicated(self, window):
+        """
+        Test a row on a shard boundary is returned by both shards but merged once
+        """
+        client = FakeClient(ROWS)
+        # daily shards, row 1440 approaches exactly at midnight of 2020-02-07
+        with QueryPlanner(client=client, max_rows_per_shard=100, rows_per_day=100) as planner:
+            assert len(planner.plan(*(parse_date(window[key]) for key in ('date-min', 'date-max')))) == 60
+            data = planner.get(params=window).get_data()
+        assert ROWS[1440][3] == '2020-Feb-07 00:00'
+        assert data.count(ROWS[1440]) == 1
+
+    def test_limit_applies_to_merged_stream(self, window):
+        """
+        Test limit is applied after merging
+        """
+        with QueryPlanner(client=FakeClient(ROWS), max_rows_per_shard=100) as planner:
+            res = planner.get(params=dict(window, sort='-dist', limit=5))
+        dists = [float(row[CAD_FIELDS.index('dist')]) for row in res.get_data()]
+        assert dists == sorted((float(row[CAD_FIELDS.index('dist')]) for row in ROWS), reverse=True)[:5]
+
+    def test_no_results(self):
+        """
+        Test window without rows
+        """
+        with QueryPlanner(client=FakeClient(ROWS)) as planner:
+            res = planner.get(params={'date-min': '1990-01-01', 'date-max': '1990-02-01'})
+        assert res.get_count() == 0
+        assert res.get_data() is None
+
+    def test_unsupported_sort(self, window):
+        """
+        Test unsupported sort key is rejected
+        """
+        with QueryPlanner(client=FakeClient(ROWS)) as planner:
+            with pytest.raises(ValueError):
+                planner.stream(params=dict(window, sort='body'))
@@ -0,0 +1,109 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import pytest
+import requests
+
+from app.cache import ResponseCache
+from app.client import APIClient
+from app.proxy import CADProxy
+from utils.stub_server import StubServer
+
+WINDOW = {'date-min': '2025-01-01', 'date-max': '2025-06-30', 'dist-max': '0.2'}
+
+
+@pytest.fixture()
+def stub(stub_server):
+    return stub_server(dataset_rows=2000)
+
+
+def make_proxy(stub, **kwargs):
+    kwargs.setdefault('prefetch_interval', None)
+    return CADProxy(upstream=stub.url, **kwargs)
+
+
+class TestCADProxy:
+    """
+    Test the caching proxy against a stub upstream
+    """
+
+    def test_same_answers_as_upstream(self, stub):
+        with make_proxy(stub) as proxy, APIClient(base_url=proxy.url) as consumer, \
+                APIClient(base_url=stub.url) as direct:
+            for params in ({}, WINDOW, {'date-min': 'yesterday'}):
+                proxied, expected = consumer.get(params=params), direct.get(params=params)
+                assert proxied.code == expected.code
+                assert proxied.json_content == expected.json_content
+
+    def test_repeated_queries_are_cached(self, stub):
+        with make_proxy(stub) as proxy, APIClient(base_url=proxy.url) as consumer:
+            for _ in range(5):
+                consumer.get(params=WINDOW)
+            report = proxy.report()
+        assert stub.requests == 1
+        assert report['requests'] == 5 and report['hits'] == 4 and report['hit_ratio'] == 0.8
+        assert report['upstream_requests'] == 1 and report['upstream_mean_seconds'] > 0
+
+    def test_concurrent_misses_coalesce(self, stub):
+        stub.latency = 0.2
+        with make_proxy(stub) as proxy:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                codes = list(pool.map(lambda _: requests.get(proxy.url + 'cad.api', params=WINDOW).status_code,
+                                      range(8)))
+            assert codes == [HTTPStatus.OK] * 8
+            assert stub.requests == 1
+            assert proxy.report()['coalesced'] == 7
+
+    def test_prefetch_default_window(self, stub):
+        with make_proxy(stub, cache=ResponseCache(ttls={'cad.api': 1}), prefetch_ahead=0.5) as proxy, \
+                APIClient(base_url=proxy.url) as consumer:
+            assert proxy.prefetch_pass() == 1
+            consumer.get()
+            assert stub.requests == 1 and proxy.report()['hits'] == 1
+            # fresh for more than ttl * prefetch_ahead, left as is
+            assert proxy.prefetch_pass() == 0
+            time.sleep(0.6)
+            # revalidated with its ETag before it expires
+            assert proxy.prefetch_pass() == 1
+            assert proxy.report()['revalidated'] == 1
+            time.sleep(0.6)
+            consumer.get()
+            assert proxy.report()['hits'] == 2
+
+    def test_prefetch_popular_windows(self, stub):
+        with make_proxy(stub, cache=ResponseCache(ttls={'cad.api': 60}), prefetch=(), prefetch_ahead=1,
+                        popular_requests=3) as proxy, APIClient(base_url=proxy.url) as consumer:
+            consumer.get(params={'dist-max': '0.01'})
+            for _ in range(3):
+                consumer.get(params=WINDOW)
+            assert proxy.prefetch_pass() == 1
+            # popularity is counted between passes
+            assert proxy.prefetch_pass() == 0
+            assert proxy.report()['prefetches'] == 1
+
+    def test_background_prefetch(self, stub):
+        with make_proxy(stub, prefetch_interval=0.05) as proxy:
+            deadline = time.time() + 5
+            while proxy.report()['prefetches'] == 0 and time.time() < deadline:
+                time.sleep(0.01)
+        assert stub.requests == 1
+
+    def test_upstream_down(self):
+        upstream = StubServer(num_rows=1)
+        # never started & closed, its port refuses connections
+        upstream._httpd.server_close()
+        with make_proxy(upstream) as proxy:
+            res = requests.get(proxy.url + 'cad.api', params=WINDOW)
+            assert res.status_code == HTTPStatus.BAD_GATEWAY
+            assert 'Upstream request failed' in res.json()['message']
+            assert proxy.report()['upstream_errors'] == 1
+
+    def test_stats_and_metrics(self, stub):
+        with make_proxy(stub) as proxy:
+            requests.get(proxy.url + 'cad.api')
+            assert requests.get(proxy.url + 'stats').json()['requests'] == 1
+            metrics = requests.get(proxy.url + 'metrics').text
+            assert 'cad_proxy_requests_total{status="200"} 1' in metrics
+            assert 'cad_proxy_upstream_seconds_count 1' in metrics
+            assert requests.get(proxy.url + 'sbdb.api').status_code == HTTPStatus.NOT_FOUND
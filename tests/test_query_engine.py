@@ -0,0 +1,125 @@
+from http import HTTPStatus
+
+import numpy as np
+import pytest
+
+from app.client import CloseApproachBodies
+from utils.api_cases import (invalid_filter_test_cases, invalid_sorting_test_cases, numeric_filter_test_cases,
+                             sorting_test_cases)
+from utils.cad_table import CADTable
+from utils.query_engine import LD_IN_AU, RANGE_FILTERS, QueryEngine, parse_distance
+from utils.stub_server import CAD_FIELDS, make_cad_rows, orbit_class_of
+
+BODIES = [body.name for body in CloseApproachBodies if body is not CloseApproachBodies.ALL]
+
+
+@pytest.fixture(scope='module')
+def engine():
+    """
+    Wide body=ALL dataset, `body` inserted before `h` like cad.api does
+    """
+    fields = CAD_FIELDS[:-1] + ['body', 'h', 'fullname']
+    rows = [row[:-1] + [BODIES[i % len(BODIES)], row[-1], f'     ({row[0]})']
+            for i, row in enumerate(make_cad_rows(3000))]
+    rows[7][fields.index('h')] = None
+    table = CADTable.from_rows(rows, fields)
+    return QueryEngine(table, rows=rows, apply_defaults=False,
+                       orbit_classes=lambda des: des.map(orbit_class_of))
+
+
+def column(res, name):
+    index = res.get_fields().index(name)
+    return [row[index] for row in res.get_data()]
+
+
+class TestQueryEngine:
+    """
+    Test cad.api params evaluated locally
+    """
+
+    def test_parse_distance(self):
+        """
+        Test au & LD units
+        """
+        assert parse_distance('0.05') == 0.05
+        assert parse_distance('0.05au') == 0.05
+        assert parse_distance('10LD') == 10 * LD_IN_AU
+
+    @pytest.mark.parametrize('test_case', numeric_filter_test_cases, ids=lambda case: case.filter_key)
+    def test_numeric_filters(self, engine, test_case):
+        """
+        Test numeric filter cases of api_cases
+        """
+        res = engine.query({test_case.filter_key: test_case.filter_value, 'body': 'ALL'})
+        assert res.code == HTTPStatus.OK
+        name, compare = RANGE_FILTERS[test_case.filter_key]
+        values = np.array(column(res, name), dtype=float)
+        limit = parse_distance(test_case.filter_value) if name == 'dist' else float(test_case.filter_value)
+        assert res.get_count() > 0
+        assert compare(values, limit).all()
+
+    @pytest.mark.parametrize('test_case', invalid_filter_test_cases + invalid_sorting_test_cases,
+                             ids=lambda case: str(case))
+    def test_bad_requests(self, engine, test_case):
+        """
+        Test invalid filter & sort cases of api_cases are answered with 400
+        """
+        if hasattr(test_case, 'filter_key'):
+            params = {test_case.filter_key: test_case.filter_value}
+        else:
+            params = {'sort': test_case.key}
+        assert engine.query(params).code == test_case.expected_response_code
+
+    @pytest.mark.parametrize('test_case', sorting_test_cases, ids=lambda case: case.key)
+    def test_sorting(self, engine, test_case):
+        """
+        Test sorting cases of api_cases, nulls last
+        """
+        res = engine.query({'sort': test_case.key, 'body': 'ALL'})
+        values = column(res, test_case.column)
+        if test_case.column == 'cd':
+            values = column(res, 'jd')
+        values = [float(value) for value in values if value is not None]
+        assert values == sorted(values, reverse=test_case.reverse)
+        if test_case.column == 'h':
+            assert column(res, 'h')[-1] is None
+
+    def test_body_filter(self, engine):
+        """
+        Test body filter & body column visibility
+        """
+        mars = engine.query({'body': 'Mars'})
+        assert 'body' not in mars.get_fields()
+        assert mars.get_count() == 3000 // len(BODIES)
+        everything = engine.query({'body': 'ALL'})
+        assert set(column(everything, 'body')) == set(BODIES)
+
+    def test_class_filter_limit_fullname(self, engine):
+        """
+        Test class filter with limit & fullname
+        """
+        res = engine.query({'class': 'APO', 'limit': 5, 'fullname': True, 'body': 'ALL'})
+        assert res.get_count() == 5
+        assert {orbit_class_of(des) for des in column(res, 'des')} == {'APO'}
+        assert 'fullname' in res.get_fields()
+
+    def test_defaults(self):
+        """
+        Test cad.api defaults are applied: 60 days from now, within 0.05 au
+        """
+        engine = QueryEngine(CADTable.from_rows(make_cad_rows(10), CAD_FIELDS))
+        res = engine.query()
+        assert res.code == HTTPStatus.OK
+        assert res.get_count() == 0
+
+    def test_formatted_rows_without_source_rows(self, engine):
+        """
+        Test rows are formatted from typed columns when original rows are not kept
+        """
+        formatting = QueryEngine(engine.table, apply_defaults=False)
+        params = {'sort': '-dist', 'limit': 3, 'body': 'ALL'}
+        expected, actual = engine.query(params), formatting.query(params)
+        assert actual.get_fields() == expected.get_fields()
+        assert [float(value) for value in column(actual, 'dist')] == \
+               [float(value) for value in column(expected, 'dist')]
+        assert column(actual, 'cd') == column(expected, 'cd')
@@ -0,0 +1,65 @@
+import datetime
+import sys
+
+import pytest
+
+from app.client import APIClient, RawResponse, Response
+from app.records import CloseApproach, CloseApproachView, record_decoder
+from utils.stub_server import CAD_FIELDS, StubServer, make_cad_rows
+
+
+class TestCloseApproach:
+    """
+    Test typed CloseApproach records & lazy row views of Response
+    """
+    rows = make_cad_rows(20)
+    rows[2][CAD_FIELDS.index('v_inf')] = None
+
+    def test_typed_attributes(self):
+        record = record_decoder(CAD_FIELDS)(self.rows[0])
+        assert record.des == self.rows[0][0]
+        assert record.dist == float(self.rows[0][CAD_FIELDS.index('dist')])
+        assert record.cd == datetime.datetime(2020, 1, 1)
+        assert record.t_sigma_f == '< 00:01'
+        # fields absent from the query are None
+        assert record.body is None and record.fullname is None
+        assert record_decoder(CAD_FIELDS)(self.rows[2]).v_inf is None
+
+    def test_slots(self):
+        record = record_decoder(CAD_FIELDS)(self.rows[0])
+        assert not hasattr(record, '__dict__')
+        with pytest.raises(AttributeError):
+            record.unknown = 1
+        assert sys.getsizeof(record) < sys.getsizeof(self.rows[0]) + sum(map(sys.getsizeof, self.rows[0]))
+
+    def test_constructor(self):
+        assert CloseApproach(des='433', dist=0.1) == CloseApproach(dist=0.1, des='433')
+        assert CloseApproach(des='433').as_dict()['h'] is None
+        assert repr(CloseApproach(des='433')) == "CloseApproach(des='433')"
+        with pytest.raises(TypeError):
+            CloseApproach(speed=1)
+
+    def test_view_decodes_on_access(self):
+        view = CloseApproachView(self.rows, CAD_FIELDS)
+        assert len(view) == 20
+        assert view[-1].des == self.rows[-1][0]
+        assert [record.des for record in view[5:8]] == [row[0] for row in self.rows[5:8]]
+        assert [record.jd for record in view] == [float(row[2]) for row in self.rows]
+        # records are not cached
+        assert view[0] is not view[0] and view[0] == view[0]
+
+    def test_response_approaches(self):
+        """
+        Test buffered responses give a lazy view, streamed ones decode rows as they are read
+        """
+        with StubServer(num_rows=30) as stub, APIClient(base_url=stub.url) as client:
+            buffered = client.get()
+            streamed = client.get(stream=True)
+            expected = [record_decoder(CAD_FIELDS)(row) for row in buffered.get_data()]
+            assert isinstance(buffered.approaches(), CloseApproachView)
+            assert list(buffered.approaches()) == expected
+            assert list(streamed.approaches()) == expected
+        assert all(isinstance(record.v_rel, float) for record in expected)
+
+    def test_empty_response(self):
+        assert list(Response(RawResponse(200, b'{"count": "0"}')).approaches()) == []
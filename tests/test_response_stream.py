@@ -0,0 +1,99 @@
+import json
+from http import HTTPStatus
+
+import pytest
+
+from app.client import APIClient, Response
+from utils.stub_server import make_cad_payload
+
+
+class ChunkedResponse:
+    """
+    Minimal streamed http response serving body in fixed size chunks
+    """
+
+    def __init__(self, body, chunk_size, status_code=HTTPStatus.OK):
+        self.status_code = status_code
+        self.content = body
+        self.chunk_size = chunk_size
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        # ignore requested size, exercise values split across chunks
+        for i in range(0, len(self.content), self.chunk_size):
+            yield self.content[i:i + self.chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(scope='module')
+def stub(stub_server):
+    return stub_server(num_rows=500)
+
+
+class TestResponseStream:
+    """
+    Test incremental json decoding of Response
+    """
+
+    @pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+    def test_stream_matches_buffered(self, chunk_size):
+        """
+        Test streamed rows & header equal json.loads of the whole body, whatever the chunking
+        """
+        body = make_cad_payload(50)
+        expected = json.loads(body)
+        res = Response(ChunkedResponse(body, chunk_size), stream=True)
+        assert res.get_count() == 50
+        assert res.get_fields() == expected['fields']
+        assert res.get_value_for_key('signature') == expected['signature']
+        assert list(res.iter_data()) == expected['data']
+
+    def test_stream_json_content(self):
+        """
+        Test json_content & raw_content materialise a stream which was not iterated
+        """
+        body = json.dumps({'count': '1', 'fields': ['des'], 'data': [['é 1']], 'tail': 12345}).encode()
+        res = Response(ChunkedResponse(body, 3), stream=True)
+        assert res.get_fields() == ['des']
+        assert res.json_content == json.loads(body)
+        assert json.loads(res.raw_content) == json.loads(body)
+
+    def test_stream_consumed(self):
+        """
+        Test a consumed stream can not be materialised again
+        """
+        res = Response(ChunkedResponse(make_cad_payload(3), 16), stream=True)
+        assert len(list(res.iter_data())) == 3
+        with pytest.raises(ValueError):
+            res.get_data()
+
+    @pytest.mark.parametrize('body', [b'', b'{}', b'{"message": "invalid", "code": "400"}'])
+    def test_stream_without_data(self, body):
+        """
+        Test bodies without data, e.g. HEAD & error responses
+        """
+        res = Response(ChunkedResponse(body, 5, HTTPStatus.BAD_REQUEST), stream=True)
+        assert list(res.iter_data()) == []
+        assert res.json_content == json.loads(body or b'{}')
+
+    def test_malformed_stream(self):
+        """
+        Test truncated body is reported
+        """
+        res = Response(ChunkedResponse(b'{"count": "1", "data": [["a"', 4), stream=True)
+        with pytest.raises(ValueError):
+            list(res.iter_data())
+
+    def test_client_stream(self, stub):
+        """
+        Test APIClient.get in stream mode
+        """
+        with APIClient(base_url=stub.url) as client:
+            buffered = client.get()
+            streamed = client.get(stream=True)
+            assert streamed.code == HTTPStatus.OK
+            assert streamed.get_count() == buffered.get_count() == 500
+            assert list(streamed.iter_data()) == buffered.get_data()
+            assert buffered.raw_content == make_cad_payload(500).decode()
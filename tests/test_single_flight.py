@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.async_client import AsyncAPIClient
+from app.client import APIClient
+from app.metrics import Metrics
+from app.single_flight import AsyncSingleFlight, SingleFlight
+
+CALLERS = 8
+
+
+@pytest.fixture(scope='module')
+def stub(stub_server):
+    return stub_server(num_rows=5, latency=0.2)
+
+
+def call_together(call, callers=CALLERS):
+    """
+    Run call from `callers` threads released at the same time
+    """
+    barrier = threading.Barrier(callers)
+
+    def released(_):
+        barrier.wait()
+        return call()
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        return list(pool.map(released, range(callers)))
+
+
+class TestSingleFlight:
+    """
+    Test concurrent identical calls share one in-flight call
+    """
+
+    def test_concurrent_calls_share_result(self):
+        """
+        Test one call is made and every caller gets its result
+        """
+        group, made = SingleFlight(), []
+
+        def slow_call():
+            made.append(1)
+            time.sleep(0.2)
+            return object()
+
+        results = call_together(lambda: group.do('key', slow_call))
+        assert len(made) == 1
+        assert len({id(result) for result, _ in results}) == 1
+        assert sorted(shared for _, shared in results) == [False] + [True] * (CALLERS - 1)
+        assert (group.stats.calls, group.stats.coalesced) == (CALLERS, CALLERS - 1)
+
+    def test_error_is_shared(self):
+        """
+        Test waiters get the exception of the shared call, next call is made again
+        """
+        group = SingleFlight()
+
+        def failing_call():
+            time.sleep(0.1)
+            raise ValueError('failed')
+
+        def call():
+            try:
+                group.do('key', failing_call)
+            except ValueError as error:
+                return error
+
+        assert all(isinstance(error, ValueError) for error in call_together(call))
+        assert group.do('key', lambda: 1) == (1, False)
+
+    def test_client_coalesces_identical_gets(self, stub):
+        """
+        Test concurrent identical GETs make one request, distinct params are not coalesced
+        """
+        metrics = Metrics()
+        with APIClient(base_url=stub.url, single_flight=SingleFlight(), metrics=metrics,
+                       pool_maxsize=CALLERS) as client:
+            requests_before = stub.requests
+            responses = call_together(lambda: client.get(params={'limit': 5, 'body': 'ALL'}))
+            assert stub.requests - requests_before == 1
+            assert len({id(res) for res in responses}) == 1
+            assert metrics.counters[('cad_client_coalesced_total', (('endpoint', 'cad.api'),))] == CALLERS - 1
+            requests_before = stub.requests
+            call_together(lambda: client.get(params={'limit': threading.get_ident()}))
+            assert stub.requests - requests_before == CALLERS
+
+    def test_async_client_coalesces_identical_gets(self, stub):
+        """
+        Test concurrent identical coroutines make one request
+        """
+        async def call():
+            async with AsyncAPIClient(base_url=stub.url, single_flight=AsyncSingleFlight()) as client:
+                return await asyncio.gather(*(client.get(params={'limit': 5}) for _ in range(CALLERS)))
+
+        requests_before = stub.requests
+        responses = asyncio.run(call())
+        assert stub.requests - requests_before == 1
+        assert len({id(res) for res in responses}) == 1
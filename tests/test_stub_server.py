@@ -0,0 +1,107 @@
+import datetime
+import time
+from http import HTTPStatus
+
+import pytest
+
+from app.client import BASE_URL, BASE_URL_ENV, APIClient, default_base_url
+from utils.stub_server import StubServer, orbit_class_of
+
+
+@pytest.fixture(scope='module')
+def stub(stub_server):
+    return stub_server(dataset_rows=5000)
+
+
+@pytest.fixture
+def client(stub):
+    with APIClient(base_url=stub.url, max_retries=0) as client:
+        yield client
+
+
+class TestStubServer:
+    """
+    Test cad.api semantics & fault injection of the stub server
+    """
+
+    def test_defaults(self, client):
+        """
+        Test cad.api defaults: Earth approaches within 0.05 au in the next 60 days, sorted by date
+        """
+        res = client.get()
+        assert res.code == HTTPStatus.OK
+        assert res.get_count() > 0
+        assert 'body' not in res.get_fields()
+        data = res.get_data()
+        dates = [datetime.datetime.strptime(row[3], '%Y-%b-%d %H:%M') for row in data]
+        now = datetime.datetime.utcnow()
+        assert now - datetime.timedelta(minutes=1) <= min(dates) and max(dates) <= now + datetime.timedelta(days=60)
+        assert dates == sorted(dates)
+
+    def test_filters_sort_limit(self, client):
+        """
+        Test filter, sort & limit params are honoured
+        """
+        res = client.get(params={'body': 'ALL', 'date-min': '1900-01-01', 'class': 'APO', 'sort': '-dist',
+                                 'limit': 20})
+        assert res.get_count() == 20
+        dist = [float(row[res.get_fields().index('dist')]) for row in res.get_data()]
+        assert dist == sorted(dist, reverse=True)
+        assert {orbit_class_of(row[0]) for row in res.get_data()} == {'APO'}
+        everything = client.get(params={'body': 'ALL', 'date-min': '1900-01-01'})
+        bodies = {row[everything.get_fields().index('body')] for row in everything.get_data()}
+        assert {'Earth', 'Mars', 'Moon'} <= bodies
+        assert client.get(params={'body': 'Mars', 'date-min': '1900-01-01'}).get_count() < everything.get_count()
+
+    def test_invalid_params(self, client):
+        """
+        Test invalid params are answered with 400
+        """
+        assert client.get(params={'dist-max': '-10LD'}).code == HTTPStatus.BAD_REQUEST
+
+    def test_injected_errors(self, stub, client):
+        """
+        Test error_rate answers with error_status
+        """
+        stub.error_rate = 1
+        try:
+            assert client.get().code == HTTPStatus.SERVICE_UNAVAILABLE
+        finally:
+            stub.error_rate = 0
+        assert client.get().code == HTTPStatus.OK
+
+    def test_rate_limit(self, stub, client):
+        """
+        Test requests above rate_limit are answered 429 with Retry-After
+        """
+        stub.rate_limit = 2
+        try:
+            codes = [client.get(params={'limit': 1}) for _ in range(5)]
+        finally:
+            stub.rate_limit = None
+        assert HTTPStatus.TOO_MANY_REQUESTS in [res.code for res in codes]
+        throttled = next(res for res in codes if res.code == HTTPStatus.TOO_MANY_REQUESTS)
+        assert int(throttled.headers['Retry-After']) >= 1
+
+    def test_latency(self, stub, client):
+        """
+        Test latency is added to responses
+        """
+        stub.latency = 0.2
+        try:
+            start = time.perf_counter()
+            client.get(params={'limit': 1})
+            elapsed = time.perf_counter() - start
+        finally:
+            stub.latency = 0
+        assert elapsed >= 0.2
+
+    def test_base_url_from_environment(self, monkeypatch, stub):
+        """
+        Test SSD_API_BASE_URL points clients without base_url at the stub
+        """
+        monkeypatch.delenv(BASE_URL_ENV, raising=False)
+        assert default_base_url() == BASE_URL
+        monkeypatch.setenv(BASE_URL_ENV, stub.url)
+        with APIClient() as client:
+            assert client.get(params={'limit': 1}).code == HTTPStatus.OK
@@ -0,0 +1,124 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http import HTTPStatus
+
+import pytest
+
+from app.client import APIClient
+from app.throttle import AdaptiveThrottle, host_throttle, parse_retry_after
+from utils.stub_server import StubServer
+
+
+@pytest.fixture(autouse=True)
+def reset_host_throttles(monkeypatch):
+    monkeypatch.setattr('app.throttle._host_throttles', {})
+
+
+class TestAdaptiveThrottle:
+    """
+    Test additive increase / multiplicative decrease of rate & window
+    """
+
+    def test_healthy_requests_increase(self):
+        """
+        Test a window of healthy completions grows the window by about one slot
+        """
+        throttle = AdaptiveThrottle(initial_rate=1000, initial_window=4)
+        for _ in range(4):
+            throttle.release(throttle.acquire(), HTTPStatus.OK)
+        assert 4.9 < throttle.window < 5
+        assert throttle.rate > 1000 or throttle.rate == throttle.max_rate
+
+    def test_throttled_status_halves_once_per_event(self):
+        """
+        Test concurrent 503s of one congestion event halve rate & window only once
+        """
+        throttle = AdaptiveThrottle(initial_rate=40, initial_window=8)
+        started = [throttle.acquire() for _ in range(3)]
+        for started_at in started:
+            throttle.release(started_at, HTTPStatus.SERVICE_UNAVAILABLE)
+        assert throttle.window == 4 and throttle.rate == 20
+        assert throttle.throttled == 3
+        throttle.release(throttle.acquire(), HTTPStatus.TOO_MANY_REQUESTS)
+        assert throttle.window == 2 and throttle.rate == 10
+
+    def test_floors(self):
+        """
+        Test decreases stop at min rate & min window
+        """
+        throttle = AdaptiveThrottle(initial_rate=1000, min_rate=5, initial_window=2, min_window=1)
+        for _ in range(10):
+            throttle.release(throttle.acquire())
+        assert throttle.window == 1 and throttle.rate == 5
+
+    def test_window_bounds_in_flight(self):
+        """
+        Test acquire blocks while the window is full
+        """
+        throttle = AdaptiveThrottle(initial_rate=1000, initial_window=1)
+        started_at = throttle.acquire()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            waiting = pool.submit(throttle.acquire)
+            time.sleep(0.05)
+            assert not waiting.done()
+            throttle.release(started_at, HTTPStatus.OK)
+            assert waiting.result(timeout=1)
+
+    def test_retry_after_pauses_requests(self):
+        """
+        Test no request is let through before Retry-After has elapsed
+        """
+        throttle = AdaptiveThrottle(initial_rate=1000)
+        throttle.release(throttle.acquire(), HTTPStatus.TOO_MANY_REQUESTS, retry_after=0.2)
+        start = time.monotonic()
+        throttle.acquire()
+        assert time.monotonic() - start >= 0.19
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after('2') == 2
+        assert parse_retry_after(None) is None
+        assert parse_retry_after('soon') is None
+        assert 8 < parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+
+    def test_host_throttle_is_shared(self):
+        """
+        Test clients of one host share a throttle, other hosts get their own
+        """
+        assert host_throttle('http://a.test:1/') is host_throttle('http://a.test:1/cad.api')
+        assert host_throttle('http://a.test:1/') is not host_throttle('http://b.test:1/')
+
+
+class TestAdaptiveClient:
+    """
+    Test adaptive APIClient against a throttling stub server
+    """
+
+    def test_concurrency_limit(self):
+        """
+        Test every call succeeds and the window backs off under the server concurrency limit
+        """
+        with StubServer(num_rows=5, latency=0.05, max_concurrency=4) as stub:
+            with APIClient(base_url=stub.url, adaptive=True, pool_maxsize=16, max_retries=5) as client:
+                client.throttle.window, client.throttle.rate = 16, 1000
+                with ThreadPoolExecutor(max_workers=16) as pool:
+                    codes = list(pool.map(lambda _: client.get().code, range(64)))
+        assert codes == [HTTPStatus.OK] * 64
+        assert client.throttle.throttled == stub.throttled > 0
+        assert client.throttle.window < 16
+
+    def test_rate_limit_honours_retry_after(self):
+        """
+        Test 429s are retried once Retry-After has elapsed
+        """
+        with StubServer(num_rows=5, rate_limit=2) as stub:
+            with APIClient(base_url=stub.url, adaptive=True) as client:
+                start = time.monotonic()
+                codes = [client.get().code for _ in range(4)]
+        assert codes == [HTTPStatus.OK] * 4
+        assert stub.throttled >= 1
+        assert time.monotonic() - start >= 1
+
+    def test_disabled_by_default(self):
+        with APIClient(base_url='http://127.0.0.1:1/') as client:
+            assert client.throttle is None
@@ -0,0 +1,178 @@
+"""
+Vectorised close-approach analytics over CADTable columns
+
+Every kernel runs over whole NumPy columns instead of looping over `Response.get_data()` rows.
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.cad_table import UNIX_EPOCH_JD, Categorical
+from utils.query_engine import LD_IN_AU
+
+KM_PER_AU = 149597870.7
+# distance unit -> au per unit
+DISTANCE_UNITS = {'au': 1.0, 'LD': LD_IN_AU, 'km': 1 / KM_PER_AU}
+# geometric albedo assumed for diameters from absolute magnitude, CNEOS uses 0.14 for NEAs of unknown albedo
+DEFAULT_ALBEDO = 0.14
+# size class label & upper bound of its diameter in km
+SIZE_CLASSES = (('<10m', 0.01), ('10-50m', 0.05), ('50-140m', 0.14), ('140m-1km', 1), ('>1km', np.inf))
+
+
+def convert_distance(values, from_unit='au', to_unit='LD'):
+    """
+    Convert distances between au, LD & km
+    :param values: array of distances
+    :param from_unit: unit of values
+    :param to_unit: unit of result
+    :return: float64 array
+    """
+    for unit in (from_unit, to_unit):
+        if unit not in DISTANCE_UNITS:
+            raise ValueError(f'Unknown distance unit {unit}, expected one of {list(DISTANCE_UNITS)}')
+    return np.asarray(values, dtype=np.float64) * (DISTANCE_UNITS[from_unit] / DISTANCE_UNITS[to_unit])
+
+
+def julian_date(when=None):
+    """
+    :param when: naive UTC datetime, defaults to now
+    :return: julian date
+    """
+    when = when or datetime.datetime.utcnow()
+    return UNIX_EPOCH_JD + (when - datetime.datetime(1970, 1, 1)).total_seconds() / 86400
+
+
+def days_until(jd, now=None):
+    """
+    Days from now to every approach, negative for past approaches
+    :param jd: array of approach julian dates
+    :param now: naive UTC datetime, defaults to now
+    """
+    return np.asarray(jd, dtype=np.float64) - julian_date(now)
+
+
+def diameter_from_h(h, albedo=DEFAULT_ALBEDO):
+    """
+    Estimated diameter in km, D = 1329 / sqrt(albedo) * 10^(-H/5)
+    :param h: array of absolute magnitudes, NaN gives NaN
+    :param albedo: assumed geometric albedo
+    """
+    return 1329 / np.sqrt(albedo) * np.power(10, -np.asarray(h, dtype=np.float64) / 5)
+
+
+def size_classes(h, albedo=DEFAULT_ALBEDO):
+    """
+    Bucket absolute magnitudes into SIZE_CLASSES labels of their estimated diameter
+    :return: object array of labels, None for unknown `h`
+    """
+    diameters = diameter_from_h(h, albedo)
+    labels = np.array([label for label, _ in SIZE_CLASSES] + [None], dtype=object)
+    indexes = np.searchsorted([bound for _, bound in SIZE_CLASSES], diameters)
+    # NaN sorts past every bound
+    indexes[np.isnan(diameters)] = len(SIZE_CLASSES)
+    return labels[indexes]
+
+
+def risk_scores(table, albedo=DEFAULT_ALBEDO):
+    """
+    Relative risk of every approach: kinetic energy proxy D^3 * v_rel^2 over miss distance
+    :param table: CADTable with `h`, `v_rel` & `dist`
+    :return: float64 array, NaN when a value is unknown
+    """
+    return diameter_from_h(table['h'], albedo) ** 3 * table['v_rel'] ** 2 / table['dist']
+
+
+def top_k(values, k, largest=False):
+    """
+    Indexes of the k smallest (or largest) values in order, NaN last
+    """
+    values = np.asarray(values, dtype=np.float64)
+    keys = np.where(np.isnan(values), np.inf, -values if largest else values)
+    k = min(k, len(keys))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    # partition is O(n), only the k selected keys are sorted
+    selected = np.argpartition(keys, k - 1)[:k]
+    return selected[np.argsort(keys[selected], kind='stable')]
+
+
+def top_k_closest(table, k, column='dist'):
+    """
+    :return: CADTable of the k closest approaches, closest first
+    """
+    return table.take(top_k(table[column], k))
+
+
+def rank_by_risk(table, k=None, albedo=DEFAULT_ALBEDO):
+    """
+    :param k: number of approaches, defaults to all
+    :return: CADTable of approaches by decreasing risk score
+    """
+    return table.take(top_k(risk_scores(table, albedo), len(table) if k is None else k, largest=True))
+
+
+def group_codes(column):
+    """
+    Group codes of a key column
+    :param column: Categorical or array
+    :return: (codes, keys), -1 code for null
+    """
+    if isinstance(column, Categorical):
+        return column.codes, column.categories
+    codes, keys = pd.factorize(column)
+    return codes, np.asarray(keys)
+
+
+def group_by(table, key, column=None):
+    """
+    Count (and min/mean/max of column) of approaches per key, e.g. `body` or orbit `class`
+    :param table: CADTable
+    :param key: key column name
+    :param column: float column to aggregate, NaN values are skipped
+    :return: DataFrame indexed by key values
+    """
+    codes, keys = group_codes(table.columns[key])
+    valid = codes >= 0
+    codes = codes[valid]
+    result = {'count': np.bincount(codes, minlength=len(keys))}
+    if column is not None:
+        values = np.asarray(table[column], dtype=np.float64)[valid]
+        known = ~np.isnan(values)
+        codes, values = codes[known], values[known]
+        counts = np.bincount(codes, minlength=len(keys))
+        minimum = np.full(len(keys), np.inf)
+        maximum = np.full(len(keys), -np.inf)
+        np.minimum.at(minimum, codes, values)
+        np.maximum.at(maximum, codes, values)
+        with np.errstate(invalid='ignore'):
+            result['min'] = np.where(counts > 0, minimum, np.nan)
+            result['mean'] = np.bincount(codes, weights=values, minlength=len(keys)) / counts
+            result['max'] = np.where(counts > 0, maximum, np.nan)
+    return pd.DataFrame(result, index=pd.Index(keys, name=key))
+
+
+def window_histogram(table, window_days=30, column='dist', bins=10):
+    """
+    Histogram of column per approach time window
+    :param table: CADTable with `jd`
+    :param window_days: window length in days, windows start at the earliest approach
+    :param column: float column to bin
+    :param bins: number of bins or bin edges
+    :return: (counts of shape (windows, bins), window start julian dates, bin edges)
+    """
+    jd = table['jd']
+    values = np.asarray(table[column], dtype=np.float64)
+    known = ~(np.isnan(jd) | np.isnan(values))
+    edges = np.histogram_bin_edges(values[known], bins)
+    # values outside explicit edges are not counted, like np.histogram
+    known &= (values >= edges[0]) & (values <= edges[-1])
+    jd, values = jd[known], values[known]
+    if not len(jd):
+        return np.zeros((0, len(edges) - 1), dtype=np.int64), np.empty(0), edges
+    windows = ((jd - jd.min()) // window_days).astype(np.int64)
+    # last edge is inclusive
+    value_bins = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(edges) - 2)
+    num_windows = windows.max() + 1
+    counts = np.bincount(windows * (len(edges) - 1) + value_bins, minlength=num_windows * (len(edges) - 1))
+    return counts.reshape(num_windows, len(edges) - 1), jd.min() + np.arange(num_windows) * window_days, edges
@@ -0,0 +1,183 @@
+"""
+cad.api filter & sorting cases, shared by the functional tests and the load generator
+"""
+import datetime
+import operator
+from collections import namedtuple
+from http import HTTPStatus
+
+# Filter test case blueprint
+# filter_key: key name for filter
+# filter_value: value for filter
+# impact_column: column which will expected to have filters applied
+# impact_column_focus_value_by: pick column value by math operator for easy assertion of filter function
+# compare_operator: math operator for comparing filter value with column values
+# compare_with: is always filter_value or transformed filter_value for easy assertion
+filter_test_case = namedtuple('filter_test_case',
+                              'filter_key '
+                              'filter_value '
+                              'impact_column '
+                              'impact_column_focus_value_by '
+                              'compare_operator '
+                              'compare_with')
+
+# Datetime filter test cases
+datetime_filter_test_cases = [
+    filter_test_case('date-min',
+                     '2000-01-01',
+                     'cd',
+                     min,
+                     operator.ge,
+                     datetime.datetime.strptime('2000-01-01', "%Y-%m-%d")),
+    filter_test_case('date-max',
+                     '2100-01-01',
+                     'cd',
+                     max,
+                     operator.le,
+                     datetime.datetime.strptime('2100-01-01', "%Y-%m-%d")),
+]
+
+# Numeric filter test cases
+numeric_filter_test_cases = [
+    filter_test_case('dist-min',
+                     '0.04',
+                     'dist',
+                     min,
+                     operator.ge,
+                     0.04),
+    filter_test_case('dist-max',
+                     '0.03',
+                     'dist',
+                     max,
+                     operator.le,
+                     0.03),
+    filter_test_case('dist-min',
+                     '10LD',
+                     'dist',
+                     min,
+                     operator.ge,
+                     10 * 0.002569),
+    filter_test_case('dist-max',
+                     '7LD',
+                     'dist',
+                     max,
+                     operator.le,
+                     7 * 0.002569),
+    filter_test_case('h-min',
+                     10,
+                     'h',
+                     min,
+                     operator.ge,
+                     10),
+    filter_test_case('h-max',
+                     20,
+                     'h',
+                     max,
+                     operator.le,
+                     20),
+    filter_test_case('h-min',
+                     9.56,
+                     'h',
+                     min,
+                     operator.ge,
+                     9.56),
+    filter_test_case('h-max',
+                     20.05,
+                     'h',
+                     max,
+                     operator.le,
+                     20.05),
+    filter_test_case('v-inf-min',
+                     7.01,
+                     'v_inf',
+                     min,
+                     operator.ge,
+                     7.01),
+    filter_test_case('v-inf-max',
+                     15,
+                     'v_inf',
+                     max,
+                     operator.le,
+                     15.7),
+    filter_test_case('v-rel-min',
+                     5.01,
+                     'v_rel',
+                     min,
+                     operator.ge,
+                     5.01),
+    filter_test_case('v-rel-max',
+                     11.9,
+                     'v_rel',
+                     max,
+                     operator.le,
+                     11.9),
+
+]
+
+# Filter test case blueprint for invalid cases
+# filter_key: key name for filter
+# filter_value: value for filter
+# expected_response_code: expected api response code
+invalid_filter_test_case = namedtuple('invalid_filter_test_case',
+                                      'filter_key '
+                                      'filter_value '
+                                      'expected_response_code')
+
+# Invalid filter test cases
+invalid_filter_test_cases = [
+    invalid_filter_test_case('date-min', '2000-JAN-01', HTTPStatus.BAD_REQUEST),
+    invalid_filter_test_case('date-max', '2000-March-01', HTTPStatus.BAD_REQUEST),
+    invalid_filter_test_case('dist-min', '5KAU', HTTPStatus.BAD_REQUEST),
+    invalid_filter_test_case('dist-max', '-10LD', HTTPStatus.BAD_REQUEST),
+    invalid_filter_test_case('h-min', '4g', HTTPStatus.BAD_REQUEST),
+    invalid_filter_test_case('h-max', '-70', HTTPStatus.BAD_REQUEST),
+    invalid_filter_test_case('v-inf-min', '--', HTTPStatus.BAD_REQUEST),
+    invalid_filter_test_case('v-inf-min', '-0.99', HTTPStatus.BAD_REQUEST),
+    invalid_filter_test_case('v-rel-min', '-900', HTTPStatus.BAD_REQUEST),
+    invalid_filter_test_case('v-rel-min', 'ten', HTTPStatus.BAD_REQUEST),
+    invalid_filter_test_case('des', 'humanoid', HTTPStatus.BAD_REQUEST),
+    invalid_filter_test_case('body', '433 Eros', HTTPStatus.BAD_REQUEST),
+    invalid_filter_test_case('limit', '-15', HTTPStatus.BAD_REQUEST),
+    invalid_filter_test_case('limit', '-0.1', HTTPStatus.BAD_REQUEST),
+]
+
+# Sorting test case blueprint
+# column: sorting resultant column
+# key: soring key
+# reverse: takes boolean, true for descending and false for ascending
+sorting_test_case = namedtuple('sorting_test_case',
+                               'column '
+                               'key '
+                               'reverse ')
+
+# Sorting test case blueprint for invalid cases
+# key: soring key
+# expected_response_code: expected api response code
+invalid_sorting_test_case = namedtuple('invalid_sorting_test_case',
+                                       'key '
+                                       'expected_response_code ')
+
+# Sorting test cases
+sorting_test_cases = [
+    sorting_test_case('dist', 'dist', False),
+    sorting_test_case('dist', '-dist', True),
+    sorting_test_case('cd', 'date', False),
+    sorting_test_case('cd', '-date', True),
+    sorting_test_case('dist_min', 'dist-min', False),
+    sorting_test_case('dist_min', '-dist-min', True),
+    sorting_test_case('v_inf', 'v-inf', False),
+    sorting_test_case('v_inf', '-v-inf', True),
+    sorting_test_case('h', 'h', False),
+    sorting_test_case('h', '-h', True),
+    # TODO:: Implement object filter
+    # sorting_test_case('des', 'object', False),
+    # sorting_test_case('des', '-object', True),
+]
+
+# Invalid sorting test cases
+invalid_sorting_test_cases = [
+    invalid_sorting_test_case('dist-max', HTTPStatus.BAD_REQUEST),
+    invalid_sorting_test_case('body', HTTPStatus.BAD_REQUEST),
+    invalid_sorting_test_case('-body', HTTPStatus.BAD_REQUEST),
+    invalid_sorting_test_case('-fullname', HTTPStatus.BAD_REQUEST),
+]
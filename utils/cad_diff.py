@@ -0,0 +1,202 @@
+"""
+Vectorised diff of two CAD result sets, e.g. snapshots taken before & after orbit solutions were updated
+
+Approaches are matched on `des` + `jd` with a hash join over integer keys: key columns of both sets are
+factorized into one shared code space and combined into a dense int64 key per row, new rows look up their
+old row in a direct address table. Matched rows are compared column wise, without any per row loop.
+
+usage: python -m utils.cad_diff OLD_SNAPSHOT NEW_SNAPSHOT [--key des jd] [--csv modified.csv]
+"""
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+from utils.cad_snapshot import open_snapshot
+from utils.cad_table import DECIMALS_SUFFIX, Categorical
+
+# columns identifying an approach in both result sets
+DIFF_KEY = ('des', 'jd')
+
+
+def _shared_codes(old, new):
+    """
+    int64 codes of one column of both sets in a shared code space, -1 for null
+    :return: codes of old rows followed by codes of new rows
+    """
+    if isinstance(old, Categorical) and isinstance(new, Categorical):
+        # old codes are kept, categories are sorted so new ones are looked up without sorting their union
+        positions = np.searchsorted(old.categories, new.categories)
+        found = positions < len(old.categories)
+        found[found] = old.categories[positions[found]] == new.categories[found]
+        # categories missing from old get codes after those of old
+        mapping = np.where(found, positions, len(old.categories) + np.cumsum(~found) - 1)
+        # trailing -1 maps null codes to null
+        return np.concatenate([old.codes, np.append(mapping, -1)[new.codes]]).astype(np.int64)
+    old, new = (column.decode() if isinstance(column, Categorical) else column for column in (old, new))
+    return pd.factorize(np.concatenate([old, new]))[0].astype(np.int64)
+
+
+def _join_keys(old, new, key):
+    """
+    Dense int64 key of every row, equal keys on equal key columns
+    :return: (keys of old rows, keys of new rows, number of distinct keys)
+    """
+    keys = np.zeros(len(old) + len(new), dtype=np.int64)
+    count = 1
+    for name in key:
+        codes = _shared_codes(old.columns[name], new.columns[name]) + 1
+        # re-factorized after every column, keys stay below the row count and never overflow
+        keys, uniques = pd.factorize(keys * (codes.max(initial=0) + 1) + codes)
+        count = len(uniques)
+    return keys[:len(old)], keys[len(old):], count
+
+
+def _changed(before, after):
+    """
+    Element wise before != after, a null equals a null
+    """
+    if isinstance(before, Categorical) or isinstance(after, Categorical):
+        codes = _shared_codes(before, after)
+        return codes[:len(before)] != codes[len(before):]
+    if before.dtype.kind == 'f':
+        return ~((before == after) | (np.isnan(before) & np.isnan(after)))
+    if before.dtype.kind in 'mM':
+        return ~((before == after) | (np.isnat(before) & np.isnat(after)))
+    return before != after
+
+
+def _take(column, indexes):
+    return column.take(indexes) if isinstance(column, Categorical) else column[indexes]
+
+
+class CADDiff:
+    """
+    Approaches added, removed & modified from an old to a new result set
+
+    - `added`: CADTable of new rows without old counterpart
+    - `removed`: CADTable of old rows without new counterpart
+    - `before` & `after`: CADTables of the modified rows, old & new values aligned row for row
+    - `changed`: dict of compared column to bool array over modified rows, True where it changed
+    - `deltas`: dict of numeric column changed on any row to `after - before` over modified rows
+    """
+
+    def __init__(self, old, new, key, added, removed, old_index, new_index, changed, unchanged):
+        """
+        :param old: old CADTable
+        :param new: new CADTable
+        :param key: key columns
+        :param added: indexes of added rows in new
+        :param removed: indexes of removed rows in old
+        :param old_index: indexes of modified rows in old
+        :param new_index: indexes of modified rows in new, aligned with old_index
+        :param changed: dict of column to changed mask over modified rows
+        :param unchanged: number of matched rows without change
+        """
+        self.key = list(key)
+        self.added = new.take(added)
+        self.removed = old.take(removed)
+        self.before = old.take(old_index)
+        self.after = new.take(new_index)
+        self.old_index = old_index
+        self.new_index = new_index
+        self.changed = changed
+        self.unchanged = unchanged
+
+    @property
+    def deltas(self):
+        return {name: self.after.columns[name] - self.before.columns[name] for name, mask in self.changed.items()
+                if mask.any() and not isinstance(self.before.columns[name], Categorical)
+                and self.before.columns[name].dtype.kind in 'fmM'}
+
+    def summary(self):
+        """
+        :return: dict of row counts & number of modified rows per changed column
+        """
+        return {'added': len(self.added), 'removed': len(self.removed), 'modified': len(self.after),
+                'unchanged': self.unchanged,
+                'changed': {name: int(mask.sum()) for name, mask in self.changed.items() if mask.any()}}
+
+    def to_pandas(self):
+        """
+        Modified approaches as DataFrame: key columns, then `<column>_old`, `<column>_new` & `<column>_delta`
+        (numeric columns) of every column that changed on at least one row
+        """
+        frame = self.after.to_pandas()[self.key]
+        before, after, deltas = self.before.to_pandas(), self.after.to_pandas(), self.deltas
+        for name, mask in self.changed.items():
+            if not mask.any():
+                continue
+            # format columns are not exported by CADTable.to_pandas
+            frame[f'{name}_old'] = before[name].to_numpy() if name in before else self.before[name]
+            frame[f'{name}_new'] = after[name].to_numpy() if name in after else self.after[name]
+            if name in deltas:
+                frame[f'{name}_delta'] = deltas[name]
+        return frame
+
+    def __repr__(self):
+        return f'CADDiff({self.summary()})'
+
+
+def diff_tables(old, new, key=DIFF_KEY, columns=None):
+    """
+    Diff two CAD result sets
+    :param old: CADTable of the old result set
+    :param new: CADTable of the new result set
+    :param key: columns identifying an approach, unique in each set
+    :param columns: columns compared on matched rows, defaults to every non key column of both sets, so a
+                    `t_sigma_f` qualifier change is a modification, but the decimals a float was served with are not
+    :return: CADDiff
+    """
+    missing = [name for name in key if name not in old or name not in new]
+    if missing:
+        raise ValueError(f'Key columns {missing} are missing from a result set')
+    if columns is None:
+        columns = [name for name in new.columns
+                   if name in old and name not in key and not name.endswith(DECIMALS_SUFFIX)]
+    old_keys, new_keys, count = _join_keys(old, new, key)
+    if len(old_keys) and np.bincount(old_keys, minlength=count).max() > 1 \
+            or len(new_keys) and np.bincount(new_keys, minlength=count).max() > 1:
+        raise ValueError(f'Key {list(key)} does not identify approaches, duplicate rows')
+    # direct address table of old row by key, -1 for keys without old row
+    old_rows = np.full(count, -1, dtype=np.int64)
+    old_rows[old_keys] = np.arange(len(old_keys))
+    matched = old_rows[new_keys]
+    added = np.flatnonzero(matched == -1)
+    new_index = np.flatnonzero(matched != -1)
+    old_index = matched[new_index]
+    removed = np.ones(len(old_keys), dtype=bool)
+    removed[old_index] = False
+
+    changed = {name: _changed(_take(old.columns[name], old_index), _take(new.columns[name], new_index))
+               for name in columns}
+    modified = np.logical_or.reduce(list(changed.values())) if changed else np.zeros(len(new_index), dtype=bool)
+    return CADDiff(old, new, key, added, np.flatnonzero(removed), old_index[modified], new_index[modified],
+                   {name: mask[modified] for name, mask in changed.items()}, int((~modified).sum()))
+
+
+def diff_snapshots(old_path, new_path, key=DIFF_KEY, columns=None):
+    """
+    Diff two snapshot directories, memory mapped
+    :return: CADDiff
+    """
+    return diff_tables(open_snapshot(old_path), open_snapshot(new_path), key=key, columns=columns)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('old', help='Old snapshot directory')
+    parser.add_argument('new', help='New snapshot directory')
+    parser.add_argument('--key', nargs='+', default=list(DIFF_KEY), help='Columns identifying an approach')
+    parser.add_argument('--csv', default=None, help='Write modified approaches to this csv file')
+    args = parser.parse_args()
+
+    diff = diff_snapshots(args.old, args.new, key=args.key)
+    print(json.dumps(diff.summary(), indent=2))
+    if args.csv:
+        diff.to_pandas().to_csv(args.csv, index=False)
+
+
+if __name__ == '__main__':
+    main()
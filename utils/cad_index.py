@@ -0,0 +1,217 @@
+"""
+Spatial-temporal index of close approaches: "all objects within d of body B between t1 and t2"
+"""
+import datetime
+
+import numpy as np
+
+from app.planner import parse_date
+from utils.analytics import julian_date
+from utils.cad_store import DEFAULT_BODY
+from utils.cad_table import CADTable, Categorical
+
+# distance columns with a secondary index, `dist_min`/`dist_max` bound the 3-sigma approach distance interval
+DISTANCE_COLUMNS = ('dist', 'dist_min', 'dist_max')
+# rows inserted into a partition are buffered unsorted up to this many before being merged into its sorted runs
+DELTA_ROWS = 4096
+
+
+def to_julian_date(value):
+    """
+    :param value: julian date, naive UTC datetime or cad.api date value (`now`, `+D`, `YYYY-MM-DD`, ...)
+    :return: julian date
+    """
+    if value is None or isinstance(value, (int, float, np.floating)):
+        return value
+    if not isinstance(value, datetime.datetime):
+        value = parse_date(value)
+    return julian_date(value)
+
+
+class _Partition:
+    """
+    Approaches to one body: rows sorted by `jd`, one sort order per distance column and an unsorted delta
+    """
+
+    def __init__(self):
+        self.jd = np.empty(0)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.distances = {name: np.empty(0) for name in DISTANCE_COLUMNS}
+        # column -> (sorted distances, jd, ids) in distance order
+        self.by_distance = {name: (np.empty(0), np.empty(0), np.empty(0, dtype=np.int64)) for name in DISTANCE_COLUMNS}
+        self.delta = []
+
+    def __len__(self):
+        return len(self.ids) + sum(len(ids) for _, ids, _ in self.delta)
+
+    def add(self, jd, ids, distances):
+        self.delta.append((jd, ids, distances))
+        if sum(len(delta_ids) for _, delta_ids, _ in self.delta) >= DELTA_ROWS:
+            self.merge()
+
+    def merge(self):
+        """
+        Merge delta into the sorted runs: only the delta is sorted, then inserted at its `np.searchsorted`
+        positions, O(n + k log k) for n indexed and k delta rows, equal keys keep insertion order
+        """
+        if not self.delta:
+            return
+        jd = np.concatenate([delta_jd for delta_jd, _, _ in self.delta])
+        ids = np.concatenate([delta_ids for _, delta_ids, _ in self.delta])
+        distances = {name: np.concatenate([delta[name] for _, _, delta in self.delta]) for name in DISTANCE_COLUMNS}
+        self.delta = []
+        order = np.argsort(jd, kind='stable')
+        jd, ids = jd[order], ids[order]
+        positions = np.searchsorted(self.jd, jd, side='right')
+        self.jd, self.ids = np.insert(self.jd, positions, jd), np.insert(self.ids, positions, ids)
+        for name, values in distances.items():
+            values = values[order]
+            self.distances[name] = np.insert(self.distances[name], positions, values)
+            sorted_values, distance_jd, distance_ids = self.by_distance[name]
+            order_by_distance = np.argsort(values, kind='stable')
+            values = values[order_by_distance]
+            positions_by_distance = np.searchsorted(sorted_values, values, side='right')
+            self.by_distance[name] = (np.insert(sorted_values, positions_by_distance, values),
+                                      np.insert(distance_jd, positions_by_distance, jd[order_by_distance]),
+                                      np.insert(distance_ids, positions_by_distance, ids[order_by_distance]))
+
+    def query(self, jd_min, jd_max, dist_max, column):
+        """
+        O(log n + min(w, c) + d) for w rows in the time window, c rows within dist_max and d delta rows
+        :return: (jd, ids) of matching rows
+        """
+        start = 0 if jd_min is None else np.searchsorted(self.jd, jd_min, side='left')
+        stop = len(self.jd) if jd_max is None else np.searchsorted(self.jd, jd_max, side='right')
+        if dist_max is None:
+            jd, ids = self.jd[start:stop], self.ids[start:stop]
+        else:
+            values, distance_jd, distance_ids = self.by_distance[column]
+            closer = np.searchsorted(values, dist_max, side='right')
+            # both candidate sets are located in O(log n), only the smaller one is filtered, linearly
+            if stop - start <= closer:
+                mask = self.distances[column][start:stop] <= dist_max
+                jd, ids = self.jd[start:stop][mask], self.ids[start:stop][mask]
+            else:
+                jd, ids = distance_jd[:closer], distance_ids[:closer]
+                mask = _between(jd, jd_min, jd_max)
+                jd, ids = jd[mask], ids[mask]
+        for delta_jd, delta_ids, delta_distances in self.delta:
+            mask = _between(delta_jd, jd_min, jd_max)
+            if dist_max is not None:
+                mask &= delta_distances[column] <= dist_max
+            jd, ids = np.concatenate([jd, delta_jd[mask]]), np.concatenate([ids, delta_ids[mask]])
+        return jd, ids
+
+
+def _between(jd, jd_min, jd_max):
+    mask = np.ones(len(jd), dtype=bool)
+    if jd_min is not None:
+        mask &= jd >= jd_min
+    if jd_max is not None:
+        mask &= jd <= jd_max
+    return mask
+
+
+class ApproachIndex:
+    """
+    In memory index of CAD rows answering time window & distance range queries per body
+
+    Rows are partitioned by `body`, each partition is sorted by `jd` and holds a secondary sort order
+    per distance column. A query locates its time window and its distance range by binary search and
+    filters the smaller of the two candidate sets linearly: O(log n + min(w, c)) per partition for w rows
+    in the window and c rows within the distance, plus sorting the matches. Inserted rows go to a small
+    per partition delta merged into the sorted runs once it reaches DELTA_ROWS rows.
+
+    Usage::
+
+        index = ApproachIndex.from_table(store.load_table())
+        ids = index.query('2029-04-01', '2029-05-01', dist_max=0.001, body='Earth')
+        table = index.take(ids)
+    """
+
+    def __init__(self):
+        self.partitions = {}
+        self._tables = []
+        self._offsets = []
+        self._size = 0
+
+    @classmethod
+    def from_table(cls, table):
+        index = cls()
+        index.insert(table)
+        return index
+
+    def __len__(self):
+        return self._size
+
+    def insert(self, table):
+        """
+        Index rows of a CADTable, tables without `body` column are approaches to DEFAULT_BODY
+        :param table: CADTable with `jd` & distance columns, and the fields of previously inserted tables
+        :return: ids of inserted rows
+        """
+        if self._tables and table.fields != self._tables[0].fields:
+            # rows of every table are taken back into one CADTable
+            raise ValueError(f'Table fields {table.fields} differ from indexed fields {self._tables[0].fields}')
+        ids = np.arange(self._size, self._size + len(table), dtype=np.int64)
+        if not len(table):
+            return ids
+        self._tables.append(table)
+        self._offsets.append(self._size)
+        self._size += len(table)
+        jd = table['jd']
+        distances = {name: table[name] if name in table else np.full(len(table), np.nan) for name in DISTANCE_COLUMNS}
+        if 'body' in table:
+            body = table.columns['body']
+            if isinstance(body, Categorical):
+                codes, bodies = body.codes, body.categories
+            else:
+                bodies, codes = np.unique(body.astype(str), return_inverse=True)
+        else:
+            codes, bodies = np.zeros(len(table), dtype=np.int64), np.array([DEFAULT_BODY])
+        for code, name in enumerate(bodies):
+            mask = codes == code
+            if mask.any():
+                self.partitions.setdefault(str(name), _Partition()).add(
+                    jd[mask], ids[mask], {column: values[mask] for column, values in distances.items()})
+        return ids
+
+    def query(self, start=None, end=None, dist_max=None, body=DEFAULT_BODY, column='dist'):
+        """
+        Ids of approaches within dist_max of body between start and end, in approach time order
+        :param start: earliest approach, julian date, datetime or cad.api date value, None for no bound
+        :param end: latest approach, None for no bound
+        :param dist_max: max distance in au, None for any
+        :param body: body name, `ALL` or None for every body
+        :param column: `dist` nominal distance, `dist_min` for approaches possibly within dist_max,
+                       `dist_max` for approaches certainly within dist_max
+        :return: int64 array of row ids, see `take`
+        """
+        if column not in DISTANCE_COLUMNS:
+            raise ValueError(f'Unknown distance column {column}, expected one of {DISTANCE_COLUMNS}')
+        jd_min, jd_max = to_julian_date(start), to_julian_date(end)
+        if body in (None, 'ALL'):
+            partitions = list(self.partitions.values())
+        else:
+            partitions = [self.partitions[body]] if body in self.partitions else []
+        results = [partition.query(jd_min, jd_max, dist_max, column) for partition in partitions]
+        if not results:
+            return np.empty(0, dtype=np.int64)
+        jd = np.concatenate([jd for jd, _ in results])
+        ids = np.concatenate([ids for _, ids in results])
+        return ids[np.lexsort((ids, jd))]
+
+    def take(self, ids):
+        """
+        CADTable of indexed rows, in ids order
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if not self._tables:
+            raise ValueError('Empty index')
+        chunks = np.searchsorted(self._offsets, ids, side='right') - 1
+        order = np.argsort(chunks, kind='stable')
+        parts = [self._tables[chunk].take(ids[order][chunks[order] == chunk] - self._offsets[chunk])
+                 for chunk in np.unique(chunks)]
+        table = CADTable.concat(parts) if parts else self._tables[0].take(ids)
+        # rows come out grouped by inserted table, restore ids order
+        return table.take(np.argsort(order, kind='stable'))
@@ -0,0 +1,210 @@
+"""
+Binary columnar snapshots of CADTable, one `.npy` file per column array
+
+A snapshot is a directory::
+
+    meta.json               fields, row count, signature, codec & storage kind of every column
+    <column>.npy            float64 / datetime64 columns
+    <column>.codes.npy      dictionary encoded columns: int32 codes, -1 for null
+    <column>.categories.npy and their fixed width unicode categories
+
+Columns are memory mapped read-only and only opened on first access, so many processes can
+share one snapshot through the page cache without copying or parsing it. A snapshot is never
+rewritten in place: it is written to a sibling directory renamed to the snapshot path once the
+previous snapshot was renamed aside to `.<name>.previous`, so columns already mapped keep the files
+they were opened on. Readers fall back to `.<name>.previous` while the path is missing, between the
+two renames or after a save interrupted by a crash between them. One process saves a path at a time.
+Snapshots saved with a codec store `<file>.npy.<codec>` compressed files instead, smaller on
+disk but decompressed into memory on first access.
+"""
+import io
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from collections.abc import Mapping
+
+import numpy as np
+
+from app.client import Response
+from app.compression import get_codec
+from utils.cad_table import CADTable, Categorical, parse_categorical
+
+SNAPSHOT_VERSION = 1
+META_FILE = 'meta.json'
+# suffix of the directory a previous snapshot is moved to while a new one is swapped in
+PREVIOUS_SUFFIX = '.previous'
+
+
+def _previous_path(path):
+    parent, name = os.path.split(os.path.abspath(path))
+    return os.path.join(parent, f'.{name}{PREVIOUS_SUFFIX}')
+
+
+def _snapshot_dir(path):
+    """
+    Directory holding the snapshot of path, the previous snapshot while path is being swapped
+    """
+    if not os.path.exists(os.path.join(path, META_FILE)):
+        previous = _previous_path(path)
+        if os.path.exists(os.path.join(previous, META_FILE)):
+            return previous
+    return path
+
+
+def _save_array(path, file_name, array, codec):
+    if codec is None:
+        np.save(os.path.join(path, file_name), array)
+        return
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    with open(os.path.join(path, f'{file_name}.{codec.name}'), 'wb') as array_file:
+        array_file.write(codec.compress(buffer.getbuffer()))
+
+
+def _write_snapshot(table, path, signature, codec):
+    kinds = {}
+    # format columns are saved with the fields
+    for name, column in table.columns.items():
+        if isinstance(column, Categorical):
+            kinds[name] = 'categorical'
+        elif column.dtype == object:
+            # object arrays can not be memory mapped, stored dictionary encoded and decoded on open
+            kinds[name] = 'object'
+            column = parse_categorical(column)
+        else:
+            kinds[name] = 'array'
+        if kinds[name] == 'array':
+            _save_array(path, f'{name}.npy', column, codec)
+        else:
+            _save_array(path, f'{name}.codes.npy', column.codes, codec)
+            _save_array(path, f'{name}.categories.npy', column.categories, codec)
+    meta = {'version': SNAPSHOT_VERSION, 'id': uuid.uuid4().hex, 'fields': table.fields, 'count': len(table),
+            'kinds': kinds, 'signature': signature, 'codec': codec and codec.name}
+    # meta is written last, a snapshot without meta is incomplete
+    with open(os.path.join(path, META_FILE), 'w') as meta_file:
+        json.dump(meta, meta_file)
+
+
+def save_snapshot(table, path, signature=None, codec=None):
+    """
+    Write table as a snapshot directory, replacing a previous snapshot at path
+
+    Files are written to a temporary sibling directory moved to path once complete, files of a previous
+    snapshot are unlinked and not truncated, so processes mapping them keep reading the previous snapshot.
+    Path is missing between moving the previous snapshot aside and moving the new one in, readers use
+    the previous snapshot meanwhile.
+    :param table: CADTable
+    :param path: snapshot directory, must not exist or hold a snapshot
+    :param signature: cad.api signature stored with the snapshot
+    :param codec: name of the codec compressing column files, e.g. `zstd` or `zlib`, None to keep them mappable
+    """
+    path = os.path.normpath(path)
+    if os.path.isdir(path) and os.listdir(path) and not os.path.exists(os.path.join(path, META_FILE)):
+        raise ValueError(f'{path} is not a snapshot directory, not replaced')
+    parent, name = os.path.split(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f'.{name}.', dir=parent)
+    try:
+        _write_snapshot(table, staging, signature, get_codec(codec) if codec else None)
+        previous = _previous_path(path)
+        if os.path.exists(path):
+            # left by a save interrupted after its swap, path holds the latest snapshot
+            shutil.rmtree(previous, ignore_errors=True)
+            # a directory can not replace a non empty one, the previous snapshot is moved aside first
+            os.replace(path, previous)
+        os.replace(staging, path)
+        shutil.rmtree(previous, ignore_errors=True)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+class SnapshotColumns(Mapping):
+    """
+    Read-only column mapping of a snapshot, each column is loaded on first access
+    """
+
+    def __init__(self, path, kinds, mmap=True, codec=None, snapshot_id=None):
+        """
+        :param snapshot_id: id of the snapshot meta the columns belong to, checked before loading a column
+        """
+        self.path = path
+        self.kinds = kinds
+        self.mmap_mode = 'r' if mmap else None
+        self.codec = get_codec(codec) if codec else None
+        self.snapshot_id = snapshot_id
+        self._loaded = {}
+
+    def _load(self, file_name):
+        directory = _snapshot_dir(self.path)
+        if self.snapshot_id is not None and read_meta(directory).get('id') != self.snapshot_id:
+            # columns of two snapshots never mix, loaded columns stay valid but others need a new open
+            raise ValueError(f'Snapshot {self.path} was replaced since it was opened')
+        if self.codec is None:
+            return np.load(os.path.join(directory, file_name), mmap_mode=self.mmap_mode)
+        # compressed files can not be memory mapped
+        with open(os.path.join(directory, f'{file_name}.{self.codec.name}'), 'rb') as array_file:
+            return np.load(io.BytesIO(self.codec.decompress(array_file.read())))
+
+    def __getitem__(self, name):
+        if name not in self._loaded:
+            kind = self.kinds[name]
+            if kind == 'array':
+                column = self._load(f'{name}.npy')
+            else:
+                column = Categorical(self._load(f'{name}.codes.npy'), self._load(f'{name}.categories.npy'))
+                if kind == 'object':
+                    column = column.decode()
+            self._loaded[name] = column
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter(self.kinds)
+
+    def __len__(self):
+        return len(self.kinds)
+
+
+def read_meta(path):
+    """
+    :return: meta dict of snapshot at path
+    """
+    with open(os.path.join(_snapshot_dir(path), META_FILE)) as meta_file:
+        meta = json.load(meta_file)
+    if meta['version'] != SNAPSHOT_VERSION:
+        raise ValueError(f'Unsupported snapshot version {meta["version"]}')
+    return meta
+
+
+def open_snapshot(path, mmap=True):
+    """
+    Open snapshot lazily as CADTable
+    :param path: snapshot directory
+    :param mmap: memory map column files, read them into memory otherwise, compressed files are always read
+    :return: CADTable backed by the snapshot files
+    """
+    meta = read_meta(path)
+    columns = SnapshotColumns(path, meta['kinds'], mmap=mmap, codec=meta.get('codec'), snapshot_id=meta.get('id'))
+    return CADTable(columns, meta['fields'])
+
+
+def save_response(res, path, codec=None):
+    """
+    Snapshot a cad.api Response
+    :param codec: name of the codec compressing column files, None to keep them mappable
+    """
+    save_snapshot(CADTable.from_response(res), path, signature=res.get_value_for_key('signature'), codec=codec)
+
+
+def load_response(path):
+    """
+    Response of a snapshot, with values formatted back into cad.api strings
+    """
+    meta = read_meta(path)
+    table = open_snapshot(path)
+    content = {'signature': meta['signature'], 'count': str(meta['count'])}
+    if meta['count']:
+        content['fields'] = table.fields
+        content['data'] = table.to_rows()
+    return Response.from_json(content)
@@ -0,0 +1,164 @@
+"""
+Local SQLite store of close-approach rows, partitioned by year & body
+"""
+import sqlite3
+import threading
+import time
+
+from utils.cad_table import CADTable
+
+# stored columns: cad.api fields with their SQLite type
+STORE_COLUMNS = (
+    ('des', 'TEXT'),
+    ('orbit_id', 'TEXT'),
+    ('jd', 'REAL'),
+    ('cd', 'TEXT'),
+    ('dist', 'REAL'),
+    ('dist_min', 'REAL'),
+    ('dist_max', 'REAL'),
+    ('v_rel', 'REAL'),
+    ('v_inf', 'REAL'),
+    ('t_sigma_f', 'TEXT'),
+    ('body', 'TEXT'),
+    ('h', 'REAL'),
+)
+STORE_FIELDS = [name for name, _ in STORE_COLUMNS]
+# rows of responses without `body` column approach Earth
+DEFAULT_BODY = 'Earth'
+
+
+def _watermark_key(body, query):
+    return f'watermark:{body}?{query}'
+
+
+class CADStore:
+    """
+    Close-approach rows upserted on `des` + `orbit_id` + `jd`, indexed by (year, body) & jd,
+    with per window sync state and sync watermarks, both keyed on the canonical extra params of the
+    query they were synced with (`query`, e.g. `dist-max=0.2`, empty for cad.api defaults)
+    """
+
+    def __init__(self, path):
+        """
+        :param path: database file path
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        columns = ', '.join(f'{name} {kind}' for name, kind in STORE_COLUMNS)
+        window_columns = [row[1] for row in self._db.execute('PRAGMA table_info(sync_windows)')]
+        if window_columns and 'query' not in window_columns:
+            # sync state of older stores is not keyed on params, dropped so every window is re-fetched once
+            self._db.executescript("DROP TABLE sync_windows; DELETE FROM sync_meta WHERE key = 'watermark';")
+        self._db.executescript(f'''
+            CREATE TABLE IF NOT EXISTS approaches (
+                {columns}, year INTEGER, PRIMARY KEY (des, orbit_id, jd));
+            CREATE INDEX IF NOT EXISTS approaches_year_body ON approaches (year, body);
+            CREATE INDEX IF NOT EXISTS approaches_jd ON approaches (jd);
+            CREATE TABLE IF NOT EXISTS sync_windows (
+                year INTEGER, body TEXT, query TEXT, synced_at REAL, row_count INTEGER, etag TEXT,
+                PRIMARY KEY (year, body, query));
+            CREATE TABLE IF NOT EXISTS sync_meta (key TEXT PRIMARY KEY, value TEXT);
+        ''')
+        self._db.commit()
+
+    def replace_window(self, year, body, fields, data, etag=None, query=''):
+        """
+        Upsert fetched rows of a window and drop window rows no longer served,
+        e.g. approaches of a superseded orbit solution
+        :param year: window year
+        :param body: window body, `ALL` for every body
+        :param fields: cad.api fields
+        :param data: cad.api rows
+        :param etag: validator of the window response
+        :param query: canonical extra params of the window query, state of the window synced with other
+                      params is dropped, its rows were just replaced
+        :return: number of rows upserted
+        """
+        data = data or []
+        indexes = [fields.index(name) if name in fields else None for name in STORE_FIELDS]
+        body_index = STORE_FIELDS.index('body')
+        cd_index = fields.index('cd') if data else None
+        rows = []
+        for row in data:
+            values = [row[index] if index is not None else None for index in indexes]
+            if values[body_index] is None:
+                values[body_index] = body if body != 'ALL' else DEFAULT_BODY
+            rows.append(values + [int(row[cd_index][:4])])
+        placeholders = ', '.join('?' * (len(STORE_FIELDS) + 1))
+        with self._lock, self._db:
+            self._db.execute('CREATE TEMP TABLE IF NOT EXISTS fetched (des TEXT, orbit_id TEXT, jd REAL)')
+            self._db.execute('DELETE FROM fetched')
+            self._db.executemany(f'INSERT OR REPLACE INTO approaches VALUES ({placeholders})', rows)
+            self._db.executemany('INSERT INTO fetched VALUES (?, ?, ?)', [row[:3] for row in rows])
+            body_filter, body_params = ('', ()) if body == 'ALL' else (' AND body = ?', (body,))
+            self._db.execute('DELETE FROM approaches WHERE year = ?' + body_filter +
+                             ' AND (des, orbit_id, jd) NOT IN (SELECT des, orbit_id, jd FROM fetched)',
+                             (year,) + body_params)
+            self._db.execute('DELETE FROM sync_windows WHERE year = ? AND body = ? AND query != ?', (year, body, query))
+            self._db.execute('INSERT OR REPLACE INTO sync_windows VALUES (?, ?, ?, ?, ?, ?)',
+                             (year, body, query, time.time(), len(rows), etag))
+        return len(rows)
+
+    def touch_window(self, year, body, query=''):
+        """
+        Mark window as synced without changes, e.g. on 304
+        """
+        with self._lock, self._db:
+            self._db.execute('UPDATE sync_windows SET synced_at = ? WHERE year = ? AND body = ? AND query = ?',
+                             (time.time(), year, body, query))
+
+    def window_state(self, year, body, query=''):
+        """
+        :return: (synced_at, etag) of window synced with `query` params, None if never synced with them
+        """
+        with self._lock:
+            return self._db.execute('SELECT synced_at, etag FROM sync_windows WHERE year = ? AND body = ? '
+                                    'AND query = ?', (year, body, query)).fetchone()
+
+    def get_watermark(self, body, query=''):
+        """
+        Start time (epoch seconds) of last successful sync of body with `query` params, None before the first one
+        """
+        with self._lock:
+            row = self._db.execute('SELECT value FROM sync_meta WHERE key = ?',
+                                   (_watermark_key(body, query),)).fetchone()
+        return float(row[0]) if row else None
+
+    def set_watermark(self, body, query, value):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO sync_meta VALUES (?, ?)',
+                             (_watermark_key(body, query), str(value)))
+
+    def load_rows(self, year_min=None, year_max=None, body=None):
+        """
+        Stored rows ordered by jd
+        :param year_min: first year, inclusive
+        :param year_max: last year, inclusive
+        :param body: body name, None for every body
+        :return: (fields, rows)
+        """
+        conditions, params = [], []
+        for condition, value in (('year >= ?', year_min), ('year <= ?', year_max), ('body = ?', body)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        with self._lock:
+            rows = self._db.execute(f'SELECT {", ".join(STORE_FIELDS)} FROM approaches{where} ORDER BY jd',
+                                    params).fetchall()
+        return list(STORE_FIELDS), [list(row) for row in rows]
+
+    def load_table(self, year_min=None, year_max=None, body=None):
+        """
+        Stored rows as CADTable
+        """
+        fields, rows = self.load_rows(year_min, year_max, body)
+        return CADTable.from_rows(rows, fields)
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM approaches').fetchone()[0]
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,136 @@
+"""
+Incremental sync of cad.api history into a local CADStore
+
+cad.api has no "modified since" filter, so the history is split into yearly windows and a run only
+re-fetches the windows that are due: never synced, close to now (hot, predictions move as orbits are
+refined) or older than `cold_ttl`. Due windows are revalidated with their stored ETag, a 304 keeps
+the stored rows. The watermark is recorded only once every due window synced. Window state and
+watermark are keyed on the canonical extra params, a run with other params, e.g. another `dist-max`,
+does not reuse the state of previous ones.
+
+usage: python -m utils.cad_sync --db cad.db [--start-year 1900] [--end-year 2200] [--body ALL] [--full]
+"""
+import argparse
+import datetime
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlencode
+
+from app.client import APIClient
+from app.planner import ShardFailed
+from utils.cad_store import CADStore
+
+# windows within this many years of now are re-fetched on every run
+DEFAULT_HOT_YEARS = 1
+# other windows are re-fetched once older than this many seconds
+DEFAULT_COLD_TTL = 30 * 24 * 3600
+
+SyncReport = namedtuple('SyncReport', 'fetched unchanged skipped rows')
+# params set per window, left out of the params key
+WINDOW_PARAMS = ('date-min', 'date-max', 'body')
+
+
+def window_params(year, body, params=None):
+    """
+    cad.api params of one yearly window
+    """
+    return dict(params or {}, **{'date-min': f'{year}-01-01T00:00:00', 'date-max': f'{year}-12-31T23:59:59',
+                                 'body': body})
+
+
+def params_key(params):
+    """
+    Canonical key of extra window params, independent of order & value types, e.g. `dist-max=0.2`
+    """
+    return urlencode(sorted((str(key), str(value)) for key, value in (params or {}).items()
+                            if key not in WINDOW_PARAMS))
+
+
+def due_years(store, years, body, now=None, hot_years=DEFAULT_HOT_YEARS, cold_ttl=DEFAULT_COLD_TTL, full=False,
+              query=''):
+    """
+    Years of `years` whose window has to be re-fetched
+    :param now: reference epoch seconds, defaults to current time
+    :param full: every window is due
+    :param query: `params_key` of the extra params of the windows
+    """
+    now = now or time.time()
+    current_year = datetime.datetime.utcfromtimestamp(now).year
+    due = []
+    for year in years:
+        state = store.window_state(year, body, query)
+        if full or state is None or abs(year - current_year) <= hot_years or now - state[0] >= cold_ttl:
+            due.append(year)
+    return due
+
+
+def sync(client, store, start_year, end_year, body='ALL', params=None, hot_years=DEFAULT_HOT_YEARS,
+         cold_ttl=DEFAULT_COLD_TTL, full=False, max_workers=4):
+    """
+    Fetch due yearly windows of [start_year, end_year] and upsert them into store
+    :param client: cad.api APIClient
+    :param store: CADStore
+    :param body: cad.api body, `ALL` keeps every body
+    :param params: extra cad.api params of every window, e.g. `dist-max`
+    :param max_workers: concurrent window queries
+    :return: SyncReport, raises ShardFailed when a window is not answered with 200 or 304
+    """
+    started_at = time.time()
+    years = range(start_year, end_year + 1)
+    query = params_key(params)
+    due = due_years(store, years, body, now=started_at, hot_years=hot_years, cold_ttl=cold_ttl, full=full,
+                    query=query)
+
+    def fetch(year):
+        state = store.window_state(year, body, query)
+        headers = {'If-None-Match': state[1]} if state and state[1] and not full else None
+        return year, client.get(params=window_params(year, body, params), headers=headers)
+
+    fetched, unchanged, rows, failures = 0, 0, 0, []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for year, res in pool.map(fetch, due):
+            if res.code == HTTPStatus.NOT_MODIFIED:
+                store.touch_window(year, body, query)
+                unchanged += 1
+            elif res.code == HTTPStatus.OK:
+                rows += store.replace_window(year, body, res.get_fields() or [], res.get_data(),
+                                             etag=res.headers.get('ETag'), query=query)
+                fetched += 1
+            else:
+                failures.append(res)
+    if failures:
+        raise ShardFailed(failures[0])
+    store.set_watermark(body, query, started_at)
+    return SyncReport(fetched, unchanged, len(years) - len(due), rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', required=True, help='SQLite store path')
+    parser.add_argument('--start-year', type=int, default=1900, help='First year to sync')
+    parser.add_argument('--end-year', type=int, default=2200, help='Last year to sync')
+    parser.add_argument('--body', default='ALL', help='cad.api body')
+    parser.add_argument('--dist-max', default=None, help='cad.api dist-max, defaults to cad.api default')
+    parser.add_argument('--hot-years', type=int, default=DEFAULT_HOT_YEARS, help='Years around now always fetched')
+    parser.add_argument('--cold-ttl', type=float, default=DEFAULT_COLD_TTL / 86400, help='Days before re-fetch')
+    parser.add_argument('--full', action='store_true', help='Re-fetch every window')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent window queries')
+    parser.add_argument('--base-url', default=None, help='API base url')
+    args = parser.parse_args()
+
+    params = {'dist-max': args.dist_max} if args.dist_max else None
+    store = CADStore(args.db)
+    with APIClient(base_url=args.base_url, pool_maxsize=args.workers) as client:
+        start = time.perf_counter()
+        report = sync(client, store, args.start_year, args.end_year, body=args.body, params=params,
+                      hot_years=args.hot_years, cold_ttl=args.cold_ttl * 86400, full=args.full,
+                      max_workers=args.workers)
+    store.close()
+    print(f'{time.perf_counter() - start:.1f}s  fetched: {report.fetched}  unchanged: {report.unchanged}  '
+          f'skipped: {report.skipped}  rows upserted: {report.rows}')
+
+
+if __name__ == '__main__':
+    main()
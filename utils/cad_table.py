@@ -0,0 +1,286 @@
+"""
+Columnar, typed container for cad.api results
+"""
+import numpy as np
+import pandas as pd
+
+from app.records import CD_FORMAT, MONTHS
+
+# cad.api columns and their storage type
+FLOAT_COLUMNS = ('jd', 'dist', 'dist_min', 'dist_max', 'v_rel', 'v_inf', 'h', 'diameter', 'diameter_sigma')
+# suffix of the int8 format column kept next to a float column, digits served after the decimal point
+DECIMALS_SUFFIX = '_decimals'
+DATETIME_COLUMNS = ('cd',)
+CATEGORICAL_COLUMNS = ('des', 'body')
+# `t_sigma_f` is `[< ][D_]HH:MM`, stored as float minutes
+DURATION_COLUMNS = ('t_sigma_f',)
+# suffix of the bool format column kept next to a duration column, True where `< ` marks an upper bound
+UPPER_SUFFIX = '_upper'
+
+# julian date of 1970-01-01T00:00
+UNIX_EPOCH_JD = 2440587.5
+
+
+class Categorical:
+    """
+    Dictionary encoded column, `codes` index `categories`, -1 for null
+    """
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.codes)
+
+    def decode(self):
+        """
+        :return: object array of values, None for null
+        """
+        values = self.categories.astype(object)[self.codes]
+        values[self.codes == -1] = None
+        return values
+
+    def equals(self, value):
+        """
+        Vectorised `== value` on codes, without decoding
+        """
+        index = np.searchsorted(self.categories, value)
+        if index == len(self.categories) or self.categories[index] != value:
+            return np.zeros(len(self.codes), dtype=bool)
+        return self.codes == index
+
+    def take(self, indexes):
+        return Categorical(self.codes[indexes], self.categories)
+
+    def to_pandas(self):
+        return pd.Categorical.from_codes(self.codes, categories=self.categories)
+
+
+def parse_float_text(values):
+    """
+    Vectorised parse of numeric strings, NaN for null, and of the digits after their decimal point
+
+    Formatting a value with its decimals gives back the served string, e.g. 9 for `2458849.500000000`.
+    :return: (float64 array, int8 array of decimals, -1 for nulls & exponent notation formatted with their repr)
+    """
+    nulls = values == None  # noqa: E711 element wise comparison
+    # bytes are parsed by numpy and measured with np.char, one conversion for both
+    raw = np.array(np.where(nulls, 'nan', values), dtype='S')
+    point = np.char.find(raw, b'.')
+    decimals = np.where(point == -1, 0, np.char.str_len(raw) - point - 1)
+    decimals[nulls | (np.char.find(raw, b'e') != -1) | (decimals > np.iinfo(np.int8).max)] = -1
+    return raw.astype(np.float64), decimals.astype(np.int8)
+
+
+def parse_datetime(values):
+    """
+    Vectorised parse of `cd` strings, NaT for null
+
+    `cd` is fixed width `YYYY-Mon-DD hh:mm`, digits are read straight from a byte matrix;
+    any other shape falls back to pd.to_datetime.
+    """
+    values = np.array(values, dtype=object)
+    nulls = values == None  # noqa: E711 element wise comparison
+    raw = np.array(np.where(nulls, '1970-Jan-01 00:00', values), dtype='S')
+    if raw.dtype.itemsize != 17 or len(set(np.char.str_len(raw).tolist())) > 1:
+        return pd.to_datetime(pd.Series(values, dtype=object), format=CD_FORMAT).to_numpy()
+    chars = raw.view(np.uint8).reshape(-1, 17)
+    digits = chars.astype(np.int64) - ord('0')
+
+    def number(start, stop):
+        return digits[:, start:stop] @ (10 ** np.arange(stop - start - 1, -1, -1))
+
+    # only a handful of distinct month names, look them up once
+    month_names, month_index = np.unique(chars[:, 5:8].copy().view('S3').ravel(), return_inverse=True)
+    months = np.array([MONTHS[name.decode()] - 1 for name in month_names], dtype=np.int64)[month_index]
+    month_start = ((number(0, 4) - 1970) * 12 + months).astype('datetime64[M]').astype('datetime64[m]')
+    minutes = (number(9, 11) - 1) * 1440 + number(12, 14) * 60 + number(15, 17)
+    parsed = month_start + minutes.astype('timedelta64[m]')
+    parsed[nulls] = np.datetime64('NaT')
+    return parsed
+
+
+def parse_duration(values):
+    """
+    Vectorised parse of `t_sigma_f` strings into minutes, NaN for null
+
+    Values repeat heavily, only distinct values are parsed.
+    :return: (float64 minutes, bool array True where the value is an upper bound `< HH:MM`)
+    """
+    values = np.array(values, dtype=object)
+    nulls = values == None  # noqa: E711 element wise comparison
+    minutes = np.full(len(values), np.nan)
+    upper = np.zeros(len(values), dtype=bool)
+    if nulls.all():
+        return minutes, upper
+    unique, inverse = np.unique(values[~nulls].astype(str), return_inverse=True)
+    parts = pd.Series(unique).str.extract(r'^\s*(<)?\s*(?:(\d+)_)?(\d+):(\d+)')
+    numbers = parts[[1, 2, 3]].astype(np.float64)
+    unique_minutes = numbers[1].fillna(0).to_numpy() * 1440 + numbers[2].to_numpy() * 60 + numbers[3].to_numpy()
+    minutes[~nulls] = unique_minutes[inverse]
+    upper[~nulls] = parts[0].notna().to_numpy()[inverse]
+    return minutes, upper
+
+
+def parse_categorical(values):
+    """
+    Dictionary encode strings, -1 code for null
+    """
+    values = np.array(values, dtype=object)
+    nulls = values == None  # noqa: E711 element wise comparison
+    categories, codes = np.unique(values[~nulls].astype(str), return_inverse=True)
+    all_codes = np.full(len(values), -1, dtype=np.int32)
+    all_codes[~nulls] = codes
+    return Categorical(all_codes, categories)
+
+
+def format_column(name, column, upper=None, decimals=None):
+    """
+    Typed column formatted as cad.api strings, None for nulls
+    :param upper: bool format column of a duration column, `< ` prefixed where True
+    :param decimals: int8 format column of a float column, digits after the decimal point, -1 or None formats
+                     floats with their shortest round-trip repr
+    """
+    if isinstance(column, Categorical):
+        return column.decode().tolist()
+    if name in DATETIME_COLUMNS:
+        values = pd.DatetimeIndex(column).strftime(CD_FORMAT)
+        return [None if pd.isna(value) else value for value in values]
+    if name in DURATION_COLUMNS:
+        upper = np.zeros(len(column), dtype=bool) if upper is None else upper
+        return [None if np.isnan(value) else '< ' * is_upper + _format_minutes(int(value))
+                for value, is_upper in zip(column.tolist(), upper.tolist())]
+    if column.dtype == np.float64 and decimals is not None:
+        return [None if np.isnan(value) else repr(value) if places < 0 else f'{value:.{places}f}'
+                for value, places in zip(column.tolist(), decimals.tolist())]
+    if column.dtype == np.float64:
+        return [None if np.isnan(value) else repr(value) for value in column.tolist()]
+    return column.tolist()
+
+
+def _format_minutes(minutes):
+    days, minutes = divmod(minutes, 1440)
+    duration = f'{minutes // 60:02d}:{minutes % 60:02d}'
+    return f'{days}_{duration}' if days else duration
+
+
+class CADTable:
+    """
+    cad.api result stored column wise, every known column parsed once into a typed NumPy array
+
+    - float64 for distances, velocities, `h` & `jd`, NaN for nulls, and an int8 `<column>_decimals` format column
+      of the digits served after their decimal point
+    - datetime64 for `cd`
+    - float64 minutes for `t_sigma_f`, and a bool `t_sigma_f_upper` format column for its `< ` qualifier
+    - `Categorical` for `des` & `body`
+    - object arrays for any other column
+
+    Format columns are kept in `columns` but not in `fields`, they travel with the rows of their
+    column and are only read back when formatting cad.api strings.
+    """
+
+    def __init__(self, columns, fields=None):
+        """
+        :param columns: dict of column name to array or Categorical, fields and their format columns
+        :param fields: column order, defaults to columns order
+        """
+        self.columns = columns
+        self.fields = list(fields or columns)
+
+    @classmethod
+    def from_rows(cls, data, fields):
+        """
+        Build table from cad.api `data` & `fields`
+        :param data: list of rows, None or empty for no results
+        :param fields: column names
+        :return: CADTable
+        """
+        # one 2d object array, columns are sliced out of it without a python level transpose
+        rows = np.array(data or [], dtype=object).reshape(len(data or []), len(fields))
+        columns = {}
+        for index, name in enumerate(fields):
+            column = rows[:, index]
+            if name in FLOAT_COLUMNS:
+                columns[name], columns[name + DECIMALS_SUFFIX] = parse_float_text(column)
+            elif name in DATETIME_COLUMNS:
+                columns[name] = parse_datetime(column)
+            elif name in DURATION_COLUMNS:
+                columns[name], columns[name + UPPER_SUFFIX] = parse_duration(column)
+            elif name in CATEGORICAL_COLUMNS:
+                columns[name] = parse_categorical(column)
+            else:
+                columns[name] = np.array(column, dtype=object)
+        return cls(columns, fields)
+
+    @classmethod
+    def from_response(cls, res):
+        """
+        Build table from `Response`
+        """
+        return cls.from_rows(res.get_data(), res.get_fields() or [])
+
+    @classmethod
+    def concat(cls, tables):
+        """
+        Rows of tables one after the other, categorical columns are re-encoded on the union of their categories
+        :param tables: non empty list of CADTable with the same fields, format columns missing from any table are
+                       left out
+        :return: CADTable
+        """
+        fields = tables[0].fields
+        if any(table.fields != fields for table in tables):
+            raise ValueError('Tables with different fields can not be concatenated')
+        columns = {}
+        for name in [name for name in tables[0].columns if all(name in table for table in tables)]:
+            parts = [table.columns[name] for table in tables]
+            if isinstance(parts[0], Categorical):
+                categories = np.unique(np.concatenate([part.categories for part in parts]))
+                # trailing -1 maps null codes to null
+                codes = [np.append(np.searchsorted(categories, part.categories), -1)[part.codes] for part in parts]
+                columns[name] = Categorical(np.concatenate(codes).astype(np.int32), categories)
+            else:
+                columns[name] = np.concatenate(parts)
+        return cls(columns, fields)
+
+    def __len__(self):
+        return len(self.columns[self.fields[0]]) if self.fields else 0
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, name):
+        """
+        :return: column as NumPy array, categorical columns decoded
+        """
+        column = self.columns[name]
+        return column.decode() if isinstance(column, Categorical) else column
+
+    def take(self, indexes):
+        """
+        New table of rows at indexes, e.g. a boolean mask or sort order
+        """
+        return CADTable({name: column.take(indexes) if isinstance(column, Categorical) else column[indexes]
+                         for name, column in self.columns.items()}, self.fields)
+
+    def to_rows(self, fields=None):
+        """
+        Format columns back into cad.api rows of strings, None for nulls
+        :param fields: columns to format, defaults to all fields
+        :return: list of rows
+        """
+        fields = fields or self.fields
+        columns = [format_column(name, self.columns[name], upper=self.columns.get(name + UPPER_SUFFIX),
+                                 decimals=self.columns.get(name + DECIMALS_SUFFIX))
+                   for name in fields]
+        return [list(row) for row in zip(*columns)] if columns else []
+
+    def to_pandas(self):
+        """
+        Export fields to pandas DataFrame without copying column arrays
+        """
+        series = {}
+        for name in self.fields:
+            column = self.columns[name]
+            series[name] = pd.Series(column.to_pandas() if isinstance(column, Categorical) else column, copy=False)
+        return pd.DataFrame(series, columns=self.fields, copy=False)
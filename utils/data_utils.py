@@ -1,8 +1,20 @@
-import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 
 import pandas as pd
-from requests import get
+
+from app.client import APIClient
+from app.single_flight import SingleFlight
+
+# shared sbdb.api client, see `set_sbdb_client`
+_sbdb_client = None
+# max designations kept in the orbit class memo, least recently used ones are evicted
+ORBIT_CLASS_MEMO_SIZE = 100000
+# (sbdb.api url, designation) -> orbit class code, shared by every `resolve_orbit_classes` call
+_orbit_class_memo = OrderedDict()
+_orbit_class_memo_lock = threading.Lock()
 
 
 def get_df(data, columns):
@@ -15,18 +27,76 @@ def get_df(data, columns):
     return pd.DataFrame(data=data, columns=columns)
 
 
-def get_des_class_name(des_name):
+def set_sbdb_client(client):
+    """
+    Use client for sbdb.api lookups, e.g. an `APIClient('sbdb.api', cache=...)` sharing a response cache
+    :param client: APIClient of sbdb.api endpoint
+    """
+    global _sbdb_client
+    _sbdb_client = client
+
+
+def get_sbdb_client():
+    """
+    :return: shared pooled APIClient of sbdb.api, concurrent lookups of one designation share one call
+    """
+    global _sbdb_client
+    if _sbdb_client is None:
+        _sbdb_client = APIClient(endpoint='sbdb.api', single_flight=SingleFlight())
+    return _sbdb_client
+
+
+def get_des_class_name(des_name, client=None):
     """
     Utility function to get ORBIT class name from external sbdb.api
     :param des_name: asteroid or comet name
+    :param client: APIClient of sbdb.api, defaults to shared client
     :return: ORBIT class name
     """
-    url = 'https://ssd-api.jpl.nasa.gov/sbdb.api'
-    params = {'des': des_name}
-    res = get(url, params=params)
-    code = res.status_code
-    raw_content = res.content.decode()
-    content_decoded = '{}' if raw_content == '' else raw_content
-    json_content = json.loads(content_decoded)
-    if code == HTTPStatus.OK:
-        return json_content['object']['orbit_class']['code']
+    client = client or get_sbdb_client()
+    res = client.get(params={'des': des_name})
+    if res.code == HTTPStatus.OK:
+        return res.json_content['object']['orbit_class']['code']
+
+
+def clear_orbit_class_memo():
+    """
+    Forget every memoised orbit class, e.g. between tests against different servers
+    """
+    with _orbit_class_memo_lock:
+        _orbit_class_memo.clear()
+
+
+def resolve_orbit_classes(designations, client=None, max_workers=8):
+    """
+    Orbit class of every designation of a column, each distinct designation is looked up at most once
+    per sbdb.api url while memoised, see ORBIT_CLASS_MEMO_SIZE, and unknown ones are fetched concurrently
+    :param designations: list, array or Series of designations
+    :param client: APIClient of sbdb.api, defaults to shared client
+    :param max_workers: max concurrent sbdb.api calls
+    :return: pandas Series of orbit class codes aligned with designations, NaN for failed lookups
+    """
+    designations = designations if isinstance(designations, pd.Series) else pd.Series(designations, dtype=object)
+    unique = pd.unique(designations)
+    client = client or get_sbdb_client()
+    # answers of a stub & of the live API never mix
+    url = client.endpoint_url
+    with _orbit_class_memo_lock:
+        missing = [des for des in unique if (url, des) not in _orbit_class_memo]
+    if missing:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            classes = list(pool.map(lambda des: get_des_class_name(des, client=client), missing))
+        with _orbit_class_memo_lock:
+            # failed lookups are not memoised, they are retried on next call
+            for des, code in zip(missing, classes):
+                if code is not None:
+                    _orbit_class_memo[(url, des)] = code
+    resolved = {}
+    with _orbit_class_memo_lock:
+        for des in unique:
+            if (url, des) in _orbit_class_memo:
+                _orbit_class_memo.move_to_end((url, des))
+                resolved[des] = _orbit_class_memo[(url, des)]
+        while len(_orbit_class_memo) > ORBIT_CLASS_MEMO_SIZE:
+            _orbit_class_memo.popitem(last=False)
+    return designations.map(resolved)
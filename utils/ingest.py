@@ -0,0 +1,192 @@
+"""
+Bulk ingestion of many cad.api responses: downloads on I/O threads, json decode & typed columnar
+conversion on a process pool, bodies and parsed columns passed through shared memory
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from app.client import APIClient, Response, get_json_backend
+from app.planner import ShardFailed
+from utils.cad_table import CADTable, Categorical, parse_categorical
+
+DEFAULT_IO_THREADS = 8
+# shared memory offsets of arrays are aligned on this many bytes
+ALIGNMENT = 64
+
+
+def _write_arrays(arrays):
+    """
+    Copy arrays into one new shared memory block
+    :return: (block name, [(dtype, shape, offset)])
+    """
+    layout, size = [], 0
+    for array in arrays:
+        size = -(-size // ALIGNMENT) * ALIGNMENT
+        layout.append((array.dtype.str, array.shape, size))
+        size += array.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        for array, (dtype, shape, offset) in zip(arrays, layout):
+            np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)[...] = array
+    except BaseException:
+        # the block name never reaches the caller, nobody else could release it
+        block.close()
+        block.unlink()
+        raise
+    block.close()
+    return block.name, layout
+
+
+def _read_arrays(name, layout):
+    """
+    Copy arrays out of a shared memory block and release it
+    """
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return [np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset).copy()
+                for dtype, shape, offset in layout]
+    finally:
+        block.close()
+        block.unlink()
+
+
+def _share_bytes(content):
+    block = shared_memory.SharedMemory(create=True, size=max(len(content), 1))
+    block.buf[:len(content)] = content
+    block.close()
+    return block.name, len(content)
+
+
+def parse_shared(name, length):
+    """
+    Process pool task: decode a body held in shared memory into a CADTable written to a new shared memory block
+    :param name: shared memory block of the body
+    :param length: body length
+    :return: (block name, fields, [(column, kind, number of arrays)], array layout)
+    """
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        content = get_json_backend().loads(bytes(block.buf[:length]) or b'{}')
+    finally:
+        block.close()
+    table = CADTable.from_rows(content.get('data'), content.get('fields') or [])
+    columns, arrays = [], []
+    for column, values in table.columns.items():
+        if not isinstance(values, Categorical):
+            kind = 'array' if values.dtype != object else 'object'
+            # object columns travel dictionary encoded, numpy object arrays can not be shared
+            values = parse_categorical(values) if kind == 'object' else values
+        else:
+            kind = 'categorical'
+        parts = [values] if kind == 'array' else [values.codes, values.categories]
+        columns.append((column, kind, len(parts)))
+        arrays.extend(parts)
+    return (*_write_arrays(arrays), table.fields, columns)
+
+
+def load_shared(result):
+    """
+    CADTable of a `parse_shared` result, its shared memory block is released
+    """
+    name, layout, fields, columns = result
+    arrays = iter(_read_arrays(name, layout))
+    table = {}
+    for column, kind, num_arrays in columns:
+        parts = [next(arrays) for _ in range(num_arrays)]
+        if kind == 'array':
+            table[column] = parts[0]
+        elif kind == 'categorical':
+            table[column] = Categorical(*parts)
+        else:
+            table[column] = Categorical(*parts).decode()
+    return CADTable(table, fields)
+
+
+class IngestPipeline:
+    """
+    Parallel ingestion of many cad.api queries into CADTables
+
+    Bodies are downloaded by `io_threads` threads and written to shared memory, a pool of
+    `processes` worker processes decodes them and converts rows into typed columns written
+    back to shared memory, only block names & array layouts are pickled between processes.
+    With `processes=0` bodies are parsed on the I/O threads, e.g. as a single core baseline.
+
+    Usage::
+
+        with IngestPipeline(processes=4) as pipeline:
+            tables = pipeline.ingest([{'date-min': f'{year}-01-01', 'date-max': f'{year}-12-31'}
+                                      for year in range(1900, 2100)])
+    """
+
+    def __init__(self, client=None, processes=None, io_threads=DEFAULT_IO_THREADS):
+        """
+        :param client: APIClient of cad.api, defaults to a pooled client sized for io_threads
+        :param processes: worker processes, defaults to the number of CPUs, 0 parses on the I/O threads
+        :param io_threads: concurrent downloads
+        """
+        self._owns_client = client is None
+        self.client = client or APIClient(pool_maxsize=io_threads)
+        self.processes = os.cpu_count() if processes is None else processes
+        self._io_pool = ThreadPoolExecutor(max_workers=io_threads)
+        # spawned, forking a process running I/O threads can deadlock its children
+        self._process_pool = ProcessPoolExecutor(max_workers=self.processes,
+                                                 mp_context=multiprocessing.get_context('spawn')) \
+            if self.processes else None
+
+    def _download(self, params):
+        res = self.client.get_content(params=params)
+        if res.status_code != HTTPStatus.OK:
+            raise ShardFailed(Response.from_json({}, code=res.status_code))
+        if self._process_pool is None:
+            content = get_json_backend().loads(res.content or b'{}')
+            return CADTable.from_rows(content.get('data'), content.get('fields') or [])
+        return _share_bytes(res.content)
+
+    def _parse(self, download):
+        """
+        Parse a downloaded body on the process pool once its download is done
+        """
+        if self._process_pool is None:
+            return download.result()
+        name, length = download.result()
+        try:
+            return load_shared(self._process_pool.submit(parse_shared, name, length).result())
+        finally:
+            body = shared_memory.SharedMemory(name=name)
+            body.close()
+            body.unlink()
+
+    def ingest(self, params_list):
+        """
+        :param params_list: cad.api query params of every response
+        :return: list of CADTable in params_list order, raises ShardFailed when a query is not answered with 200
+        """
+        downloads = [self._io_pool.submit(self._download, params) for params in params_list]
+        # parsed as soon as each download is done, parsing overlaps the remaining downloads
+        with ThreadPoolExecutor(max_workers=max(1, self.processes)) as waiters:
+            return list(waiters.map(self._parse, downloads))
+
+    def warm_up(self):
+        """
+        Start every worker process, e.g. before timing ingestion
+        """
+        if self._process_pool is not None:
+            list(self._process_pool.map(abs, range(self.processes)))
+
+    def close(self):
+        self._io_pool.shutdown()
+        if self._process_pool is not None:
+            self._process_pool.shutdown()
+        if self._owns_client:
+            self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,306 @@
+"""
+Open-loop load generation against cad.api
+
+Requests are sent on a precomputed arrival schedule whatever the response times, constant or ramped
+rates per stage, so a slow server builds a backlog instead of slowing the generator down. Latency is
+measured from the scheduled send time, the wait behind a saturated server is part of it and not
+omitted (coordinated omission); the service time, from the actual send time, is reported next to it.
+
+usage: python run_tests.py --load [--rate 20] [--ramp-to 100] [--duration 10] [--mix default=4,filters=1] [--stub]
+"""
+import math
+import random
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.client import APIClient
+from utils.api_cases import (datetime_filter_test_cases, invalid_filter_test_cases, invalid_sorting_test_cases,
+                             numeric_filter_test_cases, sorting_test_cases)
+
+# arrival stage, `rate` requests/sec ramped linearly to `end_rate` over `duration` seconds
+Stage = namedtuple('Stage', 'rate end_rate duration')
+# outcome of one request, times in perf_counter seconds
+# status: http status code, None on exception
+# error: exception class name, None on response
+Result = namedtuple('Result', 'stage case scheduled started finished status error')
+
+# group weights of the default parameter mix
+DEFAULT_MIX = {'default': 4, 'filters': 2, 'sorting': 2, 'invalid': 1}
+DEFAULT_WORKERS = 64
+PERCENTILES = (50, 90, 99, 99.9)
+# relative precision of latency histogram buckets
+HISTOGRAM_PRECISION = 0.01
+# smallest latency told apart by the histogram, in seconds
+HISTOGRAM_MIN = 1e-5
+
+
+def case_groups():
+    """
+    cad.api query params per group, drawn from the filter & sorting test cases so load follows the functional suite
+    :return: dict of group to list of (case name, params)
+    """
+    filters = datetime_filter_test_cases + numeric_filter_test_cases
+    return {
+        'default': [('default', {})],
+        'filters': [(f'{case.filter_key}={case.filter_value}', {case.filter_key: str(case.filter_value)})
+                    for case in filters],
+        'sorting': [(f'sort={case.key}', {'sort': case.key, 'limit': 5}) for case in sorting_test_cases],
+        'invalid': [(f'{case.filter_key}={case.filter_value}', {case.filter_key: case.filter_value})
+                    for case in invalid_filter_test_cases]
+                   + [(f'sort={case.key}', {'sort': case.key}) for case in invalid_sorting_test_cases],
+    }
+
+
+def parse_mix(text):
+    """
+    :param text: comma separated `group=weight`, e.g. `default=4,filters=1`
+    :return: dict of group to weight
+    """
+    mix = {}
+    for part in filter(None, text.split(',')):
+        group, _, weight = part.partition('=')
+        mix[group.strip()] = float(weight or 1)
+    return mix
+
+
+def build_mix(weights=None, groups=None):
+    """
+    Weighted query cases, each group weight is shared by the cases of the group
+    :param weights: dict of group to weight, defaults to DEFAULT_MIX
+    :param groups: dict of group to list of (case name, params), defaults to `case_groups()`
+    :return: (list of (case name, params), list of case weights)
+    """
+    weights = DEFAULT_MIX if weights is None else weights
+    groups = case_groups() if groups is None else groups
+    unknown = set(weights) - set(groups)
+    if unknown:
+        raise ValueError(f'Unknown mix groups {sorted(unknown)}, available: {sorted(groups)}')
+    cases, case_weights = [], []
+    for group, weight in weights.items():
+        if weight > 0:
+            cases += groups[group]
+            case_weights += [weight / len(groups[group])] * len(groups[group])
+    if not cases:
+        raise ValueError('Mix has no case with a positive weight')
+    return cases, case_weights
+
+
+def schedule(stages, poisson=False, seed=0):
+    """
+    Send offsets of every request, in seconds from the start of the run
+    :param stages: list of Stage
+    :param poisson: exponential inter-arrival times with the same mean rate, evenly spaced otherwise
+    :param seed: random seed of poisson arrivals
+    :return: (float64 array of offsets, int array of stage index per request)
+    """
+    rng = np.random.default_rng(seed)
+    offsets, stage_index, start = [], [], 0
+    for index, stage in enumerate(stages):
+        slope = (stage.end_rate - stage.rate) / stage.duration
+        total = (stage.rate + stage.end_rate) / 2 * stage.duration
+        if poisson:
+            # arrivals of a homogeneous unit rate process mapped through the inverse of the expected count
+            counts = np.cumsum(rng.exponential(size=int(total * 2) + 16))
+            counts = counts[counts < total]
+        else:
+            counts = np.arange(math.ceil(total - 1e-9))
+        # expected requests by time t: rate * t + slope * t^2 / 2, solved for t
+        if slope:
+            times = (-stage.rate + np.sqrt(stage.rate ** 2 + 2 * slope * counts)) / slope
+        else:
+            times = counts / stage.rate
+        offsets.append(start + times)
+        stage_index.append(np.full(len(times), index))
+        start += stage.duration
+    return np.concatenate(offsets), np.concatenate(stage_index).astype(int)
+
+
+class LatencyHistogram:
+    """
+    Log-linear latency histogram, every bucket spans `precision` of its lower bound so percentiles are
+    accurate to `precision` whatever the latency range
+    """
+
+    def __init__(self, precision=HISTOGRAM_PRECISION, min_value=HISTOGRAM_MIN):
+        self.precision = precision
+        self.min_value = min_value
+        self.counts = Counter()
+        self.count = 0
+        self.max = 0
+
+    def record(self, value):
+        self.counts[max(0, int(math.log(max(value, self.min_value) / self.min_value, 1 + self.precision)))] += 1
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def bucket_bound(self, bucket):
+        """
+        upper bound of bucket in seconds
+        """
+        return self.min_value * (1 + self.precision) ** (bucket + 1)
+
+    def percentile(self, percent):
+        """
+        :return: upper bound of the bucket holding `percent` % of values, never above the max
+        """
+        if not self.count:
+            return 0
+        rank, seen = math.ceil(self.count * percent / 100), 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.bucket_bound(bucket), self.max)
+        return self.max
+
+    def as_dict(self):
+        return {**{f'p{percent:g}': self.percentile(percent) for percent in PERCENTILES}, 'max': self.max}
+
+    def __repr__(self):
+        return f'LatencyHistogram({self.as_dict()})'
+
+
+class LoadReport:
+    """
+    Summary of a load run: arrivals, status codes & errors, latency & service time histograms, per stage
+    """
+
+    def __init__(self, stages, results, elapsed):
+        """
+        :param stages: list of Stage
+        :param results: list of Result
+        :param elapsed: wall clock seconds of the run
+        """
+        self.stages = stages
+        self.results = results
+        self.elapsed = elapsed
+        self.statuses = Counter(result.status for result in results if result.status is not None)
+        self.errors = Counter(result.error for result in results if result.error is not None)
+        self.latency = self._histogram(results, 'scheduled')
+        self.service = self._histogram(results, 'started')
+        # how late the generator itself sent requests, a large lag means the generator is the bottleneck
+        self.max_send_lag = max((result.started - result.scheduled for result in results), default=0)
+
+    @staticmethod
+    def _histogram(results, since):
+        histogram = LatencyHistogram()
+        for result in results:
+            histogram.record(result.finished - getattr(result, since))
+        return histogram
+
+    @property
+    def error_rate(self):
+        """
+        fraction of requests failing with an exception or a 5xx/429 status
+        """
+        failed = sum(self.errors.values()) + sum(count for status, count in self.statuses.items()
+                                                 if status >= 500 or status == 429)
+        return failed / len(self.results) if self.results else 0
+
+    def stage_reports(self):
+        """
+        :return: list of dict of requests, statuses & latency percentiles per stage
+        """
+        reports = []
+        for index, stage in enumerate(self.stages):
+            results = [result for result in self.results if result.stage == index]
+            reports.append({'stage': index, 'rate': stage.rate, 'end_rate': stage.end_rate,
+                            'duration': stage.duration, 'requests': len(results),
+                            'statuses': dict(Counter(result.status for result in results)),
+                            'latency': self._histogram(results, 'scheduled').as_dict()})
+        return reports
+
+    def as_dict(self):
+        return {'requests': len(self.results), 'elapsed': self.elapsed,
+                'throughput': len(self.results) / self.elapsed if self.elapsed else 0,
+                'statuses': dict(self.statuses), 'errors': dict(self.errors), 'error_rate': self.error_rate,
+                'latency': self.latency.as_dict(), 'service': self.service.as_dict(),
+                'max_send_lag': self.max_send_lag, 'stages': self.stage_reports()}
+
+    def format(self):
+        """
+        Human readable summary
+        """
+        summary = self.as_dict()
+        lines = [f'requests: {summary["requests"]} in {self.elapsed:.2f}s ({summary["throughput"]:.1f}/s), '
+                 f'error rate: {self.error_rate:.2%}, max send lag: {self.max_send_lag * 1000:.1f} ms',
+                 f'statuses: {dict(sorted(self.statuses.items()))}  errors: {dict(self.errors)}']
+        for name, histogram in (('latency', self.latency), ('service', self.service)):
+            lines.append(f'{name:<8} ' + '  '.join(f'{key}: {value * 1000:8.1f} ms'
+                                                   for key, value in histogram.as_dict().items()))
+        for stage in summary['stages']:
+            lines.append(f'stage {stage["stage"]}: {stage["rate"]:g} -> {stage["end_rate"]:g}/s over '
+                         f'{stage["duration"]:g}s, {stage["requests"]} requests, '
+                         f'p99 {stage["latency"]["p99"] * 1000:.1f} ms, statuses {stage["statuses"]}')
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return f'LoadReport({self.as_dict()})'
+
+
+class LoadGenerator:
+    """
+    Open-loop load generator: a dispatcher thread hands every request to a pool of `workers` threads at
+    its scheduled time, requests queue in the pool when all workers are busy and their wait is measured
+
+    Usage::
+
+        with APIClient(max_retries=0) as client, LoadGenerator(client) as generator:
+            report = generator.run([Stage(10, 100, 30)])
+        print(report.format())
+    """
+
+    def __init__(self, client=None, mix=None, workers=DEFAULT_WORKERS, seed=0):
+        """
+        :param client: APIClient under load, defaults to a pooled client without retries so every status is seen
+        :param mix: (cases, weights) of `build_mix`, defaults to DEFAULT_MIX
+        :param workers: max concurrent requests
+        :param seed: random seed of case picks & poisson arrivals
+        """
+        self._owns_client = client is None
+        self.client = client or APIClient(pool_maxsize=workers, max_retries=0, retry_statuses=())
+        self.cases, self.weights = mix if mix is not None else build_mix()
+        self.workers = workers
+        self.seed = seed
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+
+    def _request(self, stage, case, scheduled):
+        name, params = self.cases[case]
+        started = time.perf_counter()
+        try:
+            res = self.client.get(params=params)
+        except Exception as error:
+            return Result(stage, name, scheduled, started, time.perf_counter(), None, type(error).__name__)
+        return Result(stage, name, scheduled, started, time.perf_counter(), res.code, None)
+
+    def run(self, stages, poisson=False):
+        """
+        :param stages: list of Stage, e.g. `[Stage(20, 20, 10)]` constant or `[Stage(10, 100, 30)]` ramped
+        :param poisson: poisson arrivals instead of evenly spaced ones
+        :return: LoadReport
+        """
+        offsets, stage_index = schedule(stages, poisson, self.seed)
+        picks = random.Random(self.seed).choices(range(len(self.cases)), weights=self.weights, k=len(offsets))
+        futures = []
+        start = time.perf_counter()
+        for offset, stage, case in zip(offsets.tolist(), stage_index.tolist(), picks):
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(self._pool.submit(self._request, stage, case, scheduled))
+        results = [future.result() for future in futures]
+        return LoadReport(stages, results, time.perf_counter() - start)
+
+    def close(self):
+        self._pool.shutdown()
+        if self._owns_client:
+            self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
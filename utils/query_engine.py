@@ -0,0 +1,224 @@
+"""
+Client side cad.api query engine over a CADTable
+"""
+import re
+from http import HTTPStatus
+
+import numpy as np
+import pandas as pd
+
+from app.client import CloseApproachBodies, Response, SDBDOrbitClass
+from app.planner import SORT_COLUMNS, parse_date
+from utils.cad_table import CADTable, Categorical
+from utils.data_utils import resolve_orbit_classes
+
+CAD_SIGNATURE = {'source': 'NASA/JPL SBDB Close Approach Data API', 'version': '1.1'}
+# au per lunar distance
+LD_IN_AU = 0.00256955529
+# numeric range filters: param -> (column, operator)
+RANGE_FILTERS = {
+    'dist-min': ('dist', np.greater_equal),
+    'dist-max': ('dist', np.less_equal),
+    'h-min': ('h', np.greater_equal),
+    'h-max': ('h', np.less_equal),
+    'v-inf-min': ('v_inf', np.greater_equal),
+    'v-inf-max': ('v_inf', np.less_equal),
+    'v-rel-min': ('v_rel', np.greater_equal),
+    'v-rel-max': ('v_rel', np.less_equal),
+}
+# cad.api defaults: next 60 days, within 0.05 au of Earth
+DEFAULT_PARAMS = {'date-min': 'now', 'date-max': '+60', 'dist-max': '0.05', 'body': 'Earth', 'sort': 'date'}
+SUPPORTED_PARAMS = set(DEFAULT_PARAMS) | set(RANGE_FILTERS) | {'class', 'des', 'fullname', 'limit'}
+# designation shapes: numbered, provisional, comet
+DES_PATTERN = re.compile(r'\d+|\d{4} [A-Z]{2}\d*|\d+[PCDXI](-[A-Z]+)?|[PCDXA]/\d{4} [A-Z]{1,2}\d*(-[A-Z])?')
+NUMBER_PATTERN = re.compile(r'(\d+\.?\d*|\.\d+)')
+DISTANCE_PATTERN = re.compile(r'(\d+\.?\d*|\.\d+)(LD|au)?')
+TRUE_VALUES = ('true', '1', 'y', 'yes')
+
+
+class QueryError(ValueError):
+    """
+    Invalid query, answered with HTTPStatus.BAD_REQUEST (400) like cad.api does
+    """
+
+
+def parse_distance(value):
+    """
+    Parse cad.api distance, a number in au or suffixed with `au`/`LD`
+    :return: distance in au
+    """
+    match = DISTANCE_PATTERN.fullmatch(str(value))
+    if not match:
+        raise QueryError(f'invalid distance {value}')
+    distance = float(match.group(1))
+    return distance * LD_IN_AU if match.group(2) == 'LD' else distance
+
+
+def parse_number(value, name):
+    """
+    Parse non negative number
+    """
+    if not NUMBER_PATTERN.fullmatch(str(value)):
+        raise QueryError(f'invalid {name} value {value}')
+    return float(value)
+
+
+def parse_query_date(value, name):
+    """
+    Parse cad.api date as minute precision datetime64
+    """
+    try:
+        return np.datetime64(parse_date(value), 'm')
+    except ValueError:
+        raise QueryError(f'invalid {name} value {value}')
+
+
+class QueryEngine:
+    """
+    Evaluates cad.api query params against a CADTable held in memory or memory mapped
+
+    Filters are vectorised predicates over the typed columns, sort orders are argsorts
+    computed once per column and reused by every query. Results have the `fields`/`data`/
+    `count` shape of a cad.api `Response`; invalid params are answered with a 400 `Response`.
+    """
+
+    def __init__(self, table, rows=None, signature=None, orbit_classes=None, apply_defaults=True):
+        """
+        :param table: CADTable of the dataset, `body` column is required to filter on other bodies than Earth
+        :param rows: original cad.api rows of table, served as is, formatted from table otherwise
+        :param signature: signature of responses, defaults to cad.api signature
+        :param orbit_classes: callable mapping a designation Series to orbit classes, used by `class`
+                              filter when table has no `class` column, defaults to sbdb.api lookup
+        :param apply_defaults: apply cad.api defaults (60 days from now, 0.05 au, Earth) to missing params
+        """
+        self.table = table
+        self.rows = rows
+        self.signature = signature or CAD_SIGNATURE
+        self.orbit_classes = orbit_classes
+        self.apply_defaults = apply_defaults
+        self._sort_indexes = {}
+        self._classes = None
+
+    @classmethod
+    def from_response(cls, res, **kwargs):
+        """
+        Engine over a cad.api Response, e.g. a wide `body=ALL` snapshot
+        """
+        return cls(CADTable.from_response(res), rows=res.get_data() or [],
+                   signature=res.get_value_for_key('signature'), **kwargs)
+
+    def sort_index(self, column, descending=False):
+        """
+        Precomputed row order of column, nulls last in both directions
+        """
+        key = (column, descending)
+        if key not in self._sort_indexes:
+            values = self.table.columns[column]
+            if isinstance(values, Categorical):
+                # categories are sorted, codes order like the strings they encode
+                values = np.where(values.codes == -1, np.nan, values.codes)
+            order = np.argsort(values, kind='stable')
+            if descending:
+                nulls = np.isnan(values[order])
+                order = np.concatenate([order[~nulls][::-1], order[nulls]])
+            self._sort_indexes[key] = order
+        return self._sort_indexes[key]
+
+    def _class_column(self):
+        if self._classes is None:
+            if 'class' in self.table:
+                self._classes = self.table['class']
+            else:
+                resolve = self.orbit_classes or resolve_orbit_classes
+                self._classes = resolve(pd.Series(self.table['des'], dtype=object)).to_numpy(dtype=object)
+        return self._classes
+
+    def _equals(self, column, value):
+        values = self.table.columns[column]
+        return values.equals(value) if isinstance(values, Categorical) else values == value
+
+    def _mask(self, params):
+        """
+        Boolean mask of rows matching every filter
+        """
+        mask = np.ones(len(self.table), dtype=bool)
+        for name in ('date-min', 'date-max'):
+            if name in params:
+                date = parse_query_date(params[name], name)
+                compare = np.greater_equal if name == 'date-min' else np.less_equal
+                mask &= compare(self.table['cd'], date)
+        for name, (column, compare) in RANGE_FILTERS.items():
+            if name in params:
+                value = parse_distance(params[name]) if column == 'dist' else parse_number(params[name], name)
+                mask &= compare(self.table[column], value)
+        body = params.get('body')
+        if body not in (None, 'ALL', '*'):
+            if body not in CloseApproachBodies.__members__:
+                raise QueryError(f'invalid body {body}')
+            if 'body' in self.table:
+                mask &= self._equals('body', body)
+            elif body != CloseApproachBodies.Earth.name:
+                raise QueryError(f'dataset has no body column to filter on {body}')
+        if 'des' in params:
+            if not DES_PATTERN.fullmatch(str(params['des'])):
+                raise QueryError(f'invalid designation {params["des"]}')
+            mask &= self._equals('des', str(params['des']))
+        if 'class' in params:
+            if params['class'] not in SDBDOrbitClass.__members__:
+                raise QueryError(f'invalid orbit class {params["class"]}')
+            mask &= self._class_column() == params['class']
+        return mask
+
+    def _output_fields(self, params):
+        hidden = {'class'}
+        if params.get('body') not in ('ALL', '*'):
+            hidden.add('body')
+        if str(params.get('fullname', 'false')).lower() not in TRUE_VALUES:
+            hidden.add('fullname')
+        return [name for name in self.table.fields if name not in hidden]
+
+    def select(self, params=None):
+        """
+        Row indexes matching params, in requested sort order
+        :param params: cad.api query params as dict
+        :return: (row indexes, output fields), raises QueryError for invalid params
+        """
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        unsupported = set(params) - SUPPORTED_PARAMS
+        if unsupported:
+            raise QueryError(f'unsupported params {sorted(unsupported)}')
+        if self.apply_defaults:
+            params = dict(DEFAULT_PARAMS, **params)
+        sort = str(params.get('sort', 'date'))
+        if sort.lstrip('-') not in SORT_COLUMNS:
+            raise QueryError(f'invalid sort {sort}')
+        limit = None
+        if 'limit' in params:
+            if not str(params['limit']).isdigit() or int(params['limit']) == 0:
+                raise QueryError(f'invalid limit {params["limit"]}')
+            limit = int(params['limit'])
+        mask = self._mask(params)
+        order = self.sort_index(SORT_COLUMNS[sort.lstrip('-')], sort.startswith('-'))
+        return order[mask[order]][:limit], self._output_fields(params)
+
+    def query(self, params=None):
+        """
+        Evaluate cad.api query params
+        :param params: cad.api query params as dict
+        :return: Response, HTTPStatus.BAD_REQUEST (400) for invalid params
+        """
+        try:
+            indexes, fields = self.select(params)
+        except QueryError as error:
+            return Response.from_json({'code': '400', 'message': str(error)}, code=HTTPStatus.BAD_REQUEST)
+        content = {'signature': self.signature, 'count': str(len(indexes))}
+        if len(indexes):
+            content['fields'] = fields
+            content['data'] = self._rows(indexes, fields)
+        return Response.from_json(content)
+
+    def _rows(self, indexes, fields):
+        columns = [self.table.fields.index(name) for name in fields]
+        if self.rows is not None:
+            return [[self.rows[index][column] for column in columns] for index in indexes]
+        return self.table.take(indexes).to_rows(fields)
@@ -0,0 +1,402 @@
+"""
+Local stand-in for ssd-api.jpl.nasa.gov used by offline tests & benchmarks
+
+usage: python -m utils.stub_server [--port 8000] [--rows N] [--latency S] [--error-rate R] [--rate-limit N]
+                                    [--compress]
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from app.client import BASE_URL_ENV, CloseApproachBodies, SDBDOrbitClass
+from app.compression import content_encodings, encode_content
+from app.records import CD_FORMAT
+from utils.cad_table import UNIX_EPOCH_JD, CADTable
+
+CAD_FIELDS = ['des', 'orbit_id', 'jd', 'cd', 'dist', 'dist_min', 'dist_max', 'v_rel', 'v_inf', 't_sigma_f', 'h']
+# fields of a `body=ALL&fullname=true` query
+DATASET_FIELDS = CAD_FIELDS[:-1] + ['body', 'h', 'fullname']
+CAD_SIGNATURE = {'source': 'NASA/JPL SBDB Close Approach Data API', 'version': '1.1'}
+# rows of the queryable cad.api dataset, ~1.4 years of approaches centered on today
+DEFAULT_DATASET_ROWS = 20000
+# content codings served when compression is on, in the order of the client's Accept-Encoding
+CONTENT_ENCODINGS = content_encodings()
+
+
+def make_cad_rows(num_rows, seed=0, start=None):
+    """
+    Synthetic but schema-correct cad.api rows, all values are strings as served by JPL
+    :param num_rows: number of rows
+    :param seed: random seed, same seed gives same rows
+    :param start: datetime of first approach, approaches are 37 minutes apart, defaults to 2020-01-01
+    :return: list of rows
+    """
+    rnd = random.Random(seed)
+    start = start or datetime.datetime(2020, 1, 1)
+    start_jd = UNIX_EPOCH_JD + (start - datetime.datetime(1970, 1, 1)).total_seconds() / 86400
+    rows = []
+    for i in range(num_rows):
+        approach = start + datetime.timedelta(minutes=37 * i)
+        dist = rnd.uniform(0.0001, 0.05)
+        v_rel = rnd.uniform(1, 40)
+        rows.append([
+            f'{2000 + i % 25} {chr(65 + i % 26)}{chr(65 + i // 26 % 26)}{i}',
+            str(rnd.randint(1, 60)),
+            f'{start_jd + 37 * i / 1440:.9f}',
+            approach.strftime(CD_FORMAT),
+            f'{dist:.16f}',
+            f'{dist * 0.99:.16f}',
+            f'{dist * 1.01:.16f}',
+            f'{v_rel:.11f}',
+            f'{v_rel * 0.98:.11f}',
+            '< 00:01',
+            f'{rnd.uniform(10, 30):.1f}',
+        ])
+    return rows
+
+
+def make_cad_dataset(num_rows, seed=0, start=None):
+    """
+    Synthetic rows of a `body=ALL&fullname=true` query, every 4th approach is to another body than Earth
+    :param num_rows: number of rows
+    :param seed: random seed
+    :param start: datetime of first approach, defaults to centering the approaches on today so that
+                  cad.api default window (now to +60 days) has results
+    :return: list of rows with DATASET_FIELDS
+    """
+    today = datetime.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    bodies = [body.name for body in CloseApproachBodies
+              if body not in (CloseApproachBodies.Earth, CloseApproachBodies.ALL)]
+    rows = []
+    start = start or today - datetime.timedelta(minutes=37 * (num_rows // 2))
+    for i, row in enumerate(make_cad_rows(num_rows, seed, start)):
+        body = bodies[i // 4 % len(bodies)] if i % 4 == 3 else CloseApproachBodies.Earth.name
+        rows.append(row[:-1] + [body, row[-1], f'       ({row[0]})'])
+    return rows
+
+
+def make_cad_payload(num_rows, seed=0):
+    """
+    Encoded cad.api json body
+    :param num_rows: number of rows
+    :param seed: random seed
+    :return: bytes
+    """
+    content = {'signature': CAD_SIGNATURE, 'count': str(num_rows), 'fields': CAD_FIELDS,
+               'data': make_cad_rows(num_rows, seed)}
+    return json.dumps(content).encode()
+
+
+def orbit_class_of(des):
+    """
+    Deterministic orbit class of a designation
+    :param des: designation
+    :return: SDBDOrbitClass name
+    """
+    classes = list(SDBDOrbitClass)
+    return classes[zlib.crc32(des.encode()) % len(classes)].name
+
+
+def make_sbdb_payload(des):
+    """
+    Encoded sbdb.api json body of a designation
+    """
+    content = {'signature': {'source': 'NASA/JPL Small-Body Database (SBDB) API', 'version': '1.1'},
+               'object': {'des': des, 'fullname': des, 'orbit_class': {'code': orbit_class_of(des)}}}
+    return json.dumps(content).encode()
+
+
+def make_query_engine(num_rows, seed=0):
+    """
+    QueryEngine evaluating cad.api params over a synthetic dataset, orbit classes agree with sbdb.api stub
+    """
+    # imported here, query_engine depends on the client modules this stub is used to test
+    from utils.query_engine import QueryEngine
+
+    rows = [row + [orbit_class_of(row[0])] for row in make_cad_dataset(num_rows, seed)]
+    fields = DATASET_FIELDS + ['class']
+    return QueryEngine(CADTable.from_rows(rows, fields), rows=rows, signature=CAD_SIGNATURE)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive between requests
+    protocol_version = 'HTTP/1.1'
+    # headers & body are written separately, avoid Nagle delays on kept-alive connections
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.stub._count('connections')
+
+    def log_message(self, format, *args):
+        # silence per request stderr logging
+        pass
+
+    def _content_encoding(self):
+        """
+        First content coding of Accept-Encoding the stub can encode, None when compression is off or identity
+        """
+        if not self.server.stub.compression:
+            return None
+        for coding in self.headers.get('Accept-Encoding', '').split(','):
+            coding = coding.split(';')[0].strip()
+            if coding in CONTENT_ENCODINGS:
+                return coding
+        return None
+
+    def _send(self, code, body, content_type='application/json', etag=None, headers=None):
+        encoding = self._content_encoding() if body else None
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        if encoding:
+            body = self.server.stub._encode(body, encoding)
+            self.send_header('Content-Encoding', encoding)
+        if self.server.stub.compression:
+            self.send_header('Vary', 'Accept-Encoding')
+        if etag:
+            self.send_header('ETag', etag)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _send_cacheable(self, body):
+        # strong validator, a matching If-None-Match is answered with 304
+        encoding = self._content_encoding()
+        # a validator per representation, like the etags of mod_deflate
+        etag = '"' + hashlib.md5(body).hexdigest() + (f'-{encoding}"' if encoding else '"')
+        if self.headers.get('If-None-Match') == etag:
+            self._send(HTTPStatus.NOT_MODIFIED, b'', etag=etag)
+        else:
+            self._send(HTTPStatus.OK, body, etag=etag)
+
+    def _send_fault(self):
+        """
+        Answer with an injected fault, if any
+        :return: True when a fault was sent
+        """
+        stub = self.server.stub
+        throttled = stub._throttle()
+        if throttled:
+            status, retry_after = throttled
+            stub._count('throttled')
+            self._send(status, b'', headers={'Retry-After': str(retry_after)})
+            return True
+        if stub._fail():
+            stub._count('errors')
+            self._send(stub.error_status, b'')
+            return True
+        return False
+
+    def _send_cad(self, params):
+        stub = self.server.stub
+        if stub.cad_payload is not None:
+            self._send_cacheable(stub.cad_payload)
+            return
+        res = stub.engine.query(params)
+        body = json.dumps(res.json_content).encode()
+        if res.code == HTTPStatus.OK:
+            self._send_cacheable(body)
+        else:
+            self._send(res.code, body)
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub._count('requests')
+        stub._enter()
+        try:
+            stub._wait()
+            if self._send_fault():
+                return
+            url = urlsplit(self.path)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            if url.path == '/cad.api':
+                self._send_cad(params)
+            elif url.path == '/sbdb.api' and 'des' in params:
+                self._send_cacheable(make_sbdb_payload(params['des']))
+            else:
+                self._send(HTTPStatus.NOT_FOUND, b'')
+        finally:
+            stub._leave()
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        # answered like GET, the body is read so the kept-alive connection stays in sync
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.do_GET()
+
+
+class StubServer:
+    """
+    Threaded stub server serving cad.api & sbdb.api on localhost, answering
+    `If-None-Match` revalidation with 304
+
+    cad.api evaluates its query params (filters, sort, limit, cad.api defaults, 400 on invalid params)
+    over a synthetic dataset around today with `QueryEngine`, or serves a fixed payload of `num_rows`
+    rows whatever the params for raw throughput tests. Latency, throttling & errors can be injected,
+    fault settings are attributes that can be changed while the server runs.
+
+    Usage::
+
+        with StubServer(latency=0.01, error_rate=0.05) as stub:
+            APIClient(base_url=stub.url).get(params={'dist-max': '10LD'})
+    """
+
+    def __init__(self, num_rows=None, host='127.0.0.1', port=0, dataset_rows=DEFAULT_DATASET_ROWS, seed=0,
+                 latency=0, jitter=0, error_rate=0, error_status=HTTPStatus.SERVICE_UNAVAILABLE, rate_limit=None,
+                 max_concurrency=None, compression=False, fail_next=0):
+        """
+        :param num_rows: rows of a fixed cad.api payload served for any params, None to evaluate params
+        :param host: bind host
+        :param port: bind port, 0 picks a free port
+        :param dataset_rows: rows of the queryable cad.api dataset
+        :param seed: random seed of dataset & injected faults
+        :param latency: seconds added to every response
+        :param jitter: max random seconds added on top of latency
+        :param error_rate: fraction of requests answered with error_status
+        :param error_status: status of injected errors
+        :param rate_limit: requests per second above which requests are answered 429 with Retry-After
+        :param max_concurrency: in-flight requests above which requests are answered 503 with Retry-After
+        :param compression: encode bodies with the first content coding of Accept-Encoding it supports
+        :param fail_next: number of next requests answered with error_status, before error_rate applies
+        """
+        self.cad_payload = make_cad_payload(num_rows) if num_rows is not None else None
+        self.engine = make_query_engine(dataset_rows, seed) if num_rows is None else None
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.fail_next = fail_next
+        self.rate_limit = rate_limit
+        self.max_concurrency = max_concurrency
+        self.compression = compression
+        self.connections = 0
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        # encoded fixed payload by content coding
+        self._encoded = {}
+        self._tokens = rate_limit or 0
+        self._refilled_at = time.monotonic()
+        self._httpd = ThreadingHTTPServer((host, port), _StubHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        base url of stub, compatible with `APIClient.base_url`
+        """
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _enter(self):
+        with self._lock:
+            self._in_flight += 1
+
+    def _leave(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _wait(self):
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+    def _throttle(self):
+        """
+        Check concurrency limit and take a token of the rate limit bucket
+        :return: (status, Retry-After seconds) when throttled, None otherwise
+        """
+        with self._lock:
+            if self.max_concurrency and self._in_flight > self.max_concurrency:
+                return HTTPStatus.SERVICE_UNAVAILABLE, 1
+            if not self.rate_limit:
+                return None
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled_at) * self.rate_limit)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return None
+            return HTTPStatus.TOO_MANY_REQUESTS, max(1, math.ceil((1 - self._tokens) / self.rate_limit))
+
+    def _encode(self, body, encoding):
+        if body is not self.cad_payload:
+            return encode_content(body, encoding)
+        with self._lock:
+            if encoding not in self._encoded:
+                self._encoded[encoding] = encode_content(body, encoding)
+            return self._encoded[encoding]
+
+    def _fail(self):
+        with self._lock:
+            if self.fail_next:
+                self.fail_next -= 1
+                return True
+            return bool(self.error_rate) and self._random.random() < self.error_rate
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1', help='Bind host')
+    parser.add_argument('--port', type=int, default=8000, help='Bind port')
+    parser.add_argument('--rows', type=int, default=DEFAULT_DATASET_ROWS, help='Rows of cad.api dataset')
+    parser.add_argument('--latency', type=float, default=0, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0, help='Max random seconds added on top of latency')
+    parser.add_argument('--error-rate', type=float, default=0, help='Fraction of requests answered 503')
+    parser.add_argument('--rate-limit', type=float, default=None, help='Requests/sec before answering 429')
+    parser.add_argument('--max-concurrency', type=int, default=None, help='In-flight requests before 503')
+    parser.add_argument('--compress', action='store_true', help='Compress bodies as negotiated by Accept-Encoding')
+    args = parser.parse_args()
+
+    stub = StubServer(host=args.host, port=args.port, dataset_rows=args.rows, latency=args.latency,
+                      jitter=args.jitter, error_rate=args.error_rate, rate_limit=args.rate_limit,
+                      max_concurrency=args.max_concurrency, compression=args.compress)
+    print(f'Serving stub API on {stub.url}, point clients at it with {BASE_URL_ENV}={stub.url}')
+    with stub:
+        try:
+            stub._thread.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()